@@ -6,13 +6,34 @@ Module for analyzing Java dependencies and generating dependency graphs.
 import os
 import re
 import json
-import subprocess
+import gzip
+import time
 from pathlib import Path
 from collections import defaultdict
-from html_db import HTMLFunctionDatabase
+from html_store import open_html_store, controller_mappings
+from route_index import ClassNameIndex, RouteIndex
+from edge_index import EdgeIndex
+from method_graph import MethodGraph, method_node
+from graph_tiles import GraphLayout, TilePyramid
+from dot_writer import DotGraph
+from render_planner import RenderPlanner
+from graph_renderer import RenderCancelled
+from progress import AnalysisProgress
+from metrics import SOURCE_FILES_READ, SOURCE_BYTES_READ, REGEX_SECONDS
 
 
 class EnhancedJavaDependencyAnalyzer:
+    # Graph có nhiều node hơn ngưỡng này sẽ được render thành tile pyramid thay vì một PNG
+    tiled_node_threshold = 400
+    # Ghi thêm bản gzip của metadata để server gửi thẳng cho browser hỗ trợ gzip
+    gzip_metadata = False
+    # Thời gian tối đa (giây) cho mỗi lần chạy Graphviz trước khi giảm độ chi tiết
+    render_timeout = 60.0
+    # Thông tin lần render gần nhất (mode, engine, degradation...) để báo cho browser
+    last_render_info = None
+    # Các phase của analyze() - subclass bổ sung thêm phase của mình
+    analysis_phases = ["classes", "dependencies"]
+
     def __init__(self, source_directory: str):
         self.source_directory = Path(source_directory)
         self.classes = {}  # class_name -> file_path
@@ -24,10 +45,16 @@ class EnhancedJavaDependencyAnalyzer:
         self.custom_colors = {}  # node -> color mapping
         self.custom_nodes = {}  # custom nodes with their properties
         self.custom_edges = defaultdict(lambda: defaultdict(list))  # custom edges: source -> target -> methods
+        self.routes = RouteIndex()  # (HTTP method, path) -> controller method, từ annotation mapping
+        self._edge_index = None  # EdgeIndex của method_calls hiện tại, build khi cần (xem edge_index())
+        self._class_index = None  # ClassNameIndex của classes, build khi cần (xem class_index())
+        self.method_graph = MethodGraph()  # Class#method -> Class#method; subclass build trong analyze()
+        self.progress = AnalysisProgress()  # tiến độ analyze() cho /api/status
+        self._read_seconds = 0.0  # tổng thời gian đọc file, để tách khỏi thời gian regex
         
         # Initialize HTML function database
         try:
-            self.html_db = HTMLFunctionDatabase()
+            self.html_db = open_html_store()
             print("✅ HTML Database initialized successfully")
         except Exception as e:
             print(f"❌ Failed to initialize HTML Database: {e}")
@@ -36,18 +63,39 @@ class EnhancedJavaDependencyAnalyzer:
     def analyze(self):
         """Phân tích tất cả file Java"""
         java_files = list(self.source_directory.rglob("*.java"))
-        
-        for java_file in java_files:
-            self._extract_classes(java_file)
-            
+        self.progress.begin(self.analysis_phases)
+        self.routes.clear()
+        self._edge_index = None
+        self._class_index = None
+        self._scan_files("classes", java_files, self._extract_classes)
+        self._scan_files("dependencies", java_files, self._analyze_dependencies)
+    
+    def _scan_files(self, phase: str, java_files: list, parse):
+        """Chạy parse(java_file) cho từng file của một phase, cập nhật progress và thời gian regex"""
+        self.progress.start_phase(phase, len(java_files))
         for java_file in java_files:
-            self._analyze_dependencies(java_file)
+            started = time.perf_counter()
+            read_before = self._read_seconds
+            parse(java_file)
+            REGEX_SECONDS.inc(time.perf_counter() - started - (self._read_seconds - read_before), phase=phase)
+            self.progress.advance()
+    
+    def _read_source(self, java_file: Path) -> str:
+        """Đọc file Java (exception để caller xử lý), ghi nhận số file/bytes theo phase"""
+        started = time.perf_counter()
+        with open(java_file, 'r', encoding='utf-8') as f:
+            size = os.fstat(f.fileno()).st_size
+            content = f.read()
+        self._read_seconds += time.perf_counter() - started
+        phase = self.progress.phase if self.progress.running else "on_demand"
+        SOURCE_FILES_READ.inc(phase=phase)
+        SOURCE_BYTES_READ.inc(size, phase=phase)
+        return content
             
     def _extract_classes(self, java_file: Path):
         """Trích xuất tên class từ file Java"""
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_source(java_file)
         except:
             return
             
@@ -62,12 +110,22 @@ class EnhancedJavaDependencyAnalyzer:
             self.classes[class_name] = java_file
             self.classes[full_name] = java_file
             self.file_to_classes[java_file].add(class_name)
+        
+        self.routes.add_source(content, java_file)
             
+    def resolve_html_routes(self, html_functions) -> dict:
+        """html_id -> các Route mà api_calls của HTML function gọi tới (bỏ function không có route khớp)"""
+        resolved = {}
+        for func_data in html_functions or ():
+            routes = self.routes.resolve_calls(func_data.get('api_calls'))
+            if routes:
+                resolved[func_data['id']] = routes
+        return resolved
+    
     def _analyze_dependencies(self, java_file: Path):
         """Phân tích dependencies và method calls"""
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_source(java_file)
         except:
             return
             
@@ -116,6 +174,18 @@ class EnhancedJavaDependencyAnalyzer:
                 target_file = self.classes[class_name]
                 self.method_calls[java_file][target_file].append(f"new {class_name}()")
                 
+    def edge_index(self) -> EdgeIndex:
+        """Index của method_calls; các thao tác sửa method_calls phải đặt self._edge_index = None"""
+        if self._edge_index is None:
+            self._edge_index = EdgeIndex(self)
+        return self._edge_index
+    
+    def class_index(self) -> ClassNameIndex:
+        """Index tên class để tìm class liên quan khi tên controller không khớp chính xác"""
+        if self._class_index is None:
+            self._class_index = ClassNameIndex(self.classes)
+        return self._class_index
+    
     def _clean_content(self, content: str) -> str:
         """Loại bỏ comments và strings"""
         content = re.sub(r'//.*$', '', content, flags=re.MULTILINE)
@@ -127,6 +197,7 @@ class EnhancedJavaDependencyAnalyzer:
         """Xóa hoàn toàn một node và các liên kết của nó"""
         if node_name in self.custom_nodes:
             del self.custom_nodes[node_name]
+        self._edge_index = None
         
         for source_file in list(self.method_calls.keys()):
             source_node = self._get_simple_node_name(source_file)
@@ -202,6 +273,7 @@ class EnhancedJavaDependencyAnalyzer:
         deleted = False
         
         # Xóa từ method_calls
+        self._edge_index = None
         for source_file in list(self.method_calls.keys()):
             if self._get_simple_node_name(source_file) == source_node:
                 for target_file in list(self.method_calls[source_file].keys()):
@@ -235,6 +307,7 @@ class EnhancedJavaDependencyAnalyzer:
         updated = False
         
         # Cập nhật trong method_calls
+        self._edge_index = None
         for source_file in self.method_calls.keys():
             if self._get_simple_node_name(source_file) == source_node:
                 for target_file in self.method_calls[source_file].keys():
@@ -286,27 +359,44 @@ class EnhancedJavaDependencyAnalyzer:
         if node_name in self.custom_nodes:
             self.custom_nodes[node_name]["color"] = "lightblue"
         
-    def generate_enhanced_graph(self, output_file: str = "dependencies.dot"):
-        """Tạo Graphviz DOT file và HTML với image map"""
-        dot_content = self._generate_dot_content()
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(dot_content)
+    def generate_enhanced_graph(self, output_file: str = "dependencies.dot", planner: RenderPlanner = None):
+        """
+        Tạo Graphviz DOT file và HTML với image map.
+        Truyền `planner` để có thể hủy render từ thread khác (planner.cancel() -> RenderCancelled).
+        """
+        graph = self._build_dot_graph()
         
         metadata = self._generate_metadata()
         metadata_file = output_file.replace('.dot', '_metadata.json')
-        with open(metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, default=str)
+        self._write_metadata(metadata, metadata_file)
         
         image_file = output_file.replace('.dot', '.png')
         map_file = output_file.replace('.dot', '.map')
         html_file = output_file.replace('.dot', '.html')
+        planner = planner or RenderPlanner(timeout=self.render_timeout)
+        
+        if graph.node_count > self.tiled_node_threshold:
+            layout_file = output_file.replace('.dot', '_layout.json')
+            render_info = self._generate_tile_layout(planner, graph, output_file, layout_file)
+            if render_info:
+                self.last_render_info = render_info
+                self._generate_html_with_map(None, None, html_file, metadata_file, render_info)
+                print(f"✅ Tiled dependency graph generated ({render_info['nodes']} nodes):")
+                print(f"  📄 DOT file: {output_file}")
+                print(f"  🧩 Layout: {layout_file}")
+                print(f"  🌐 HTML: {html_file}")
+                print(f"  📊 Metadata: {metadata_file}")
+                return html_file, metadata_file
+            print(f"❌ Error generating tile layout")
+            return None, None
         
-        success_img = self._generate_image(output_file, image_file)
-        success_map = self._generate_image_map(output_file, map_file)
+        # PNG và image map được tạo trong cùng một lần chạy Graphviz
+        result = self._render(planner, graph, output_file, {'png': image_file, 'cmapx': map_file})
         
-        if success_img and success_map:
-            self._generate_html_with_map(image_file, map_file, html_file, metadata)
+        if result and result.success:
+            render_info = {"mode": "image", **result.describe()}
+            self.last_render_info = render_info
+            self._generate_html_with_map(image_file, map_file, html_file, metadata_file, render_info)
             print(f"✅ Enhanced dependency graph generated:")
             print(f"  📄 DOT file: {output_file}")
             print(f"  🖼️  Image: {image_file}")
@@ -320,14 +410,16 @@ class EnhancedJavaDependencyAnalyzer:
             return None, None
             
     def _generate_dot_content(self):
-        """Generate DOT content với URL attributes cho image map - FIXED VERSION"""
-        content = []
-        content.append("digraph JavaDependencies {")
-        content.append("    rankdir=LR;")
-        content.append('    node [shape=box, style=filled, fillcolor=lightblue, fontname="Arial"];')
-        content.append('    edge [fontname="Arial", fontsize=9, color=darkblue];')
-        content.append('    graph [fontname="Arial Bold", fontsize=14, label="Java Dependency Graph"];')
-        content.append("")
+        """Generate DOT content dạng string (tiện cho debug)"""
+        return self._build_dot_graph().to_string()
+    
+    def _build_dot_graph(self) -> DotGraph:
+        """Build DOT model với URL attributes cho image map - subclasses bổ sung node/edge vào model này"""
+        graph = DotGraph("JavaDependencies")
+        graph.add_statement("rankdir=LR")
+        graph.add_statement('node [shape=box, style=filled, fillcolor=lightblue, fontname="Arial"]')
+        graph.add_statement('edge [fontname="Arial", fontsize=9, color=darkblue]')
+        graph.add_statement('graph [fontname="Arial Bold", fontsize=14, label="Java Dependency Graph"]')
         
         # Tập hợp tất cả các file và node cần hiển thị
         all_files = set()
@@ -349,55 +441,38 @@ class EnhancedJavaDependencyAnalyzer:
             all_files.add(node_name)
         
         # Tạo các node
-        processed_files = set()
         for file_item in all_files:
             node_name = self._get_simple_node_name(file_item)
-            if node_name in self.hidden_nodes:
+            if node_name in self.hidden_nodes or graph.has_node(node_name):
                 continue
                 
-            if file_item not in processed_files:
-                # Kiểm tra xem có phải custom node không
-                if node_name in self.custom_nodes:
-                    node_info = self.custom_nodes[node_name]
-                    class_names = ', '.join(node_info["classes"]) if node_info["classes"] else "Custom Node"
-                    fill_color = node_info.get("color", "lightblue")
+            # Kiểm tra xem có phải custom node không
+            if node_name in self.custom_nodes:
+                node_info = self.custom_nodes[node_name]
+                class_names = ', '.join(node_info["classes"]) if node_info["classes"] else "Custom Node"
+                fill_color = node_info.get("color", "lightblue")
+            else:
+                # Node thường từ file
+                if file_item in self.file_to_classes:
+                    class_names = ', '.join(self.file_to_classes[file_item])
                 else:
-                    # Node thường từ file
-                    if file_item in self.file_to_classes:
-                        class_names = ', '.join(self.file_to_classes[file_item])
-                    else:
-                        class_names = "Unknown"
-                    fill_color = self.custom_colors.get(node_name, "lightblue")
-                
-                url = f"javascript:showNodeInfo('{node_name}')"
-                content.append(f'    "{node_name}" [label="{node_name}\\n({class_names})", URL="{url}", fillcolor="{fill_color}"];')
-                processed_files.add(file_item)
-        
-        content.append("")
-        content.append("    // Dependencies with method calls")
-        
-        # Các đường nối từ method_calls
-        for source_file, targets in self.method_calls.items():
-            source_node = self._get_simple_node_name(source_file)
-            if source_node in self.hidden_nodes:
-                continue
+                    class_names = "Unknown"
+                fill_color = self.custom_colors.get(node_name, "lightblue")
             
-            for target_file, methods in targets.items():
-                target_node = self._get_simple_node_name(target_file)
-                if target_node in self.hidden_nodes or (source_node, target_node) in self.hidden_edges:
-                    continue
-                
-                if methods:
-                    unique_methods = sorted(list(set(methods)))
-                    method_label = '\\n'.join(unique_methods[:3]) + (f'\\n+ {len(unique_methods)-3} more' if len(unique_methods) > 3 else '')
-                    url = f"javascript:showEdgeInfo('{source_node}', '{target_node}')"
-                    content.append(f'    "{source_node}" -> "{target_node}" [label="{method_label}", URL="{url}"];')
-                else:
-                    url = f"javascript:showEdgeInfo('{source_node}', '{target_node}')"
-                    content.append(f'    "{source_node}" -> "{target_node}" [label="dependency", URL="{url}"];')
-        
-        # Các đường nối tùy chỉnh
-        for source_file, targets in self.custom_edges.items():
+            graph.add_node(node_name, label=f"{node_name}\\n({class_names})",
+                           URL=f"javascript:showNodeInfo('{node_name}')", fillcolor=fill_color)
+            if isinstance(file_item, Path):
+                graph.set_group(node_name, self._package_of(file_item))
+        
+        # Các đường nối từ method_calls và các đường nối tùy chỉnh
+        self._add_dependency_edges(graph, self.method_calls, "dependency", {})
+        self._add_dependency_edges(graph, self.custom_edges, "custom dependency",
+                                   {"style": "dashed", "color": "red"})
+        return graph
+    
+    def _add_dependency_edges(self, graph: DotGraph, edges, default_label: str, style: dict):
+        """Thêm edges (source -> target -> methods) vào DOT model, bỏ qua node/edge bị ẩn"""
+        for source_file, targets in edges.items():
             source_node = self._get_simple_node_name(source_file)
             if source_node in self.hidden_nodes:
                 continue
@@ -408,48 +483,60 @@ class EnhancedJavaDependencyAnalyzer:
                     continue
                 
                 if methods:
-                    unique_methods = sorted(list(set(methods)))
+                    unique_methods = sorted(set(methods))
                     method_label = '\\n'.join(unique_methods[:3]) + (f'\\n+ {len(unique_methods)-3} more' if len(unique_methods) > 3 else '')
-                    url = f"javascript:showEdgeInfo('{source_node}', '{target_node}')"
-                    content.append(f'    "{source_node}" -> "{target_node}" [label="{method_label}", URL="{url}", style=dashed, color=red];')
                 else:
-                    url = f"javascript:showEdgeInfo('{source_node}', '{target_node}')"
-                    content.append(f'    "{source_node}" -> "{target_node}" [label="custom dependency", URL="{url}", style=dashed, color=red];')
-        
-        content.append("}")
-        return '\n'.join(content)
+                    method_label = default_label
+                url = f"javascript:showEdgeInfo('{source_node}', '{target_node}')"
+                graph.add_edge(source_node, target_node, label=method_label, URL=url, **style)
     
-    def _generate_image(self, dot_file: str, image_file: str) -> bool:
-        """Generate PNG image using Graphviz"""
+    def _render(self, planner: RenderPlanner, graph: DotGraph, dot_file: str, outputs: dict):
+        """Render graph qua RenderPlanner (timeout + giảm chi tiết)"""
         try:
-            cmd = ['dot', '-Tpng', dot_file, '-o', image_file]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"❌ Graphviz error: {result.stderr}")
-                return False
-            return True
+            result = planner.render(graph, dot_file, outputs)
+            if not result.success:
+                print(f"❌ Graphviz error: {result.error}")
+            return result
+        except RenderCancelled:
+            raise
         except FileNotFoundError:
             print("❌ Graphviz not found. Please install Graphviz: https://graphviz.org/download/")
-            return False
+            return None
         except Exception as e:
             print(f"❌ Error generating image: {e}")
-            return False
+            return None
     
-    def _generate_image_map(self, dot_file: str, map_file: str) -> bool:
-        """Generate HTML image map using Graphviz"""
+    def _generate_tile_layout(self, planner: RenderPlanner, graph: DotGraph, dot_file: str, layout_file: str):
+        """Layout graph một lần bằng Graphviz và lưu lại để server cắt tile"""
+        # Output dạng plain nhận thẳng trong bộ nhớ, không cần file trung gian
+        result = self._render(planner, graph, dot_file, {'plain': None})
+        if not result or not result.success:
+            return None
+        
         try:
-            cmd = ['dot', '-Tcmapx', dot_file, '-o', map_file]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"❌ Graphviz map error: {result.stderr}")
-                return False
-            return True
+            layout = GraphLayout.from_plain(result.data['plain'].decode('utf-8'))
+            layout.save(layout_file)
+            return {**TilePyramid(layout).describe(), **result.describe()}
         except Exception as e:
-            print(f"❌ Error generating image map: {e}")
-            return False
+            print(f"❌ Error generating tile layout: {e}")
+            return None
+    
+    def _write_metadata(self, metadata: dict, metadata_file: str):
+        """Ghi metadata dạng JSON compact (và bản .gz nếu bật gzip_metadata)"""
+        metadata_bytes = json.dumps(metadata, separators=(',', ':'), default=str).encode('utf-8')
+        with open(metadata_file, 'wb') as f:
+            f.write(metadata_bytes)
+        
+        gzip_file = metadata_file + '.gz'
+        if self.gzip_metadata:
+            with gzip.open(gzip_file, 'wb') as f:
+                f.write(metadata_bytes)
+        elif os.path.exists(gzip_file):
+            os.remove(gzip_file)  # tránh phục vụ bản gzip cũ
     
-    def _generate_html_with_map(self, image_file: str, map_file: str, html_file: str, metadata: dict):
-        """Generate HTML file with image map"""
+    def _generate_html_with_map(self, image_file: str, map_file: str, html_file: str, metadata_file: str,
+                                render_info: dict = None):
+        """Generate HTML page; metadata và image map được browser tải riêng khi cần"""
         try:
             template_path = Path(__file__).parent / "dependency_template3.html"
             if not template_path.exists():
@@ -460,19 +547,23 @@ class EnhancedJavaDependencyAnalyzer:
             with open(template_path, 'r', encoding='utf-8') as f:
                 html_template = f.read()
             
-            with open(map_file, 'r', encoding='utf-8') as f:
-                map_content = f.read()
+            map_name = "dependency_map"
+            if map_file:
+                # Chỉ đọc phần đầu của map để lấy tên, nội dung map được fetch riêng
+                with open(map_file, 'r', encoding='utf-8') as f:
+                    map_name_match = re.search(r'<map[^>]+name="([^"]*)"', f.read(4096))
+                if map_name_match:
+                    map_name = map_name_match.group(1)
             
-            map_name_match = re.search(r'<map[^>]+name="([^"]*)"', map_content)
-            map_name = map_name_match.group(1) if map_name_match else "dependency_map"
-            
-            image_filename = Path(image_file).name
-            metadata_json = json.dumps(metadata, indent=2, default=str)
+            image_filename = Path(image_file).name if image_file else ""
+            map_filename = Path(map_file).name if map_file else ""
+            render_json = json.dumps(render_info or {"mode": "image"})
             
             html_content = html_template.replace('{IMAGE_FILENAME}', image_filename)
             html_content = html_content.replace('{MAP_NAME}', map_name)
-            html_content = html_content.replace('{MAP_CONTENT}', map_content)
-            html_content = html_content.replace('{METADATA_JSON}', metadata_json)
+            html_content = html_content.replace('{MAP_FILENAME}', map_filename)
+            html_content = html_content.replace('{METADATA_FILENAME}', Path(metadata_file).name)
+            html_content = html_content.replace('{RENDER_JSON}', render_json)
             
             with open(html_file, 'w', encoding='utf-8') as f:
                 f.write(html_content)
@@ -543,64 +634,89 @@ class EnhancedJavaDependencyAnalyzer:
         
         # Tạo metadata cho từng file
         for file_item in all_files:
-            file_name = self._get_simple_node_name(file_item)
-            
-            # Khởi tạo file info
-            file_info = {
-                "classes": [],
-                "outgoing_calls": {},
-                "incoming_calls": {},
-                "is_custom": False
-            }
-            
-            # Nếu là custom node
-            if file_name in self.custom_nodes:
-                file_info["classes"] = list(self.custom_nodes[file_name].get("classes", []))
-                file_info["is_custom"] = True
-            elif file_item in self.file_to_classes:
-                file_info["classes"] = list(self.file_to_classes[file_item])
-            
-            # Xử lý outgoing calls từ method_calls
-            if file_item in self.method_calls:
-                for target_file, methods in self.method_calls[file_item].items():
-                    target_name = self._get_simple_node_name(target_file)
+            metadata["files"][self._get_simple_node_name(file_item)] = self._file_metadata(file_item)
+        
+        return metadata
+        
+    def _file_metadata(self, file_item) -> dict:
+        """Metadata của một node: classes, outgoing và incoming calls"""
+        file_name = self._get_simple_node_name(file_item)
+        
+        # Khởi tạo file info
+        file_info = {
+            "classes": [],
+            "outgoing_calls": {},
+            "incoming_calls": {},
+            "is_custom": False
+        }
+        
+        # Nếu là custom node
+        if file_name in self.custom_nodes:
+            file_info["classes"] = list(self.custom_nodes[file_name].get("classes", []))
+            file_info["is_custom"] = True
+        elif file_item in self.file_to_classes:
+            file_info["classes"] = list(self.file_to_classes[file_item])
+        
+        # Xử lý outgoing calls từ method_calls
+        if file_item in self.method_calls:
+            for target_file, methods in self.method_calls[file_item].items():
+                target_name = self._get_simple_node_name(target_file)
+                file_info["outgoing_calls"][target_name] = list(methods) if methods else []
+        
+        # Xử lý outgoing calls từ custom_edges
+        if file_item in self.custom_edges:
+            for target_file, methods in self.custom_edges[file_item].items():
+                target_name = self._get_simple_node_name(target_file)
+                # Nếu đã có trong outgoing_calls từ method_calls, thì extend
+                if target_name in file_info["outgoing_calls"]:
+                    existing_methods = file_info["outgoing_calls"][target_name]
+                    all_methods = list(set(existing_methods + list(methods)))
+                    file_info["outgoing_calls"][target_name] = all_methods
+                else:
                     file_info["outgoing_calls"][target_name] = list(methods) if methods else []
-            
-            # Xử lý outgoing calls từ custom_edges
-            if file_item in self.custom_edges:
-                for target_file, methods in self.custom_edges[file_item].items():
-                    target_name = self._get_simple_node_name(target_file)
-                    # Nếu đã có trong outgoing_calls từ method_calls, thì extend
-                    if target_name in file_info["outgoing_calls"]:
-                        existing_methods = file_info["outgoing_calls"][target_name]
-                        all_methods = list(set(existing_methods + list(methods)))
-                        file_info["outgoing_calls"][target_name] = all_methods
-                    else:
-                        file_info["outgoing_calls"][target_name] = list(methods) if methods else []
-            
-            # Xử lý incoming calls từ method_calls
-            for source_file, targets in self.method_calls.items():
-                if file_item in targets:
-                    source_name = self._get_simple_node_name(source_file)
-                    methods = targets[file_item]
+        
+        # Xử lý incoming calls từ method_calls
+        for source_file, targets in self.method_calls.items():
+            if file_item in targets:
+                source_name = self._get_simple_node_name(source_file)
+                methods = targets[file_item]
+                file_info["incoming_calls"][source_name] = list(methods) if methods else []
+        
+        # Xử lý incoming calls từ custom_edges
+        for source_file, targets in self.custom_edges.items():
+            if file_item in targets:
+                source_name = self._get_simple_node_name(source_file)
+                methods = targets[file_item]
+                # Nếu đã có trong incoming_calls từ method_calls, thì extend
+                if source_name in file_info["incoming_calls"]:
+                    existing_methods = file_info["incoming_calls"][source_name]
+                    all_methods = list(set(existing_methods + list(methods)))
+                    file_info["incoming_calls"][source_name] = all_methods
+                else:
                     file_info["incoming_calls"][source_name] = list(methods) if methods else []
-            
-            # Xử lý incoming calls từ custom_edges
-            for source_file, targets in self.custom_edges.items():
-                if file_item in targets:
-                    source_name = self._get_simple_node_name(source_file)
-                    methods = targets[file_item]
-                    # Nếu đã có trong incoming_calls từ method_calls, thì extend
-                    if source_name in file_info["incoming_calls"]:
-                        existing_methods = file_info["incoming_calls"][source_name]
-                        all_methods = list(set(existing_methods + list(methods)))
-                        file_info["incoming_calls"][source_name] = all_methods
-                    else:
-                        file_info["incoming_calls"][source_name] = list(methods) if methods else []
-            
-            metadata["files"][file_name] = file_info
         
-        return metadata
+        return file_info
+    
+    def get_node_metadata(self, node_name: str):
+        """Metadata của một node theo tên, tính từ trạng thái hiện tại (dùng cho /api/node)"""
+        if node_name in self.custom_nodes:
+            return self._file_metadata(node_name)
+        
+        for edges in (self.method_calls, self.custom_edges):
+            for source_file, targets in edges.items():
+                if self._get_simple_node_name(source_file) == node_name:
+                    return self._file_metadata(source_file)
+                for target_file in targets.keys():
+                    if self._get_simple_node_name(target_file) == node_name:
+                        return self._file_metadata(target_file)
+        return None
+        
+    def _package_of(self, java_file: Path) -> str:
+        """Package (theo thư mục) của một file Java, dùng khi gộp node"""
+        try:
+            return '.'.join(java_file.parent.relative_to(self.source_directory).parts) or "(default)"
+        except ValueError:
+            return java_file.parent.name
         
     def _get_simple_node_name(self, java_file) -> str:
         """Lấy tên node đơn giản - FIXED VERSION"""
@@ -664,8 +780,12 @@ class EnhancedJavaDependencyAnalyzer:
         
         print(f"{'='*50}")
     
-    def filter_by_selection(self, selected_functions):
-        """Filter the analyzer data based on selected functions"""
+    def filter_by_selection(self, selected_functions, html_functions: list = None):
+        """
+        Filter the analyzer data based on selected functions.
+        html_functions: kết quả html_db.get_functions_by_ids cho các id 'html_' đã chọn (nếu subclass
+        đã lấy sẵn) - tránh query lại database.
+        """
         
         # Nếu không có gì được chọn, không filter
         if not selected_functions:
@@ -697,39 +817,65 @@ class EnhancedJavaDependencyAnalyzer:
                 # HTML functions from database
                 selected_html_functions.append(func_id)
         
+        if selected_html_functions and self.html_db and html_functions is None:
+            try:
+                html_functions = self.html_db.get_functions_by_ids(selected_html_functions)
+            except Exception as e:
+                print(f"❌ Error processing HTML functions: {e}")
+                html_functions = []
+        html_names = {func_data['id']: func_data['name'] for func_data in html_functions or ()}
+        # Controller chính xác theo URL mà function gọi; mapping khai báo trong database là dự phòng
+        html_routes = self.resolve_html_routes(html_functions)
+        
         # 🎯 HTML-only mode: Chỉ chọn HTML functions, auto-map đến Java
         if selected_html_functions and not selected_classes and not selected_methods and self.html_db:
             print("🎯 HTML-only mode: Auto-mapping to Java components")
             try:
-                controller_mappings = self.html_db.get_controller_mappings_for_html(selected_html_functions)
+                mappings = controller_mappings(html_functions)
                 print("🔗 HTML→Java auto-mapping:")
                 
-                for html_func_id, java_component in controller_mappings.items():
+                for html_func_id in html_names:
                     # Lấy function name để display
-                    func_data = self.html_db.get_function_by_id(html_func_id)
-                    func_name = func_data['name'] if func_data else html_func_id
+                    func_name = html_names[html_func_id]
+                    routes = html_routes.get(html_func_id)
                     
-                    print(f"   � {func_name} → 🔧 {java_component}")
+                    if routes:
+                        components = []
+                        for route in routes:
+                            print(f"   🌐 {func_name} → 🔧 {route.describe()}")
+                            if route.controller not in components:
+                                components.append(route.controller)
+                    elif html_func_id in mappings:
+                        components = [mappings[html_func_id]]
+                        print(f"   🌐 {func_name} → 🔧 {components[0]}")
+                    else:
+                        continue
+                    
+                    # Có method graph: lấy đúng các class mà handler gọi tới (forward slice)
+                    handlers = [method_node(route.controller, route.handler) for route in routes or ()]
+                    handlers = [node for node in handlers if node in self.method_graph.methods]
+                    if handlers:
+                        reached = self.method_graph.classes_of(self.method_graph.forward_slice(handlers))
+                        for class_name in sorted(reached & self.classes.keys()):
+                            if class_name not in selected_classes:
+                                selected_classes.add(class_name)
+                                print(f"      ➕ Added call-graph dependency: {class_name}")
+                        continue
                     
                     # Thêm Java component vào selected classes
-                    if java_component in self.classes:
-                        selected_classes.add(java_component)
+                    for java_component in components:
+                        if java_component in self.classes:
+                            class_name = java_component
+                        else:
+                            # Tìm related class (vd. 'Order' -> OrderController) qua index tên class
+                            class_name = self.class_index().related(java_component)
+                            if not class_name:
+                                print(f"      ❌ No related class found for {java_component}")
+                                continue
+                            print(f"      ✅ Found related: {class_name}")
+                        selected_classes.add(class_name)
                         # Add dependencies cho component này
-                        self._add_dependencies_for_class(java_component, selected_classes)
-                    else:
-                        # Tìm related classes
-                        found_related = False
-                        for class_name in self.classes.keys():
-                            if (java_component.lower() in class_name.lower() or 
-                                class_name.lower() in java_component.lower()):
-                                selected_classes.add(class_name)
-                                print(f"      ✅ Found related: {class_name}")
-                                self._add_dependencies_for_class(class_name, selected_classes)
-                                found_related = True
-                                break
-                        
-                        if not found_related:
-                            print(f"      ❌ No related class found for {java_component}")
+                        self._add_dependencies_for_class(class_name, selected_classes)
                             
             except Exception as e:
                 print(f"❌ Error processing HTML functions: {e}")
@@ -737,11 +883,19 @@ class EnhancedJavaDependencyAnalyzer:
         # Mixed mode: HTML + Java selections
         elif selected_html_functions and self.html_db:
             try:
-                controller_mappings = self.html_db.get_controller_mappings_for_html(selected_html_functions)
-                print(f"🔗 HTML→Java mappings: {controller_mappings}")
+                mappings = controller_mappings(html_functions)
+                print(f"🔗 HTML→Java mappings: {mappings}")
+                
+                # Controller theo route ưu tiên hơn mapping trong database
+                for html_func_id, routes in html_routes.items():
+                    for route in routes:
+                        selected_classes.add(route.controller)
+                        print(f"   {html_func_id} → {route.describe()}")
                 
                 # Thêm mapped controllers vào selected classes
-                for html_func_id, controller_name in controller_mappings.items():
+                for html_func_id, controller_name in mappings.items():
+                    if html_func_id in html_routes:
+                        continue
                     if controller_name in self.classes:
                         selected_classes.add(controller_name)
                         print(f"   {html_func_id} → {controller_name}")
@@ -776,86 +930,66 @@ class EnhancedJavaDependencyAnalyzer:
         
         # Filter method calls - keep calls involving selected classes
         filtered_method_calls = defaultdict(lambda: defaultdict(list))
-        
-        for source_file, targets in self.method_calls.items():
-            # Check if source file contains selected classes
+        edge_index = self.edge_index()
+        # File chứa selected classes, và edges/files được chọn qua method id - chỉ là tra index
+        selected_files = edge_index.files_of_classes(selected_classes)
+        method_edges = edge_index.edges_for_method_keys(selected_methods)
+        method_files = {file_path for edge in method_edges for file_path in edge}
+        
+        for source_file in sorted(selected_files | method_files, key=edge_index.source_order):
+            targets = self.method_calls.get(source_file)
+            if not targets:
+                continue
             source_classes = self.file_to_classes.get(source_file, set())
-            source_has_selected = any(cls in selected_classes for cls in source_classes)
-            
-            # Nếu source không được chọn, nhưng có methods cụ thể được chọn từ source này
-            if not source_has_selected and selected_methods:
-                source_rel = str(Path(source_file).relative_to(self.source_directory))
-                for method_info in selected_methods:
-                    if source_rel in method_info:
-                        source_has_selected = True
-                        break
             
-            if source_has_selected:
-                for target_file, methods in targets.items():
-                    # Check if target file contains selected classes
-                    target_classes = self.file_to_classes.get(target_file, set())
-                    target_has_selected = any(cls in selected_classes for cls in target_classes)
-                    
-                    # Hoặc target được tham chiếu trong selected methods
-                    if not target_has_selected and selected_methods:
-                        target_rel = str(Path(target_file).relative_to(self.source_directory))
-                        for method_info in selected_methods:
-                            if target_rel in method_info:
-                                target_has_selected = True
-                                break
+            for target_file, methods in targets.items():
+                # Target chứa selected classes, hoặc được tham chiếu trong selected methods
+                target_classes = self.file_to_classes.get(target_file, set())
+                if target_file not in selected_files and target_file not in method_files:
+                    continue
+                
+                if selected_methods:
+                    # Nếu có method cụ thể được chọn, filter methods
+                    filtered_methods = method_edges.get((source_file, target_file), [])
                     
-                    if target_has_selected:
-                        # Nếu có method cụ thể được chọn, filter methods
-                        if selected_methods:
-                            source_rel = str(Path(source_file).relative_to(self.source_directory))
-                            target_rel = str(Path(target_file).relative_to(self.source_directory))
-                            
-                            filtered_methods = []
-                            for method in methods:
-                                method_key = f"{method}_{source_rel}_{target_rel}"
-                                if method_key in selected_methods:
-                                    filtered_methods.append(method)
-                            
-                            # Nếu không có method cụ thể nào được chọn cho edge này,
-                            # nhưng cả source và target classes được chọn, thì giữ tất cả methods
-                            if not filtered_methods:
-                                source_cls_selected = any(cls in selected_classes for cls in source_classes)
-                                target_cls_selected = any(cls in selected_classes for cls in target_classes)
-                                if source_cls_selected and target_cls_selected:
-                                    filtered_methods = methods
-                                
-                            if filtered_methods:
-                                filtered_method_calls[source_file][target_file] = filtered_methods
+                    # Nếu không có method cụ thể nào được chọn cho edge này,
+                    # nhưng cả source và target classes được chọn, thì giữ tất cả methods
+                    if not filtered_methods and source_file in selected_files and target_file in selected_files:
+                        filtered_methods = methods
+                        
+                    if filtered_methods:
+                        filtered_method_calls[source_file][target_file] = filtered_methods
+                        
+                        # Đảm bảo cả source và target classes được add
+                        for cls in source_classes:
+                            if cls not in filtered_classes and source_file in self.file_to_classes:
+                                filtered_classes[cls] = source_file
+                                filtered_file_to_classes[source_file] = self.file_to_classes[source_file]
                                 
-                                # Đảm bảo cả source và target classes được add
-                                for cls in source_classes:
-                                    if cls not in filtered_classes and source_file in self.file_to_classes:
-                                        filtered_classes[cls] = source_file
-                                        filtered_file_to_classes[source_file] = self.file_to_classes[source_file]
-                                        
-                                for cls in target_classes:
-                                    if cls not in filtered_classes and target_file in self.file_to_classes:
-                                        filtered_classes[cls] = target_file
-                                        filtered_file_to_classes[target_file] = self.file_to_classes[target_file]
-                        else:
-                            # No specific method filtering, include all methods for selected classes
-                            filtered_method_calls[source_file][target_file] = methods
+                        for cls in target_classes:
+                            if cls not in filtered_classes and target_file in self.file_to_classes:
+                                filtered_classes[cls] = target_file
+                                filtered_file_to_classes[target_file] = self.file_to_classes[target_file]
+                else:
+                    # No specific method filtering, include all methods for selected classes
+                    filtered_method_calls[source_file][target_file] = methods
+                    
+                    # Add related classes
+                    for cls in source_classes:
+                        if cls not in filtered_classes:
+                            filtered_classes[cls] = source_file
+                            filtered_file_to_classes[source_file] = self.file_to_classes[source_file]
                             
-                            # Add related classes
-                            for cls in source_classes:
-                                if cls not in filtered_classes:
-                                    filtered_classes[cls] = source_file
-                                    filtered_file_to_classes[source_file] = self.file_to_classes[source_file]
-                                    
-                            for cls in target_classes:
-                                if cls not in filtered_classes:
-                                    filtered_classes[cls] = target_file  
-                                    filtered_file_to_classes[target_file] = self.file_to_classes[target_file]
+                    for cls in target_classes:
+                        if cls not in filtered_classes:
+                            filtered_classes[cls] = target_file  
+                            filtered_file_to_classes[target_file] = self.file_to_classes[target_file]
         
         # Update analyzer data
         self.classes = filtered_classes
         self.file_to_classes = filtered_file_to_classes
         self.method_calls = filtered_method_calls
+        self._edge_index = None
         
         # Clear hidden nodes/edges to show filtered results
         self.hidden_nodes.clear()
@@ -888,15 +1022,14 @@ class EnhancedJavaDependencyAnalyzer:
                         print(f"      ➕ Added method dependency: {target_class}")
             
             # Add reverse dependencies (ai gọi class này)
-            for source_file, targets in self.method_calls.items():
-                if class_file in targets:
-                    source_classes = self.file_to_classes.get(source_file, set())
-                    for source_class in source_classes:
-                        if (source_class.endswith('Service') or 
-                            source_class.endswith('Repository') or
-                            source_class.endswith('Controller')):
-                            selected_classes.add(source_class)
-                            print(f"      ➕ Added reverse dependency: {source_class}")
+            for source_file in self.edge_index().callers_of(class_file):
+                source_classes = self.file_to_classes.get(source_file, set())
+                for source_class in source_classes:
+                    if (source_class.endswith('Service') or 
+                        source_class.endswith('Repository') or
+                        source_class.endswith('Controller')):
+                        selected_classes.add(source_class)
+                        print(f"      ➕ Added reverse dependency: {source_class}")
                             
         except Exception as e:
             print(f"      ❌ Error adding dependencies for {class_name}: {e}")
\ No newline at end of file
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import psycopg2
+from db_config import DB_CONFIG
+from html_db import connect_kwargs
 
 try:
-    conn = psycopg2.connect(host='localhost', database='graph', user='postgres', password='123456')
+    conn = psycopg2.connect(**connect_kwargs(DB_CONFIG))
     cursor = conn.cursor()
     
     # Check if html_function table exists and its structure
@@ -11,7 +11,7 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT', '5432'),
     'database': os.getenv('DB_NAME', 'graph'),
     'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', '123456'),
+    'password': os.getenv('DB_PASSWORD', ''),  # trống: libpq dùng PGPASSWORD/.pgpass
     'schema': os.getenv('DB_SCHEMA', 'public')
 }
 
@@ -19,23 +19,30 @@ DB_CONFIG = {
 SETUP_INSTRUCTIONS = """
 🔧 PostgreSQL Setup Instructions:
 
+0. Không cần PostgreSQL cho chạy local/CI: đặt HTML_DB_BACKEND=sqlite để lưu HTML functions
+   trong file SQLite HTML_DB_PATH (html_functions.db). Mặc định luôn là PostgreSQL
+
 1. Đảm bảo PostgreSQL đang chạy
 2. Tạo database 'graph' nếu chưa có:
    CREATE DATABASE graph;
 
-3. Tạo table html_function:
-   CREATE TABLE public.html_function (
-       function_id VARCHAR(255) PRIMARY KEY,
-       function_name VARCHAR(255) NOT NULL
-   );
+3. Tạo/cập nhật schema (html_function, html_controller_mapping, indexes, materialized view):
+   python html_migrations.py
+   (import_html_functions.py và frontend_indexer.py cũng áp dụng migration còn thiếu; server và
+   analyzer không tự chạy DDL - mở store với schema cũ là lỗi ngay: "html schema version N < M, run ...")
+   Bảng html_function tạo theo hướng dẫn cũ (function_id VARCHAR, vd. 'login_form') được chuyển
+   sang function_id INTEGER: id cũ giữ trong cột legacy_id, id dạng số giữ nguyên số, id còn lại
+   được cấp số tiếp theo (theo thứ tự legacy_id)
 
 4. Thêm sample data (optional):
-   INSERT INTO public.html_function (function_id, function_name) VALUES
-   ('login_form', 'loginForm()'),
-   ('user_list', 'displayUsers()'),
-   ('order_submit', 'submitOrder()'),
-   ('product_search', 'searchProducts()'),
-   ('payment_process', 'processPayment()');
+   python import_html_functions.py functions.csv
+   hoặc:
+   INSERT INTO public.html_function (function_id, function_name, controller) VALUES
+   (1, 'loginForm()', 'UserController'),
+   (2, 'displayUsers()', 'UserController'),
+   (3, 'submitOrder()', 'OrderController'),
+   (4, 'searchProducts()', 'ProductController'),
+   (5, 'processPayment()', 'OrderController');
 
 5. Cấu hình connection bằng environment variables:
    set DB_HOST=localhost
@@ -45,7 +52,9 @@ SETUP_INSTRUCTIONS = """
    set DB_PASSWORD=your_password
    set DB_SCHEMA=public
 
-   Hoặc sửa trực tiếp trong db_config.py
+   set HTML_DB_BACKEND=postgres
+
+   Không ghi password vào db_config.py - dùng DB_PASSWORD, PGPASSWORD hoặc ~/.pgpass
 """
 
 def print_setup_instructions():
@@ -54,11 +63,11 @@ def print_setup_instructions():
 
 def validate_config():
     """Kiểm tra config có đầy đủ không"""
-    required_fields = ['host', 'port', 'database', 'user', 'password']
+    required_fields = ['host', 'port', 'database', 'user']
     missing = []
     
     for field in required_fields:
-        if not DB_CONFIG[field] or DB_CONFIG[field] == 'your_password_here':
+        if not DB_CONFIG[field]:
             missing.append(field)
     
     if missing:
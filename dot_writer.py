@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Node/edge model cho Graphviz DOT và streaming writer.
+
+Các analyzer cùng đóng góp node/edge vào một DotGraph; output được ghi thẳng
+ra file (hoặc stdin của Graphviz) thay vì ghép và quét lại chuỗi DOT.
+"""
+
+import copy
+import io
+
+
+class DotGraph:
+    def __init__(self, name: str = "JavaDependencies"):
+        self.name = name
+        self.statements = []  # graph-level statements như 'rankdir=LR'
+        self._nodes = {}  # node_name -> attrs (giữ thứ tự thêm vào)
+        self._edges = []  # (source, target, attrs)
+        self.groups = {}  # node_name -> package/group, không ghi ra DOT (dùng khi gộp node)
+
+    def add_statement(self, statement: str):
+        """Thêm statement cấp graph (rankdir, default node/edge attrs...)"""
+        self.statements.append(statement)
+
+    def has_node(self, name: str) -> bool:
+        return name in self._nodes
+
+    def add_node(self, name: str, **attrs):
+        """Thêm node; nếu node đã có thì merge attributes như Graphviz"""
+        if name in self._nodes:
+            self._nodes[name].update(attrs)
+        else:
+            self._nodes[name] = dict(attrs)
+
+    def get_node(self, name: str) -> dict:
+        return self._nodes.get(name)
+
+    def set_group(self, name: str, group: str):
+        self.groups[name] = group
+
+    def remove_node(self, name: str):
+        """Xóa node và mọi edge nối với nó"""
+        self._nodes.pop(name, None)
+        self._edges = [e for e in self._edges if e[0] != name and e[1] != name]
+
+    def add_edge(self, source: str, target: str, **attrs):
+        self._edges.append((source, target, dict(attrs)))
+
+    @property
+    def nodes(self):
+        return self._nodes.items()
+
+    @property
+    def edges(self):
+        return self._edges
+
+    @property
+    def node_count(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges)
+
+    def write(self, stream):
+        """Ghi DOT ra text stream theo từng dòng"""
+        stream.write(f"digraph {self.name} {{\n")
+        for statement in self.statements:
+            stream.write(f"    {statement};\n")
+        stream.write("\n")
+
+        for name, attrs in self._nodes.items():
+            stream.write(f'    {_quote(name)}{_format_attrs(attrs)};\n')
+
+        stream.write("\n")
+        for source, target, attrs in self._edges:
+            stream.write(f'    {_quote(source)} -> {_quote(target)}{_format_attrs(attrs)};\n')
+
+        stream.write("}\n")
+
+    def copy(self) -> "DotGraph":
+        return copy.deepcopy(self)
+
+    def to_string(self) -> str:
+        buffer = io.StringIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+
+def _quote(value) -> str:
+    # Giữ nguyên escape sequence của DOT (\n, \l), chỉ escape dấu nháy kép
+    return '"' + str(value).replace('"', '\\"') + '"'
+
+
+def _format_attrs(attrs: dict) -> str:
+    if not attrs:
+        return ""
+    return " [" + ", ".join(f"{key}={_quote(value)}" for key, value in attrs.items()) + "]"
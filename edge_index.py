@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Inverted index trên method_calls của analyzer (source file -> target file -> labels), build
+một lần cho mỗi analysis snapshot. Filter theo selection chỉ còn là tra cứu và giao các tập:
+tên function -> edges (substring qua trigram trên bảng label duy nhất), method id của
+/api/functions -> edge, class -> files, file -> các file gọi tới nó; relative path của mỗi
+file chỉ tính một lần.
+"""
+
+import re
+from collections import defaultdict
+from pathlib import Path
+from function_index import trigrams
+
+_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*\Z')
+_CALL_NAME_PATTERN = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\s*\(')
+
+
+def called_names(label: str) -> set:
+    """Tên method mà label gọi: cả label nếu là một tên ('getUserById'), hoặc các tên đứng trước '('"""
+    if _IDENTIFIER_PATTERN.match(label):
+        return {label}
+    return set(_CALL_NAME_PATTERN.findall(label))
+
+
+def is_structural_label(label: str) -> bool:
+    """Label luôn giữ khi filter theo tên function: field, implements, injection, response..."""
+    return (label.startswith('field:') or
+            label.startswith('implements') or
+            label.startswith('@Autowired') or
+            label.startswith('success') or
+            'dependency' in label.lower())
+
+
+class EdgeIndex:
+    """
+    Mỗi label trên mỗi edge là một edge id, theo đúng thứ tự của method_calls lúc build;
+    kết quả filter sắp theo edge id nên giữ nguyên thứ tự file và label như trước.
+    Index không đổi sau khi build - analyzer build lại khi method_calls thay đổi.
+    """
+
+    def __init__(self, analyzer):
+        self.source_directory = analyzer.source_directory
+        self._relative_paths = {}
+        self.edges = []  # edge id -> (source_file, target_file, label)
+        self._source_order = {}  # source file -> thứ tự trong method_calls
+        self._incoming = defaultdict(list)  # target file -> [source file]
+        self._method_keys = defaultdict(list)  # '<label>_<source_rel>_<target_rel>' -> [edge id]
+        self._structural = []  # edge ids có label cấu trúc
+        label_ids = {}  # lowercased label -> label id
+        self._labels = []  # label id -> lowercased label
+        self._label_edges = []  # label id -> [edge id]
+        self._call_edges = defaultdict(list)  # tên method được gọi (nguyên tên) -> [edge id]
+        label_calls = {}  # label -> called_names(label)
+
+        self.class_files = defaultdict(set)  # simple class name -> files
+        for file_path, class_names in list(analyzer.file_to_classes.items()):
+            for class_name in class_names:
+                self.class_files[class_name].add(file_path)
+
+        for source_file, targets in list(analyzer.method_calls.items()):
+            self._source_order[source_file] = len(self._source_order)
+            source_rel = self.relative(source_file)
+            for target_file, methods in list(targets.items()):
+                target_rel = self.relative(target_file)
+                self._incoming[target_file].append(source_file)
+                for method in list(methods):
+                    edge_id = len(self.edges)
+                    self.edges.append((source_file, target_file, method))
+                    self._method_keys[f"{method}_{source_rel}_{target_rel}"].append(edge_id)
+                    if is_structural_label(method):
+                        self._structural.append(edge_id)
+                    names = label_calls.get(method)
+                    if names is None:
+                        names = label_calls[method] = called_names(method)
+                    for name in names:
+                        self._call_edges[name].append(edge_id)
+
+                    label = method.lower()
+                    label_id = label_ids.get(label)
+                    if label_id is None:
+                        label_id = label_ids[label] = len(self._labels)
+                        self._labels.append(label)
+                        self._label_edges.append([])
+                    self._label_edges[label_id].append(edge_id)
+
+        self._trigrams = defaultdict(list)  # trigram -> [label id]
+        for label_id, label in enumerate(self._labels):
+            for gram in trigrams(label):
+                self._trigrams[gram].append(label_id)
+
+    def __len__(self):
+        return len(self.edges)
+
+    def relative(self, file_path) -> str:
+        """Path của file so với source_directory (custom node/ngoài thư mục: giữ nguyên)"""
+        rel = self._relative_paths.get(file_path)
+        if rel is None:
+            try:
+                rel = str(Path(file_path).relative_to(self.source_directory))
+            except ValueError:
+                rel = str(file_path)
+            self._relative_paths[file_path] = rel
+        return rel
+
+    def source_order(self, file_path) -> int:
+        return self._source_order.get(file_path, len(self._source_order))
+
+    def files_of_classes(self, class_names) -> set:
+        files = set()
+        for class_name in class_names:
+            files.update(self.class_files.get(class_name, ()))
+        return files
+
+    def callers_of(self, target_file) -> list:
+        """Các source file có edge tới target_file"""
+        return self._incoming.get(target_file, [])
+
+    def _matching_label_ids(self, name: str):
+        if len(name) >= 3:
+            postings = sorted((self._trigrams.get(gram, []) for gram in trigrams(name)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    break
+            # Trigram chỉ là điều kiện cần, kiểm tra lại substring
+            return [label_id for label_id in candidates if name in self._labels[label_id]]
+        return [label_id for label_id, label in enumerate(self._labels) if name in label]
+
+    def edges_matching_names(self, names) -> set:
+        """Edge ids có label chứa (không phân biệt hoa thường) một trong các tên, cộng các edge cấu trúc"""
+        matched = set(self._structural)
+        for name in names:
+            for label_id in self._matching_label_ids(name.lower()):
+                matched.update(self._label_edges[label_id])
+        return matched
+
+    def edges_calling(self, names) -> set:
+        """Edge ids có label gọi đúng (nguyên tên, phân biệt hoa thường) một trong các method"""
+        matched = set()
+        for name in names:
+            matched.update(self._call_edges.get(name, ()))
+        return matched
+
+    def edges_for_method_keys(self, method_keys) -> dict:
+        """(source_file, target_file) -> labels được chọn qua id 'method_<label>_<source_rel>_<target_rel>'"""
+        selected = defaultdict(list)
+        edge_ids = sorted(edge_id for key in method_keys for edge_id in self._method_keys.get(key, ()))
+        for edge_id in edge_ids:
+            source_file, target_file, method = self.edges[edge_id]
+            selected[(source_file, target_file)].append(method)
+        return selected
+
+    def method_calls_for(self, edge_ids):
+        """Dựng lại method_calls chỉ gồm các edge ids, giữ thứ tự gốc"""
+        method_calls = defaultdict(lambda: defaultdict(list))
+        for edge_id in sorted(edge_ids):
+            source_file, target_file, method = self.edges[edge_id]
+            method_calls[source_file][target_file].append(method)
+        return method_calls
@@ -14,9 +14,13 @@ import subprocess
 from pathlib import Path
 from collections import defaultdict
 from analyzer import EnhancedJavaDependencyAnalyzer
+from method_graph import CONSTRUCTOR, MethodGraph, java_methods, method_node
 
 
 class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
+    analysis_phases = EnhancedJavaDependencyAnalyzer.analysis_phases + [
+        "interfaces", "service_impl", "enhanced_dependencies", "cross_reference", "method_graph"]
+    
     def __init__(self, source_directory: str):
         super().__init__(source_directory)
         
@@ -40,19 +44,27 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         super().analyze()
         
         print("🔍 Phase 2: Interface-Implementation detection...")
+        self.progress.start_phase("interfaces")
         self._detect_interfaces_and_implementations()
         
         print("🔍 Phase 3: Service-Implementation mapping...")
+        self.progress.start_phase("service_impl")
         self._detect_service_impl_relationships()
         
         print("🔍 Phase 4: Enhanced dependency analysis...")
         java_files = list(self.source_directory.rglob("*.java"))
-        for java_file in java_files:
-            self._enhanced_dependency_analysis(java_file)
+        self._scan_files("enhanced_dependencies", java_files, self._enhanced_dependency_analysis)
             
         print("🔍 Phase 5: Cross-reference analysis...")
+        self.progress.start_phase("cross_reference")
         self._cross_reference_analysis()
         
+        print("🔍 Phase 6: Method call graph...")
+        self.method_graph = MethodGraph()
+        self._scan_files("method_graph", java_files, self._extract_method_graph)
+        self._link_method_implementations()
+        print(f"✅ Method graph: {len(self.method_graph)} methods, {self.method_graph.edge_count} calls")
+        
     def _detect_interfaces_and_implementations(self):
         """Detect interface-implementation relationships"""
         java_files = list(self.source_directory.rglob("*.java"))
@@ -60,8 +72,7 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         # First pass: identify interfaces
         for java_file in java_files:
             try:
-                with open(java_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                content = self._read_source(java_file)
             except:
                 continue
                 
@@ -76,8 +87,7 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         # Second pass: find implementations
         for java_file in java_files:
             try:
-                with open(java_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                content = self._read_source(java_file)
             except:
                 continue
                 
@@ -110,8 +120,7 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         # Find all Service interfaces and their implementations
         for java_file in java_files:
             try:
-                with open(java_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                content = self._read_source(java_file)
             except:
                 continue
             
@@ -160,19 +169,13 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         self._analyze_selected_methods_in_implementations()
     
     def _analyze_selected_methods_in_implementations(self):
-        """Analyze selected methods in implementation classes for detailed dependencies"""
+        """Dependencies trực tiếp của các selected methods trong implementation classes, lấy từ method_graph"""
         for service_name, impl_file in self.service_to_impl.items():
-            try:
-                with open(impl_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except:
-                continue
-                
             print(f"🔍 Analyzing methods in {impl_file.stem}...")
             
             # Find selected methods in this implementation
             for method_name in self.selected_functions:
-                method_dependencies = self._extract_method_dependencies(content, method_name, impl_file)
+                method_dependencies = self.method_graph.dependency_labels(method_node(impl_file.stem, method_name))
                 if method_dependencies:
                     self.method_specific_dependencies[impl_file][method_name] = method_dependencies
                     print(f"  📝 {method_name}: found {len(method_dependencies)} dependencies")
@@ -180,99 +183,106 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
                     for dep in method_dependencies:
                         print(f"    → {dep}")
     
-    def _extract_method_dependencies(self, content, method_name, impl_file):
-        """Extract dependencies for a specific method"""
-        import re
-        
-        dependencies = set()
-        
-        # Find the method definition and extract its body
-        method_pattern = rf'(?:@Override\s+)?(?:public|private|protected)?\s+[\w<>\[\],\s]+\s+{method_name}\s*\([^{{]*\)\s*(?:throws[^{{]*)?\s*\{{([^}}]*(?:\{{[^}}]*\}}[^}}]*)*)\}}'
-        method_match = re.search(method_pattern, content, re.DOTALL)
-        
-        if not method_match:
-            # Try simpler pattern
-            simple_pattern = rf'{method_name}\s*\([^{{]*\)\s*\{{([^}}]*(?:\{{[^}}]*\}}[^}}]*)*)\}}'
-            method_match = re.search(simple_pattern, content, re.DOTALL)
+    def _extract_method_graph(self, java_file: Path):
+        """Thêm các method của file và lời gọi trong thân chúng vào method_graph"""
+        try:
+            content = self._read_source(java_file)
+        except:
+            return
         
-        if method_match:
-            method_body = method_match.group(1)
-            
-            # Extract different types of dependencies from method body
-            processed_calls = set()  # Track processed method calls to avoid duplicates
-            
-            # 1. Repository/Service calls (prioritize this pattern)
-            repo_service_pattern = r'([a-z][a-zA-Z0-9_]*(?:Repository|Service))\.([a-z][a-zA-Z0-9_]*)\s*\('
-            repo_service_calls = re.findall(repo_service_pattern, method_body)
+        cleaned_content = self._clean_content(content)
+        methods = list(java_methods(cleaned_content))
+        class_methods = defaultdict(set)
+        for class_name, method_name, _ in methods:
+            class_methods[class_name].add(method_name)
+        
+        for class_name, method_name, method_body in methods:
+            node = self.method_graph.add_method(class_name, method_name, java_file)
+            if method_body is None:
+                continue
+            for target, kind in self._method_body_calls(method_body, java_file, content, class_name,
+                                                        class_methods[class_name]):
+                self.method_graph.add_call(node, target, kind)
+    
+    def _method_body_calls(self, method_body, java_file, content, class_name, own_methods):
+        """(target 'Class#method', kind) của các lời gọi trong thân một method"""
+        processed_calls = set()  # Track processed method calls to avoid duplicates
+        
+        # 1. Repository/Service calls (prioritize this pattern)
+        repo_service_pattern = r'([a-z][a-zA-Z0-9_]*(?:Repository|Service))\.([a-z][a-zA-Z0-9_]*)\s*\('
+        for field_name, method_call in re.findall(repo_service_pattern, method_body):
+            processed_calls.add(f"{field_name}.{method_call}()")
             
-            for field_name, method_call in repo_service_calls:
-                call_signature = f"{field_name}.{method_call}()"
+            # Resolve field type to class name
+            field_type = self._resolve_field_type(java_file, field_name, content)
+            yield method_node(field_type or field_name, method_call), "call"
+        
+        # 2. Constructor calls (new SomeClass()) và exception throws
+        for class_name_called in re.findall(r'new\s+([A-Z][a-zA-Z0-9_]*)\s*\(', method_body):
+            yield method_node(class_name_called, CONSTRUCTOR), "new"
+        for exception_name in re.findall(r'throw\s+new\s+([A-Z][a-zA-Z0-9_]*Exception[a-zA-Z0-9_]*)\s*\(', method_body):
+            yield method_node(exception_name, CONSTRUCTOR), "throw"
+        
+        # 3. Static method calls (only for true static calls like Math.max(), Collections.sort())
+        static_pattern = r'(?<![\w.])([A-Z][a-zA-Z0-9_]*)\.([a-zA-Z][a-zA-Z0-9_]*)\s*\('
+        for static_class, method_call in re.findall(static_pattern, method_body):
+            call_signature = f"{static_class}.{method_call}()"
+            # Skip if already processed, skip common Java classes, and skip Repository/Service classes
+            if (call_signature not in processed_calls and 
+                static_class not in ['System', 'Math', 'String', 'Objects', 'Collections', 'Arrays'] and
+                not static_class.endswith('Repository') and 
+                not static_class.endswith('Service') and
+                not any(call_signature.lower().startswith(pc.lower()) for pc in processed_calls)):
                 processed_calls.add(call_signature)
-                
-                # Resolve field type to class name
-                field_type = self._resolve_field_type(impl_file, field_name)
-                if field_type:
-                    dependencies.add(f"{field_type}#{method_call}")
-                else:
-                    dependencies.add(f"{field_name}#{method_call}")
-            
-            # 2. Constructor calls (new SomeClass())
-            constructor_pattern = r'new\s+([A-Z][a-zA-Z0-9_]*)\s*\('
-            constructors = re.findall(constructor_pattern, method_body)
-            for class_name in constructors:
-                dependencies.add(f"{class_name}#constructor")
-            
-            # 3. Static method calls (only for true static calls like Math.max(), Collections.sort())
-            static_pattern = r'([A-Z][a-zA-Z0-9_]*)\.([a-zA-Z][a-zA-Z0-9_]*)\s*\('
-            static_calls = re.findall(static_pattern, method_body)
-            for class_name, method_call in static_calls:
-                call_signature = f"{class_name}.{method_call}()"
-                # Skip if already processed, skip common Java classes, and skip Repository/Service classes
-                if (call_signature not in processed_calls and 
-                    class_name not in ['System', 'Math', 'String', 'Objects', 'Collections', 'Arrays'] and
-                    not class_name.endswith('Repository') and 
-                    not class_name.endswith('Service') and
-                    not any(call_signature.lower().startswith(pc.lower()) for pc in processed_calls)):
-                    processed_calls.add(call_signature)
-                    dependencies.add(f"{class_name}#static_{method_call}")
-            
-            # 4. Exception throws
-            exception_pattern = r'throw\s+new\s+([A-Z][a-zA-Z0-9_]*Exception[a-zA-Z0-9_]*)\s*\('
-            exceptions = re.findall(exception_pattern, method_body)
-            for exception_name in exceptions:
-                dependencies.add(f"{exception_name}#exception")
-            
-            # 5. Enum access (Order.OrderStatus)
-            enum_pattern = r'([A-Z][a-zA-Z0-9_]*)\.([A-Z][a-zA-Z0-9_]*)\s*(?!\()'
-            enum_accesses = re.findall(enum_pattern, method_body)
-            for class_name, enum_value in enum_accesses:
-                if not enum_value.endswith('()'):  # Not a method call
-                    dependencies.add(f"{class_name}#enum_{enum_value}")
-            
-            # 6. Method calls on local variables or fields (skip already processed)
-            local_method_pattern = r'([a-z][a-zA-Z0-9_]*)\.([a-z][a-zA-Z0-9_]*)\s*\('
-            local_calls = re.findall(local_method_pattern, method_body)
-            for var_name, method_call in local_calls:
-                call_signature = f"{var_name}.{method_call}()"
-                # Skip if already processed by Repository/Service pattern
-                if call_signature not in processed_calls:
-                    # Try to resolve variable type
-                    var_type = self._resolve_local_variable_type(method_body, var_name)
-                    if var_type:
-                        dependencies.add(f"{var_type}#method_{method_call}")
-                    # Skip the fallback for Repository/Service since it's already handled above
-        
-        return dependencies
+                yield method_node(static_class, method_call), "static"
+        
+        # 4. Enum access (Order.OrderStatus)
+        for enum_class, enum_value in re.findall(r'(?<![\w.])([A-Z][a-zA-Z0-9_]*)\.([A-Z][a-zA-Z0-9_]*)\s*(?!\()', method_body):
+            yield method_node(enum_class, enum_value), "enum"
+        
+        # 5. Method calls on this, local variables or fields (skip already processed)
+        local_method_pattern = r'([a-z][a-zA-Z0-9_]*)\.([a-z][a-zA-Z0-9_]*)\s*\('
+        for var_name, method_call in re.findall(local_method_pattern, method_body):
+            if f"{var_name}.{method_call}()" in processed_calls:
+                continue
+            if var_name == 'this':
+                yield method_node(class_name, method_call), "self"
+                continue
+            var_type = self._resolve_local_variable_type(method_body, var_name)
+            if var_type:
+                yield method_node(var_type, method_call), "local"
+            elif var_name in self.field_types.get(java_file, {}):
+                yield method_node(self.field_types[java_file][var_name], method_call), "call"
+        
+        # 6. Unqualified calls to methods of the same class
+        for method_call in re.findall(r'(?<![.\w])([a-z][a-zA-Z0-9_]*)\s*\(', method_body):
+            if method_call in own_methods:
+                yield method_node(class_name, method_call), "self"
     
-    def _resolve_field_type(self, java_file, field_name):
-        """Resolve field name to its type/class"""
+    def _link_method_implementations(self):
+        """Edge implements Interface#m -> Impl#m (interface và Service -> ServiceImpl)"""
+        implementations = defaultdict(set)
+        for interface_name, impl_classes in self.implementations.items():
+            implementations[interface_name].update(impl_classes)
+        for service_name, impl_file in self.service_to_impl.items():
+            implementations[service_name].add(impl_file.stem)
+        
+        for interface_name, impl_classes in implementations.items():
+            for method_name in self.method_graph.methods_of(interface_name):
+                for impl_class in impl_classes:
+                    impl_node = method_node(impl_class, method_name)
+                    if impl_node in self.method_graph.methods:
+                        self.method_graph.add_call(method_node(interface_name, method_name), impl_node, "implements")
+    
+    def _resolve_field_type(self, java_file, field_name, content=None):
+        """Resolve field name to its type/class (content: nội dung file nếu đã đọc sẵn)"""
         if java_file in self.field_types and field_name in self.field_types[java_file]:
             return self.field_types[java_file][field_name]
         
         # Try to find in constructor parameters or field declarations
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if content is None:
+                content = self._read_source(java_file)
                 
             # Look for field declaration
             field_pattern = rf'(?:private|protected|public)?\s+([A-Z][a-zA-Z0-9_]*(?:<[^>]+>)?)\s+{field_name}\s*[;=]'
@@ -312,8 +322,7 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
     def _enhanced_dependency_analysis(self, java_file: Path):
         """Enhanced analysis cho một file Java"""
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_source(java_file)
         except:
             return
             
@@ -520,8 +529,7 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         
         # Try to read file content and find local variable declarations
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = self._read_source(java_file)
                 
             # Pattern for local variable declarations
             # Type variableName = ...
@@ -575,6 +583,7 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         print(f"🔀 Conditional method calls: {sum(len(targets) for targets in self.conditional_calls.values())}")
         print(f"⛓️ Method chaining detected: {sum(len(targets) for targets in self.chained_calls.values())}")
         print(f"💉 Annotation-based dependencies: {sum(len(deps) for deps in self.annotation_mappings.values())}")
+        print(f"🧭 Method call graph: {len(self.method_graph)} methods, {self.method_graph.edge_count} calls")
         
         # Service-Implementation mappings
         print(f"🔧 Service-Implementation mappings: {len(self.service_to_impl)}")
@@ -610,103 +619,81 @@ class SuperEnhancedJavaDependencyAnalyzer(EnhancedJavaDependencyAnalyzer):
         
         print(f"{'='*50}")
     
-    def generate_enhanced_graph(self, output_file: str = "dependencies.dot"):
+    def generate_enhanced_graph(self, output_file: str = "dependencies.dot", planner=None):
         """Override để sử dụng enhanced summary"""
-        result = super().generate_enhanced_graph(output_file)
+        result = super().generate_enhanced_graph(output_file, planner)
         
         # Print enhanced summary after generation
         self.print_enhanced_summary()
         
         return result
     
-    def _generate_dot_content(self):
+    def _build_dot_graph(self):
         """Override để thêm Service Implementation nodes và method-specific dependencies"""
-        # Get base DOT content từ parent class
-        base_content = super()._generate_dot_content()
-        content_lines = base_content.split('\n')
-        
-        # Find insert position (before closing brace)
-        insert_pos = len(content_lines) - 1
-        while insert_pos > 0 and content_lines[insert_pos].strip() != '}':
-            insert_pos -= 1
-        
-        # Prepare additional content
-        additional_lines = []
-        additional_lines.append("")
-        additional_lines.append("    // Service Implementation Nodes")
+        # Get base DOT model từ parent class
+        graph = super()._build_dot_graph()
         
         # Add Service Implementation nodes
         for service_name, impl_file in self.service_to_impl.items():
             impl_name = impl_file.stem
             
             # Check if implementation has method-specific dependencies
-            has_method_deps = impl_file in self.method_specific_dependencies
+            if impl_file not in self.method_specific_dependencies:
+                continue
             
-            if has_method_deps:
-                # Create implementation node with special styling
-                url = f"javascript:showNodeInfo('{impl_name}')"
-                additional_lines.append(f'    "{impl_name}" [label="{impl_name}\\n(Implementation)", URL="{url}", fillcolor="lightcoral", shape="box"];')
-                
-                # Add edge from service to implementation
-                service_url = f"javascript:showEdgeInfo('{service_name}', '{impl_name}')"
-                additional_lines.append(f'    "{service_name}" -> "{impl_name}" [label="implements", URL="{service_url}", color="red", style="dashed"];')
-                
-                # Add method-specific dependency nodes and edges
-                for method_name, dependencies in self.method_specific_dependencies[impl_file].items():
-                    if dependencies:
-                        additional_lines.append("")
-                        additional_lines.append(f"    // {method_name} method dependencies in {impl_name}")
+            # Create implementation node with special styling
+            graph.add_node(impl_name, label=f"{impl_name}\\n(Implementation)",
+                           URL=f"javascript:showNodeInfo('{impl_name}')", fillcolor="lightcoral", shape="box")
+            
+            # Add edge from service to implementation
+            graph.add_edge(service_name, impl_name, label="implements",
+                           URL=f"javascript:showEdgeInfo('{service_name}', '{impl_name}')", color="red", style="dashed")
+            
+            # Add method-specific dependency nodes and edges
+            for method_name, dependencies in self.method_specific_dependencies[impl_file].items():
+                for dep in dependencies:
+                    if '#' not in dep:
+                        continue
+                    class_name, method_call = dep.split('#', 1)
+                    dep_node_name = class_name
+                    
+                    # Create dependency node if it doesn't exist
+                    if not graph.has_node(dep_node_name):
+                        # Determine node color based on type
+                        if 'Repository' in class_name:
+                            color = "lightyellow"
+                            shape = "box"
+                        elif 'Service' in class_name:
+                            color = "lightblue"
+                            shape = "box"
+                        elif 'Exception' in class_name:
+                            color = "mistyrose"
+                            shape = "box"
+                        elif method_call == 'enum':
+                            color = "lightgreen"
+                            shape = "diamond"
+                        else:
+                            color = "white"
+                            shape = "box"
                         
-                        for dep in dependencies:
-                            if '#' in dep:
-                                class_name, method_call = dep.split('#', 1)
-                                
-                                # Create dependency node if it doesn't exist
-                                dep_node_name = f"{class_name}"
-                                
-                                # Check if this dependency node already exists in base content
-                                node_exists = any(f'"{dep_node_name}"' in line and '[label=' in line for line in content_lines)
-                                
-                                if not node_exists:
-                                    # Determine node color based on type
-                                    if 'Repository' in class_name:
-                                        color = "lightyellow"
-                                        shape = "box"
-                                    elif 'Service' in class_name:
-                                        color = "lightblue"
-                                        shape = "box"
-                                    elif 'Exception' in class_name:
-                                        color = "mistyrose"
-                                        shape = "box"
-                                    elif method_call == 'enum':
-                                        color = "lightgreen"
-                                        shape = "diamond"
-                                    else:
-                                        color = "white"
-                                        shape = "box"
-                                    
-                                    dep_url = f"javascript:showNodeInfo('{dep_node_name}')"
-                                    additional_lines.append(f'    "{dep_node_name}" [label="{class_name}", URL="{dep_url}", fillcolor="{color}", shape="{shape}"];')
-                                
-                                # Add edge from implementation to dependency
-                                edge_label = method_call if method_call != 'constructor' else 'new'
-                                if method_call == 'exception':
-                                    edge_style = ', color="red"'
-                                elif 'Repository' in class_name:
-                                    edge_style = ', color="orange"'
-                                elif 'Service' in class_name:
-                                    edge_style = ', color="blue"'
-                                else:
-                                    edge_style = ''
-                                
-                                dep_edge_url = f"javascript:showEdgeInfo('{impl_name}', '{dep_node_name}')"
-                                additional_lines.append(f'    "{impl_name}" -> "{dep_node_name}" [label="{edge_label} ({method_name})", URL="{dep_edge_url}"{edge_style}];')
-        
-        # Insert additional content before closing brace
-        if additional_lines:
-            content_lines[insert_pos:insert_pos] = additional_lines
-        
-        return '\n'.join(content_lines)
+                        graph.add_node(dep_node_name, label=class_name,
+                                       URL=f"javascript:showNodeInfo('{dep_node_name}')", fillcolor=color, shape=shape)
+                    
+                    # Add edge from implementation to dependency
+                    edge_label = method_call if method_call != 'constructor' else 'new'
+                    if method_call == 'exception':
+                        edge_style = {"color": "red"}
+                    elif 'Repository' in class_name:
+                        edge_style = {"color": "orange"}
+                    elif 'Service' in class_name:
+                        edge_style = {"color": "blue"}
+                    else:
+                        edge_style = {}
+                    
+                    graph.add_edge(impl_name, dep_node_name, label=f"{edge_label} ({method_name})",
+                                   URL=f"javascript:showEdgeInfo('{impl_name}', '{dep_node_name}')", **edge_style)
+        
+        return graph
 
 
 if __name__ == "__main__":
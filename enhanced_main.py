@@ -5,8 +5,8 @@ Enhanced main entry point for testing advanced dependency analysis
 
 import os
 import argparse
-import subprocess
 from html_analyzer import HTMLAwareAnalyzer
+from graph_renderer import graphviz_available
 from server import WebUIServer
 
 
@@ -21,6 +21,10 @@ def main():
                        help="Port cho web server (mặc định: 8000)")
     parser.add_argument("--direct", "-d", action="store_true",
                        help="Tạo graph trực tiếp mà không qua màn hình lựa chọn")
+    parser.add_argument("--gzip-metadata", action="store_true",
+                       help="Ghi thêm bản gzip của metadata JSON để server gửi nén")
+    parser.add_argument("--render-timeout", type=float, default=60.0,
+                       help="Thời gian tối đa (giây) cho mỗi lần chạy Graphviz (mặc định: 60)")
     
     args = parser.parse_args()
     
@@ -28,9 +32,7 @@ def main():
         print(f"❌ Lỗi: Thư mục '{args.source_dir}' không tồn tại")
         return
     
-    try:
-        subprocess.run(['dot', '-V'], capture_output=True, check=True)
-    except (subprocess.CalledProcessError, FileNotFoundError):
+    if not graphviz_available():
         print("❌ Graphviz không được tìm thấy!")
         print("   Vui lòng cài đặt Graphviz:")
         print("   - Ubuntu/Debian: sudo apt-get install graphviz")
@@ -40,6 +42,8 @@ def main():
         
     print("🚀 Initializing Enhanced Java Dependency Analyzer...")
     analyzer = HTMLAwareAnalyzer(args.source_dir)
+    analyzer.gzip_metadata = args.gzip_metadata
+    analyzer.render_timeout = args.render_timeout
     
     print(f"🔍 Đang thực hiện enhanced analysis cho: {args.source_dir}")
     print("This includes:")
@@ -49,10 +53,10 @@ def main():
     print("  💉 Annotation-based dependencies")
     print("  📝 Field type analysis")
     
-    analyzer.analyze()
-    
     # Nếu user chọn direct mode, tạo graph ngay
     if args.direct:
+        analyzer.analyze()
+        
         html_file, metadata_file = analyzer.generate_enhanced_graph(args.output)
         
         if html_file:
@@ -73,9 +77,11 @@ def main():
             print(f"\n❌ Failed to generate interactive HTML. Check Graphviz installation.")
     else:
         # Mở function selector trước
+        # Server mở ngay, analysis chạy nền và báo tiến độ qua /api/status
         print(f"\n🎯 Khởi động enhanced function selector...")
         server = WebUIServer("function_selector.html", None, analyzer)
         server.port = args.port
+        server.start_background_analysis()
         server.start_function_selector()
 
 
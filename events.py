@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Broadcast sự kiện (tiến độ analysis, render xong, graph delta) tới mọi tab đang mở
+qua Server-Sent Events.
+"""
+
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+
+class EventBroadcaster:
+    def __init__(self, history_size: int = 200, subscriber_queue_size: int = 500):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # queue -> scope (None = chỉ nhận event chung)
+        self._ids = itertools.count(1)
+        # Giữ các event gần nhất để client reconnect (Last-Event-ID) không bị mất delta
+        self._history = deque(maxlen=history_size)
+        self.subscriber_queue_size = subscriber_queue_size
+
+    def publish(self, event_type: str, data: dict, scope: str = None):
+        """scope=None: gửi mọi subscriber; ngược lại chỉ gửi subscriber cùng scope (session)"""
+        with self._lock:
+            event = (next(self._ids), event_type, data, scope)
+            self._history.append(event)
+            subscribers = [q for q, q_scope in self._subscribers.items() if scope is None or scope == q_scope]
+
+        for subscriber in subscribers:
+            if subscriber.qsize() >= self.subscriber_queue_size:
+                # Client quá chậm: ngắt để nó reconnect và replay từ history
+                self.unsubscribe(subscriber)
+                subscriber.put(None)
+            else:
+                subscriber.put(event)
+
+    def subscribe(self, last_event_id: int = None, scope: str = None) -> queue.Queue:
+        subscriber = queue.Queue()
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event[0] > last_event_id and event[3] in (None, scope):
+                        subscriber.put(event)
+            self._subscribers[subscriber] = scope
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self._subscribers.pop(subscriber, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+def format_event(event) -> bytes:
+    """Encode (id, type, data, scope) theo định dạng text/event-stream"""
+    event_id, event_type, data, _ = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
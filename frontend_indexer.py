@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Indexer cho frontend HTML/JS: một lượt đọc từng dòng mỗi file, tìm các JS function và các
+lời gọi HTTP của chúng (fetch, XMLHttpRequest.open, axios/$.ajax và các wrapper như callAPI),
+rồi đồng bộ vào HTML function store theo content hash - function không đổi không bị ghi lại.
+
+    python frontend_indexer.py ecommerce_frontend.html
+    python frontend_indexer.py frontend/ --backend sqlite
+    python frontend_indexer.py shop/static admin/static --root .
+
+Key source_file của mỗi file là path so với thư mục được quét (file: tên file), hoặc so với
+--root - không phụ thuộc thư mục đang đứng khi chạy lệnh.
+"""
+
+import argparse
+import hashlib
+import re
+import time
+from pathlib import Path
+from typing import List, Dict, Any
+
+FRONTEND_SUFFIXES = (".html", ".htm", ".js")
+
+# Khai báo function: `function name(...)`, `async function name(...)`, `const name = (async) (...) =>`,
+# `const name = (async) function(...)`
+FUNCTION_PATTERNS = [
+    re.compile(r'^\s*(?:export\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*\(([^)]*)\)'),
+    re.compile(r'^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?'
+               r'(?:function\s*\*?\s*[\w$]*\s*\(([^)]*)\)|\(([^)]*)\)\s*=>|([A-Za-z_$][\w$]*)\s*=>)'),
+]
+
+# Các lời gọi HTTP trực tiếp; `callee` dùng để biết vị trí url/method trong danh sách đối số
+DIRECT_CALL_PATTERN = re.compile(
+    r'(?<![\w$.])(fetch|axios(?:\.(?:get|post|put|patch|delete|head))?|\$\.(?:ajax|get|post|getJSON))\s*\(|'
+    r'([A-Za-z_$][\w$]*)\.open\s*\('
+)
+IDENTIFIER_CALL_PATTERN = re.compile(r'(?<![\w$.])([A-Za-z_$][\w$]*)\s*\(')
+
+SCRIPT_OPEN = re.compile(r'<script\b([^>]*)>', re.IGNORECASE)
+SCRIPT_CLOSE = re.compile(r'</script\s*>', re.IGNORECASE)
+
+HTTP_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+# Biến base URL (API_BASE_URL, baseUrl, ...) ở đầu URL bị bỏ: chỉ giữ path template
+_BASE_NAME = re.compile(r'(?i)^(?:[\w$.]*\.)?[\w$]*(?:base|host|origin|api)[\w$]*$')
+
+# Số dòng tối đa gom cho một lời gọi nhiều dòng
+_MAX_CALL_LINES = 30
+
+
+class FrontendFunction:
+    def __init__(self, name: str, params: List[str], line: int, depth: int):
+        self.name = name
+        self.params = params
+        self.line = line
+        self.depth = depth  # độ sâu ngoặc nhọn tại dòng khai báo
+        self.opened = False
+        self.hash = hashlib.sha1()
+        self.calls = []  # (callee, [args]) theo thứ tự xuất hiện
+
+    def entry(self, api_calls: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            'function_name': f'{self.name}()',
+            'content_hash': self.hash.hexdigest(),
+            'api_calls': api_calls,
+            'line': self.line,
+        }
+
+
+class Wrapper:
+    """Function chuyển tham số URL (và method) của nó vào fetch/XHR, ví dụ callAPI(url, method = 'GET')"""
+
+    def __init__(self, url_index: int, method_index: int = None, default_method: str = "GET"):
+        self.url_index = url_index
+        self.method_index = method_index
+        self.default_method = default_method
+
+
+def scan_file(path) -> List[Dict[str, Any]]:
+    """Các function có gọi HTTP trong một file HTML/JS (mỗi dict: function_name, content_hash, api_calls, line)"""
+    path = Path(path)
+    scanner = _Scanner()
+    is_script = path.suffix.lower() == ".js"
+    in_script = False
+
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            if is_script:
+                scanner.feed(line, number)
+                continue
+
+            # HTML: chỉ lấy code trong <script>...</script> inline (bỏ <script src=...>)
+            code = []
+            position = 0
+            while True:
+                if in_script:
+                    close = SCRIPT_CLOSE.search(line, position)
+                    code.append(line[position:close.start() if close else len(line)])
+                    if not close:
+                        break
+                    in_script = False
+                    position = close.end()
+                else:
+                    opened = SCRIPT_OPEN.search(line, position)
+                    if not opened:
+                        break
+                    position = opened.end()
+                    in_script = 'src=' not in opened.group(1).lower()
+            if code:
+                scanner.feed(' '.join(code), number)
+
+    return scanner.finish()
+
+
+class _Scanner:
+    def __init__(self):
+        self.depth = 0
+        self.stack = []  # FrontendFunction đang mở
+        self.functions = []
+        self.pending = None  # (function, callee, text, lines) của lời gọi chưa đóng ngoặc
+
+    def feed(self, line: str, number: int):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            return
+        for function in self.stack:
+            function.hash.update(stripped.encode('utf-8'))
+            function.hash.update(b"\n")
+
+        calls_from = 0
+        for pattern in FUNCTION_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                params_text = next((group for group in match.groups()[1:] if group is not None), '')
+                function = FrontendFunction(match.group(1), _parse_params(params_text), number, self.depth)
+                function.hash.update(stripped.encode('utf-8'))
+                function.hash.update(b"\n")
+                self.stack.append(function)
+                self.functions.append(function)
+                calls_from = match.end()
+                break
+
+        if self.pending:
+            self._continue_call(line)
+        else:
+            self._find_calls(line, calls_from)
+
+        for char in _code_braces(line):
+            if char == '{':
+                self.depth += 1
+                if self.stack and self.depth == self.stack[-1].depth + 1:
+                    self.stack[-1].opened = True
+            else:
+                self.depth -= 1
+                while self.stack and self.stack[-1].opened and self.depth <= self.stack[-1].depth:
+                    self.stack.pop()
+        # Arrow function một dòng không có thân {...}
+        while self.stack and not self.stack[-1].opened and self.stack[-1].line == number and stripped.endswith(';'):
+            self.stack.pop()
+
+    def _find_calls(self, line: str, start: int = 0):
+        if not self.stack:
+            return
+        owner = self.stack[-1]
+        for pattern in (DIRECT_CALL_PATTERN, IDENTIFIER_CALL_PATTERN):
+            for match in pattern.finditer(line, start):
+                if pattern is IDENTIFIER_CALL_PATTERN:
+                    callee = match.group(1)
+                    if callee in ("fetch", "axios", "function", "if", "for", "while", "switch", "catch", "return"):
+                        continue
+                else:
+                    callee = match.group(1) or f"{match.group(2)}.open"
+                text = line[match.end():]
+                args, closed = _split_args(text)
+                if not closed:
+                    # Đối số kéo sang các dòng sau (object literal nhiều dòng)
+                    self.pending = (owner, callee, text, 1)
+                    return
+                owner.calls.append((callee, args))
+
+    def _continue_call(self, line: str):
+        owner, callee, text, lines = self.pending
+        text += line
+        args, closed = _split_args(text)
+        if closed or lines >= _MAX_CALL_LINES:
+            owner.calls.append((callee, args))
+            self.pending = None
+        else:
+            self.pending = (owner, callee, text, lines + 1)
+
+    def finish(self) -> List[Dict[str, Any]]:
+        wrappers = {}
+        for function in self.functions:
+            wrapper = _as_wrapper(function)
+            if wrapper:
+                wrappers[function.name] = wrapper
+
+        entries = []
+        for function in self.functions:
+            if function.name in wrappers:
+                continue
+            api_calls = []
+            for callee, args in function.calls:
+                call = _resolve_call(callee, args, wrappers)
+                if call and call not in api_calls:
+                    api_calls.append(call)
+            if api_calls:
+                entries.append(function.entry(api_calls))
+        return entries
+
+
+def _as_wrapper(function: FrontendFunction):
+    """Function là wrapper nếu đưa thẳng một tham số của nó làm URL cho fetch/XHR"""
+    names = [param.split('=')[0].strip() for param in function.params]
+    for callee, args in function.calls:
+        url_arg, _ = _direct_url_and_method(callee, args)
+        if url_arg in names:
+            method_index = next((i for i, name in enumerate(names) if name.lower() in ("method", "type", "verb")), None)
+            default_method = "GET"
+            if method_index is not None and '=' in function.params[method_index]:
+                default_method = _literal(function.params[method_index].split('=', 1)[1]) or "GET"
+            return Wrapper(names.index(url_arg), method_index, default_method.upper())
+    return None
+
+
+def _direct_url_and_method(callee: str, args: List[str]):
+    """(biểu thức URL, method) cho các lời gọi HTTP trực tiếp; (None, None) nếu không phải"""
+    if callee == "fetch" or callee == "axios":
+        method = _option(args[1] if len(args) > 1 else '', 'method') or "GET"
+        if callee == "axios" and args and args[0].lstrip().startswith('{'):
+            return _option(args[0], 'url', raw=True), _option(args[0], 'method') or "GET"
+        return (args[0].strip() if args else None), method
+    if callee.startswith("axios."):
+        return (args[0].strip() if args else None), callee.split('.', 1)[1].upper()
+    if callee in ("$.get", "$.getJSON"):
+        return (args[0].strip() if args else None), "GET"
+    if callee == "$.post":
+        return (args[0].strip() if args else None), "POST"
+    if callee == "$.ajax":
+        options = args[-1] if args else ''
+        url = _option(options, 'url', raw=True) or (args[0].strip() if len(args) > 1 else None)
+        return url, _option(options, 'method') or _option(options, 'type') or "GET"
+    if callee.endswith(".open") and len(args) >= 2:
+        method = _literal(args[0])
+        if method and method.upper() in HTTP_METHODS:
+            return args[1].strip(), method
+    return None, None
+
+
+def _resolve_call(callee: str, args: List[str], wrappers: Dict[str, Wrapper]):
+    if callee in wrappers:
+        wrapper = wrappers[callee]
+        if len(args) <= wrapper.url_index:
+            return None
+        url = args[wrapper.url_index]
+        method = None
+        if wrapper.method_index is not None and len(args) > wrapper.method_index:
+            method = _literal(args[wrapper.method_index])
+        method = method or wrapper.default_method
+    else:
+        url, method = _direct_url_and_method(callee, args)
+    if not url:
+        return None
+    template = url_template(url)
+    if template is None:
+        return None
+    return {'method': method.upper(), 'url': template}
+
+
+def url_template(expression: str):
+    """
+    Biểu thức URL JS -> path template: `${API_BASE_URL}/users/${userId}?x=1` và
+    API_BASE_URL + '/users/' + userId đều thành /users/{userId}. None nếu không có phần literal nào.
+    """
+    parts = []
+    for index, piece in enumerate(_split_top_level(expression.strip(), '+')):
+        piece = piece.strip()
+        literal = _literal(piece)
+        if literal is not None:
+            quote = piece[0]
+            if quote == '`':
+                literal = _expand_template(literal, index == 0)
+            parts.append(literal)
+        elif index == 0 and _BASE_NAME.match(piece):
+            continue
+        elif re.match(r'^[A-Za-z_$][\w$.]*$', piece):
+            parts.append('{' + piece.split('.')[-1] + '}')
+        else:
+            parts.append('{expr}')
+
+    url = ''.join(parts)
+    if not url or not any(part and not part.startswith('{') for part in parts):
+        return None
+    url = re.sub(r'^[a-z]+://[^/]+', '', url)  # bỏ scheme + host
+    url = url.split('?', 1)[0].split('#', 1)[0]
+    if not url.startswith('/'):
+        url = '/' + url
+    return re.sub(r'/{2,}', '/', url)
+
+
+def _expand_template(text: str, leading: bool) -> str:
+    def replace(match):
+        expression = match.group(1).strip()
+        if leading and match.start() == 0 and _BASE_NAME.match(expression):
+            return ''
+        identifiers = re.findall(r'[A-Za-z_$][\w$]*', expression)
+        return '{' + (identifiers[-1] if identifiers else 'expr') + '}'
+    return re.sub(r'\$\{([^}]*)\}', replace, text)
+
+
+def _literal(text: str):
+    """Nội dung chuỗi literal ('...', "...", `...`); None nếu không phải literal"""
+    text = text.strip()
+    if len(text) >= 2 and text[0] in '\'"`' and text[-1] == text[0]:
+        return text[1:-1]
+    return None
+
+
+def _option(options: str, key: str, raw: bool = False):
+    """Giá trị `key: ...` trong object literal (method: 'POST'); raw=True trả về biểu thức"""
+    match = re.search(rf'(?<![\w$]){key}\s*:\s*([^,}}\n]+)', options)
+    if not match:
+        return None
+    value = match.group(1).strip()
+    return value if raw else _literal(value)
+
+
+def _parse_params(text: str) -> List[str]:
+    return [param.strip() for param in _split_top_level(text, ',') if param.strip()]
+
+
+def _split_args(text: str):
+    """Tách đối số của lời gọi bắt đầu ngay sau '(' -> ([args], đã gặp ')' đóng chưa)"""
+    depth = 0
+    quote = None
+    args, current = [], []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if quote:
+            current.append(char)
+            if char == '\\' and index + 1 < len(text):
+                current.append(text[index + 1])
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+            current.append(char)
+        elif char in '([{':
+            depth += 1
+            current.append(char)
+        elif char in ')]}':
+            if depth == 0:
+                if ''.join(current).strip():
+                    args.append(''.join(current).strip())
+                return args, True
+            depth -= 1
+            current.append(char)
+        elif char == ',' and depth == 0:
+            args.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        index += 1
+    if ''.join(current).strip():
+        args.append(''.join(current).strip())
+    return args, False
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Tách theo `separator` ngoài chuỗi/ngoặc"""
+    depth = 0
+    quote = None
+    pieces, current = [], []
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        elif char == separator and depth == 0:
+            pieces.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    pieces.append(''.join(current))
+    return pieces
+
+
+def _code_braces(line: str):
+    """Các ký tự { } ngoài chuỗi (`${...}` trong template literal bỏ qua)"""
+    quote = None
+    previous = ''
+    for char in line:
+        if quote:
+            if char == quote and previous != '\\':
+                quote = None
+        elif char in '\'"`':
+            quote = char
+        elif char in '{}':
+            yield char
+        previous = char
+
+
+def frontend_files(paths) -> List[Path]:
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() in FRONTEND_SUFFIXES and p.is_file()))
+        elif path.is_file():
+            files.append(path)
+    return files
+
+
+def source_key(path: Path, base: Path) -> str:
+    """Key source_file trong store: path so với `base` (đã resolve), path tuyệt đối nếu nằm ngoài"""
+    resolved = path.resolve()
+    return resolved.relative_to(base).as_posix() if resolved.is_relative_to(base) else resolved.as_posix()
+
+
+def index_frontend(store, paths, root: Path = None) -> Dict[str, int]:
+    """
+    Quét `paths` (file hoặc thư mục) và đồng bộ từng file vào store; trả về tổng added/updated/removed/unchanged.
+    Key source_file tính theo `root` nếu có, không thì theo chính path được quét (xem source_key).
+    """
+    totals = {"files": 0, "added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    for scanned in map(Path, paths):
+        base = Path(root) if root else (scanned if scanned.is_dir() else scanned.parent)
+        base = base.resolve()
+        for path in frontend_files([scanned]):
+            source_file = source_key(path, base)
+            stats = store.sync_source(source_file, scan_file(path))
+            totals["files"] += 1
+            for key, value in stats.items():
+                totals[key] += value
+            if stats["added"] or stats["updated"] or stats["removed"]:
+                print(f"   📄 {source_file}: +{stats['added']} ~{stats['updated']} -{stats['removed']} "
+                      f"({stats['unchanged']} unchanged)")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index JS functions and their HTTP calls from frontend HTML/JS files")
+    parser.add_argument("paths", nargs="+", help="File hoặc thư mục frontend (.html, .htm, .js)")
+    parser.add_argument("--backend", choices=["postgres", "sqlite"],
+                       help="Backend của HTML function store (mặc định theo HTML_DB_BACKEND)")
+    parser.add_argument("--root",
+                       help="Thư mục gốc cho key source_file (mặc định: chính file/thư mục được quét)")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ in các function tìm được, không ghi store")
+
+    args = parser.parse_args()
+
+    if args.dry_run:
+        for path in frontend_files(args.paths):
+            for entry in scan_file(path):
+                calls = ', '.join(f"{call['method']} {call['url']}" for call in entry['api_calls'])
+                print(f"{path}:{entry['line']} {entry['function_name']} → {calls}")
+        return 0
+
+    from html_store import open_html_store
+
+    started = time.monotonic()
+    try:
+        store = open_html_store(args.backend, check_schema=False)
+        store.migrate()
+        totals = index_frontend(store, args.paths, args.root)
+    except Exception as e:
+        print(f"❌ Indexing failed: {e}")
+        return 1
+
+    print(f"✅ Indexed {totals['files']} files in {time.monotonic() - started:.2f}s: "
+          f"{totals['added']} added, {totals['updated']} updated, {totals['removed']} removed, "
+          f"{totals['unchanged']} unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
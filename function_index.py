@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+In-memory index cho /api/functions: tìm theo tên (trigram/prefix) với facet theo type
+và phân trang, build một lần cho mỗi analysis snapshot.
+"""
+
+import bisect
+from collections import defaultdict
+from pathlib import Path
+
+
+def java_function_entries(analyzer):
+    """
+    Classes và methods của analyzer dưới dạng function entries (không giới hạn số lượng).
+    An toàn khi analyzer đang được analyze() ở thread khác: chỉ duyệt trên bản copy của các dict.
+    """
+    source_directory = analyzer.source_directory
+    relative_paths = {}  # mỗi file chỉ tính relative path một lần
+
+    def relative(file_path):
+        rel = relative_paths.get(file_path)
+        if rel is None:
+            rel = relative_paths[file_path] = str(Path(file_path).relative_to(source_directory))
+        return rel
+
+    # Lấy tất cả classes (bao gồm services)
+    for class_name, file_path in list(analyzer.classes.items()):
+        # Xác định type: service nếu tên kết thúc bằng Service, ngược lại là class
+        func_type = 'service' if class_name.endswith('Service') else 'class'
+
+        yield {
+            'id': f'class_{class_name}',  # Tất cả đều dùng prefix 'class_'
+            'name': class_name,
+            'type': func_type,
+            'file': relative(file_path),
+            'dependencies': len(analyzer.imports.get(file_path, ()))
+        }
+
+    # Methods từ method_calls
+    for source_file, targets in list(analyzer.method_calls.items()):
+        source_rel = relative(source_file)
+        for target_file, methods in list(targets.items()):
+            target_rel = relative(target_file)
+            for method in list(methods):
+                yield {
+                    'id': f'method_{method}_{source_rel}_{target_rel}',
+                    'name': method,
+                    'type': 'method',
+                    'file': f'{source_rel} → {target_rel}',
+                    'dependencies': 1
+                }
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def matches_query(entry: dict, query: str, types: set = None) -> bool:
+    """Cùng ngữ nghĩa với FunctionIndex.search, dùng cho danh sách nhỏ không cần index"""
+    query = (query or '').strip().lower()
+    name = entry.get('name', '').lower()
+    if types and entry.get('type') not in types:
+        return False
+    if not query:
+        return True
+    return query in name if len(query) >= 3 else name.startswith(query)
+
+
+class FunctionIndex:
+    """
+    Entries giữ nguyên thứ tự build; tên được gom thành bảng tên duy nhất (nhiều edge
+    dùng chung một method name) và đánh trigram trên bảng đó.
+    Query >= 3 ký tự: tìm substring qua trigram; query ngắn hơn: tìm theo prefix.
+    """
+
+    def __init__(self, entries):
+        self.entries = []
+        seen_ids = set()
+        name_ids = {}  # lowercased name -> name id
+        self._names = []  # name id -> lowercased name
+        self._name_entries = []  # name id -> [entry index]
+        self._types = defaultdict(list)  # type -> [entry index]
+
+        for entry in entries:
+            if entry['id'] in seen_ids:
+                continue
+            seen_ids.add(entry['id'])
+            index = len(self.entries)
+            self.entries.append(entry)
+
+            name = entry['name'].lower()
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = len(self._names)
+                self._names.append(name)
+                self._name_entries.append([])
+            self._name_entries[name_id].append(index)
+            self._types[entry['type']].append(index)
+
+        self._trigrams = defaultdict(list)  # trigram -> [name id]
+        for name_id, name in enumerate(self._names):
+            for gram in trigrams(name):
+                self._trigrams[gram].append(name_id)
+        self._sorted_names = sorted((name, name_id) for name_id, name in enumerate(self._names))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _matching_name_ids(self, query: str):
+        if len(query) >= 3:
+            postings = sorted((self._trigrams.get(gram, []) for gram in trigrams(query)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    break
+            # Trigram chỉ là điều kiện cần, kiểm tra lại substring
+            return [name_id for name_id in candidates if query in self._names[name_id]]
+
+        start = bisect.bisect_left(self._sorted_names, (query, -1))
+        matched = []
+        for name, name_id in self._sorted_names[start:]:
+            if not name.startswith(query):
+                break
+            matched.append(name_id)
+        return matched
+
+    def search(self, query: str = None, types: set = None, offset: int = 0, limit: int = None) -> dict:
+        """Trả về total, facets (số kết quả theo type, trước khi lọc type) và một trang entries"""
+        query = (query or '').strip().lower()
+        if query:
+            matched = set()
+            for name_id in self._matching_name_ids(query):
+                matched.update(self._name_entries[name_id])
+        else:
+            matched = None  # tất cả
+
+        facets = {}
+        for func_type, indices in self._types.items():
+            count = len(indices) if matched is None else sum(1 for i in indices if i in matched)
+            if count:
+                facets[func_type] = count
+
+        if types:
+            selected = set()
+            for func_type in types:
+                selected.update(self._types.get(func_type, ()))
+            matched = selected if matched is None else matched & selected
+        ordered = range(len(self.entries)) if matched is None else sorted(matched)
+
+        total = len(ordered)
+        end = total if limit is None else offset + limit
+        return {
+            "total": total,
+            "facets": facets,
+            "functions": [self.entries[i] for i in ordered[offset:end]],
+        }
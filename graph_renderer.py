@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Graphviz renderer backends.
+
+Dùng pygraphviz (cgraph/gvc chạy trong process) nếu import được, nếu không thì
+chạy `dot` qua subprocess và stream DOT (DotGraph.write) thẳng vào stdin - không dựng
+cả document trong bộ nhớ, không cần file .dot trung gian.
+"""
+
+import io
+import shutil
+import subprocess
+import threading
+
+try:
+    import pygraphviz
+except Exception:
+    pygraphviz = None
+
+
+class RenderTimeout(Exception):
+    """Graphviz chạy quá thời gian cho phép"""
+
+
+class RenderError(Exception):
+    """Graphviz báo lỗi (cú pháp DOT, format không hỗ trợ...)"""
+
+
+class RenderCancelled(Exception):
+    """Render bị hủy vì đã có yêu cầu render mới hơn"""
+
+
+class GraphRenderer:
+    """Interface chung: render DotGraph ra nhiều format trong một lần layout"""
+
+    name = "base"
+    # Renderer có dừng được giữa chừng không (cần cho timeout/cancel)
+    interruptible = False
+
+    def render(self, graph, engine: str, outputs: dict, timeout: float = None) -> dict:
+        """
+        graph: DotGraph. outputs: format -> file path, hoặc None để nhận bytes trong bộ nhớ.
+        Trả về dict format -> bytes cho các output không có file path.
+        """
+        raise NotImplementedError
+
+    def cancel(self):
+        """Dừng lần render đang chạy (nếu backend hỗ trợ)"""
+
+
+class PyGraphvizRenderer(GraphRenderer):
+    """Layout và render trong process qua pygraphviz - không fork/exec"""
+
+    name = "pygraphviz"
+
+    @staticmethod
+    def available() -> bool:
+        return pygraphviz is not None
+
+    def render(self, graph, engine: str, outputs: dict, timeout: float = None) -> dict:
+        try:
+            # pygraphviz chỉ nhận DOT dạng string; backend này chỉ dùng cho graph nhỏ
+            agraph = pygraphviz.AGraph(string=graph.to_string())
+            agraph.layout(prog=engine)
+            data = {}
+            for fmt, path in outputs.items():
+                if path:
+                    agraph.draw(path, format=fmt)
+                else:
+                    data[fmt] = agraph.draw(format=fmt)
+            return data
+        except Exception as e:
+            raise RenderError(str(e))
+
+
+class SubprocessRenderer(GraphRenderer):
+    """Chạy `dot` ngoài process, DOT được stream qua stdin; có thể kill khi timeout hoặc cancel"""
+
+    name = "subprocess"
+    interruptible = True
+
+    def __init__(self, executable: str = "dot"):
+        self.executable = executable
+        self._process = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available(executable: str = "dot") -> bool:
+        return shutil.which(executable) is not None
+
+    def render(self, graph, engine: str, outputs: dict, timeout: float = None) -> dict:
+        in_memory = [fmt for fmt, path in outputs.items() if not path]
+        if len(in_memory) > 1:
+            raise ValueError("Subprocess renderer returns at most one in-memory format per run")
+
+        cmd = [self.executable, f'-K{engine}']
+        for fmt, path in outputs.items():
+            cmd.append(f'-T{fmt}')
+            if path:
+                cmd.extend(['-o', path])
+
+        # FileNotFoundError (chưa cài Graphviz) để caller xử lý
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        with self._lock:
+            self._process = process
+            # cancel() gọi trong lúc Popen chưa xong không thấy process - kill ngay tại đây
+            if self._cancelled:
+                process.kill()
+
+        # Ghi stdin và đọc stdout/stderr song song để `dot` không bị nghẽn pipe; timeout do wait() lo
+        stdout, stderr = [], []
+        threads = [
+            threading.Thread(target=_feed, args=(process.stdin, graph), daemon=True),
+            threading.Thread(target=_drain, args=(process.stdout, stdout), daemon=True),
+            threading.Thread(target=_drain, args=(process.stderr, stderr), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise RenderTimeout(f"{engine} exceeded {timeout}s")
+        finally:
+            for thread in threads:
+                thread.join()
+            with self._lock:
+                self._process = None
+
+        if process.returncode != 0:
+            message = b"".join(stderr).decode('utf-8', 'replace')
+            raise RenderError(message or f"{self.executable} exited with {process.returncode}")
+        return {in_memory[0]: b"".join(stdout)} if in_memory else {}
+
+    def cancel(self):
+        """Kill `dot` đang chạy; các lần render sau của renderer này cũng bị kill ngay khi bắt đầu"""
+        with self._lock:
+            self._cancelled = True
+            if self._process and self._process.poll() is None:
+                self._process.kill()
+
+
+def _feed(stdin, graph):
+    """Stream DOT vào stdin của `dot`; pipe gãy (dot đã thoát/bị kill) thì dừng"""
+    writer = io.TextIOWrapper(stdin, encoding='utf-8')
+    try:
+        graph.write(writer)
+        writer.flush()
+    except (BrokenPipeError, OSError, ValueError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+
+def _drain(pipe, chunks: list):
+    for chunk in iter(lambda: pipe.read(65536), b""):
+        chunks.append(chunk)
+    pipe.close()
+
+
+def graphviz_available() -> bool:
+    """Kiểm tra có backend nào dùng được, không cần spawn `dot -V`"""
+    return PyGraphvizRenderer.available() or SubprocessRenderer.available()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Tile pyramid và level-of-detail SVG fragments cho graph rất lớn.
+
+Graphviz chỉ layout một lần (output dạng `-Tplain`), sau đó server cắt layout
+thành các tile SVG theo zoom level để browser chỉ tải phần đang nhìn thấy.
+"""
+
+import json
+import math
+import shlex
+from xml.sax.saxutils import escape, quoteattr
+
+POINTS_PER_INCH = 72.0
+
+
+class GraphLayout:
+    """Node/edge positions (in points, y pointing down) from one Graphviz layout"""
+
+    def __init__(self, width: float, height: float, nodes: list, edges: list):
+        self.width = width
+        self.height = height
+        self.nodes = nodes
+        self.edges = edges
+
+    @classmethod
+    def from_plain(cls, plain_text: str) -> "GraphLayout":
+        """Parse Graphviz `-Tplain` output"""
+        width = height = 0.0
+        nodes = []
+        edges = []
+
+        for line in plain_text.splitlines():
+            try:
+                tokens = shlex.split(line)
+            except ValueError:
+                continue
+            if not tokens:
+                continue
+
+            kind = tokens[0]
+            if kind == 'graph':
+                scale = float(tokens[1])
+                width = float(tokens[2]) * scale * POINTS_PER_INCH
+                height = float(tokens[3]) * scale * POINTS_PER_INCH
+            elif kind == 'node':
+                name, x, y, w, h, label, style, shape, color, fillcolor = tokens[1:11]
+                nodes.append({
+                    "name": name,
+                    "x": float(x) * POINTS_PER_INCH,
+                    "y": height - float(y) * POINTS_PER_INCH,
+                    "width": float(w) * POINTS_PER_INCH,
+                    "height": float(h) * POINTS_PER_INCH,
+                    "label": label,
+                    "shape": shape,
+                    "color": color,
+                    "fillcolor": fillcolor,
+                })
+            elif kind == 'edge':
+                tail, head, count = tokens[1], tokens[2], int(tokens[3])
+                coords = tokens[4:4 + 2 * count]
+                points = [
+                    (float(coords[i]) * POINTS_PER_INCH, height - float(coords[i + 1]) * POINTS_PER_INCH)
+                    for i in range(0, len(coords), 2)
+                ]
+                rest = tokens[4 + 2 * count:]
+                edge = {"tail": tail, "head": head, "points": points, "label": None}
+                if len(rest) >= 5:
+                    edge["label"] = rest[0]
+                    edge["label_pos"] = (float(rest[1]) * POINTS_PER_INCH,
+                                         height - float(rest[2]) * POINTS_PER_INCH)
+                    rest = rest[3:]
+                edge["style"] = rest[0] if rest else "solid"
+                edge["color"] = rest[1] if len(rest) > 1 else "black"
+                edges.append(edge)
+            elif kind == 'stop':
+                break
+
+        return cls(width, height, nodes, edges)
+
+    def to_dict(self) -> dict:
+        return {"width": self.width, "height": self.height, "nodes": self.nodes, "edges": self.edges}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GraphLayout":
+        edges = []
+        for edge in data["edges"]:
+            edge = dict(edge)
+            edge["points"] = [tuple(p) for p in edge["points"]]
+            if edge.get("label_pos"):
+                edge["label_pos"] = tuple(edge["label_pos"])
+            edges.append(edge)
+        return cls(data["width"], data["height"], data["nodes"], edges)
+
+    def save(self, layout_file: str):
+        with open(layout_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, layout_file: str) -> "GraphLayout":
+        with open(layout_file, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+class TilePyramid:
+    """Cắt một GraphLayout thành tile SVG (z, x, y) với level-of-detail theo zoom"""
+
+    def __init__(self, layout: GraphLayout, tile_size: int = 256,
+                 max_scale: float = 2.0, label_scale: float = 0.6):
+        self.layout = layout
+        self.tile_size = tile_size
+        self.label_scale = label_scale  # từ scale này trở lên mới vẽ label và đường cong
+
+        extent = max(layout.width, layout.height, 1.0)
+        self.extent = extent
+        self.max_zoom = max(0, math.ceil(math.log2(extent * max_scale / tile_size)))
+
+        # Spatial grid ở zoom lớn nhất: mỗi cell đúng bằng một tile
+        self.cell_size = extent / (2 ** self.max_zoom)
+        self._node_cells = self._build_grid(self._node_bbox(n) for n in layout.nodes)
+        self._edge_cells = self._build_grid(self._edge_bbox(e) for e in layout.edges)
+
+    def describe(self) -> dict:
+        """Thông tin cho viewer phía browser"""
+        return {
+            "mode": "tiled",
+            "tile_size": self.tile_size,
+            "max_zoom": self.max_zoom,
+            "width": self.layout.width,
+            "height": self.layout.height,
+            "extent": self.extent,
+            "nodes": len(self.layout.nodes),
+            "edges": len(self.layout.edges),
+        }
+
+    def scale(self, z: int) -> float:
+        """Pixels per point ở zoom z"""
+        return self.tile_size * (2 ** z) / self.extent
+
+    def render_tile(self, z: int, x: int, y: int) -> str:
+        """Render SVG fragment cho tile (z, x, y)"""
+        if not (0 <= z <= self.max_zoom) or not (0 <= x < 2 ** z) or not (0 <= y < 2 ** z):
+            raise ValueError(f"Tile out of range: {z}/{x}/{y}")
+
+        span = self.extent / (2 ** z)
+        bbox = (x * span, y * span, (x + 1) * span, (y + 1) * span)
+        detailed = self.scale(z) >= self.label_scale
+
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.tile_size}" height="{self.tile_size}" '
+            f'viewBox="{bbox[0]:.2f} {bbox[1]:.2f} {span:.2f} {span:.2f}" font-family="Arial">'
+        ]
+
+        for index in sorted(self._query(self._edge_cells, bbox)):
+            edge = self.layout.edges[index]
+            if _intersects(self._edge_bbox(edge), bbox):
+                parts.append(self._render_edge(edge, detailed))
+
+        for index in sorted(self._query(self._node_cells, bbox)):
+            node = self.layout.nodes[index]
+            if _intersects(self._node_bbox(node), bbox):
+                parts.append(self._render_node(node, detailed))
+
+        parts.append('</svg>')
+        return ''.join(parts)
+
+    def _build_grid(self, bboxes) -> dict:
+        cells = {}
+        for index, bbox in enumerate(bboxes):
+            for cell in self._cells_for(bbox):
+                cells.setdefault(cell, []).append(index)
+        return cells
+
+    def _cells_for(self, bbox):
+        x0, y0, x1, y1 = bbox
+        last = 2 ** self.max_zoom - 1
+        cx0 = min(max(int(x0 // self.cell_size), 0), last)
+        cy0 = min(max(int(y0 // self.cell_size), 0), last)
+        cx1 = min(max(int(x1 // self.cell_size), 0), last)
+        cy1 = min(max(int(y1 // self.cell_size), 0), last)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield (cx, cy)
+
+    def _query(self, cells: dict, bbox) -> set:
+        found = set()
+        for cell in self._cells_for(bbox):
+            found.update(cells.get(cell, ()))
+        return found
+
+    @staticmethod
+    def _node_bbox(node):
+        half_w = node["width"] / 2
+        half_h = node["height"] / 2
+        return (node["x"] - half_w, node["y"] - half_h, node["x"] + half_w, node["y"] + half_h)
+
+    @staticmethod
+    def _edge_bbox(edge):
+        xs = [p[0] for p in edge["points"]]
+        ys = [p[1] for p in edge["points"]]
+        if edge.get("label_pos"):
+            xs.append(edge["label_pos"][0])
+            ys.append(edge["label_pos"][1])
+        return (min(xs), min(ys), max(xs), max(ys))
+
+    def _render_node(self, node, detailed: bool) -> str:
+        x0, y0, _, _ = self._node_bbox(node)
+        fill = node["fillcolor"] if node["fillcolor"] not in ('', 'none') else 'lightblue'
+        stroke = node["color"] or 'black'
+        if node["shape"] == 'ellipse':
+            shape = (f'<ellipse cx="{node["x"]:.2f}" cy="{node["y"]:.2f}" rx="{node["width"] / 2:.2f}" '
+                     f'ry="{node["height"] / 2:.2f}" fill={quoteattr(fill)} stroke={quoteattr(stroke)}/>')
+        else:
+            shape = (f'<rect x="{x0:.2f}" y="{y0:.2f}" width="{node["width"]:.2f}" height="{node["height"]:.2f}" '
+                     f'fill={quoteattr(fill)} stroke={quoteattr(stroke)}/>')
+
+        text = ''
+        if detailed:
+            lines = node["label"].replace('\\n', '\n').split('\n')
+            top = node["y"] - (len(lines) - 1) * 7
+            text = ''.join(
+                f'<text x="{node["x"]:.2f}" y="{top + i * 14:.2f}" font-size="12" text-anchor="middle" '
+                f'dominant-baseline="middle">{escape(line)}</text>'
+                for i, line in enumerate(lines)
+            )
+        return f'<g class="tile-node" data-node={quoteattr(node["name"])}>{shape}{text}</g>'
+
+    def _render_edge(self, edge, detailed: bool) -> str:
+        points = edge["points"]
+        if detailed and len(points) >= 4:
+            path = f'M{points[0][0]:.2f},{points[0][1]:.2f} C' + ' '.join(
+                f'{px:.2f},{py:.2f}' for px, py in points[1:])
+        else:
+            # Overview: đường thẳng từ đầu đến cuối thay cho spline
+            path = f'M{points[0][0]:.2f},{points[0][1]:.2f} L{points[-1][0]:.2f},{points[-1][1]:.2f}'
+
+        dash = ' stroke-dasharray="5,3"' if edge["style"] == 'dashed' else ''
+        label = ''
+        if detailed and edge.get("label") and edge.get("label_pos"):
+            lx, ly = edge["label_pos"]
+            first_line = edge["label"].replace('\\n', '\n').split('\n')[0]
+            label = (f'<text x="{lx:.2f}" y="{ly:.2f}" font-size="9" text-anchor="middle">'
+                     f'{escape(first_line)}</text>')
+        return (f'<g class="tile-edge" data-source={quoteattr(edge["tail"])} data-target={quoteattr(edge["head"])}>'
+                f'<path d="{path}" fill="none" stroke={quoteattr(edge["color"])}{dash} '
+                f'vector-effect="non-scaling-stroke"/>{label}</g>')
+
+
+def _intersects(a, b) -> bool:
+    return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
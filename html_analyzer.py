@@ -3,9 +3,8 @@
 Enhanced analyzer với HTML nodes support và advanced dependency detection
 """
 
-from collections import defaultdict
 from enhanced_analyzer import SuperEnhancedJavaDependencyAnalyzer
-from html_db import HTMLFunctionDatabase
+from html_store import controller_mappings
 
 class HTMLAwareAnalyzer(SuperEnhancedJavaDependencyAnalyzer):
     def __init__(self, source_directory: str):
@@ -13,6 +12,24 @@ class HTMLAwareAnalyzer(SuperEnhancedJavaDependencyAnalyzer):
         # HTML functions integration
         self.selected_html_functions = []
         self.html_to_java_mappings = {}
+        self.html_route_labels = {}  # func name -> nhãn edge "GET /path → handler"
+    
+    def _map_html_functions(self, html_functions_data):
+        """Controller của từng HTML function: theo route của api_calls nếu khớp, không thì mapping trong database"""
+        routes_by_id = self.resolve_html_routes(html_functions_data)
+        self.html_to_java_mappings = {}
+        self.html_route_labels = {}
+        for func_data in html_functions_data:
+            func_name = func_data['name']
+            routes = routes_by_id.get(func_data['id'])
+            if routes:
+                self.html_to_java_mappings[func_name] = routes[0].controller
+                self.html_route_labels[func_name] = "\\n".join(
+                    f"{route.method} {route.pattern} → {route.handler}"
+                    for route in routes if route.controller == routes[0].controller
+                )
+            elif func_data.get('controller'):
+                self.html_to_java_mappings[func_name] = func_data['controller']
     
     def filter_by_selection(self, selected_functions):
         """Override to preserve HTML data through filtering"""
@@ -21,38 +38,30 @@ class HTMLAwareAnalyzer(SuperEnhancedJavaDependencyAnalyzer):
         
         # First, process HTML functions and store them
         selected_html_functions = [func_id for func_id in selected_functions if func_id.startswith('html_')]
+        # Name/controller của mọi HTML function được chọn - một query, dùng lại ở filter của lớp cha
+        html_functions_data = []
         
-        if selected_html_functions:
+        if selected_html_functions and self.html_db:
             try:
-                # Get HTML function data
-                html_function_ids = [int(func_id.replace('html_', '')) for func_id in selected_html_functions]
-                html_functions_data = []
+                html_functions_data = self.html_db.get_functions_by_ids(selected_html_functions)
                 
-                for func_id in html_function_ids:
-                    func_data = self.html_db.get_function_by_id(f"html_{func_id}")
-                    if func_data:
-                        html_functions_data.append(func_data)
-                        # Extract function name for Java analysis
-                        func_name = func_data['name']
-                        # Remove parentheses and clean up function name
-                        clean_func_name = func_name.replace('()', '').replace('/', '_').split('.')[-1]
-                        if clean_func_name not in java_function_names:
-                            java_function_names.append(clean_func_name)
+                for func_data in html_functions_data:
+                    # Extract function name for Java analysis
+                    func_name = func_data['name']
+                    # Remove parentheses and clean up function name
+                    clean_func_name = func_name.replace('()', '').replace('/', '_').split('.')[-1]
+                    if clean_func_name not in java_function_names:
+                        java_function_names.append(clean_func_name)
                 
-                # Get controller mappings
-                controller_mappings = self.html_db.get_controller_mappings_for_html(selected_html_functions)
+                # Handler mà các API call của HTML function resolve tới
+                for routes in self.resolve_html_routes(html_functions_data).values():
+                    for route in routes:
+                        if route.handler not in java_function_names:
+                            java_function_names.append(route.handler)
                 
                 # Store HTML data for graph generation
                 self.selected_html_functions = html_functions_data
-                self.html_to_java_mappings = {}
-                
-                for func_data in html_functions_data:
-                    func_name = func_data['name']
-                    html_func_id = f"html_{func_data['function_id']}"
-                    
-                    if html_func_id in controller_mappings:
-                        java_component = controller_mappings[html_func_id]
-                        self.html_to_java_mappings[func_name] = java_component
+                self._map_html_functions(html_functions_data)
                         
             except Exception as e:
                 print(f"❌ Error processing HTML functions in filter: {e}")
@@ -73,53 +82,46 @@ class HTMLAwareAnalyzer(SuperEnhancedJavaDependencyAnalyzer):
         if java_function_names:
             print(f"🎯 Setting selected functions for implementation analysis: {java_function_names}")
             self.set_selected_functions(java_function_names)
-            # Filter method calls to only show selected function calls
-            self._filter_method_calls_by_selected_functions(java_function_names)
+            # Filter method calls to only show selected function calls (và các method chúng gọi tới)
+            self._filter_method_calls_by_selected_functions(java_function_names,
+                                                            self._called_function_names(java_function_names))
         
         # Call parent method to handle Java filtering
-        super().filter_by_selection(selected_functions)
+        super().filter_by_selection(selected_functions, html_functions_data if selected_html_functions else None)
+    
+    def _called_function_names(self, function_names):
+        """
+        Tên các method trong forward slice của các method đã chọn (những gì chúng gọi tới, trực tiếp
+        hoặc gián tiếp) trên method_graph, trừ chính các tên đã chọn
+        """
+        nodes = [node for name in function_names for node in self.method_graph.nodes_named(name)]
+        if not nodes:
+            return []
+        # Chỉ method khai báo trong project (bỏ get/add/stream... của thư viện)
+        declared = [node for node in self.method_graph.forward_slice(nodes) if node in self.method_graph.methods]
+        extra = sorted(self.method_graph.method_names_of(declared) - set(function_names))
+        if extra:
+            print(f"🧭 Call-graph slice adds: {', '.join(extra)}")
+        return extra
     
-    def _filter_method_calls_by_selected_functions(self, selected_function_names):
-        """Filter method calls để chỉ hiển thị calls liên quan đến selected functions"""
+    def _filter_method_calls_by_selected_functions(self, selected_function_names, called_names=()):
+        """
+        Filter method calls để chỉ hiển thị calls liên quan đến selected functions (label chứa tên)
+        và các lời gọi tới called_names (đúng tên method, không khớp substring)
+        """
         if not selected_function_names:
             return
             
         print(f"🔍 Filtering method calls to show only: {', '.join(selected_function_names)}")
         
-        # Create filtered method_calls
-        filtered_method_calls = defaultdict(lambda: defaultdict(list))
-        
-        for source_file, targets in self.method_calls.items():
-            for target_file, methods in targets.items():
-                filtered_methods = []
-                
-                for method in methods:
-                    # Keep method if it matches any selected function name
-                    should_keep = False
-                    
-                    # Check if method contains selected function name
-                    for func_name in selected_function_names:
-                        if func_name.lower() in method.lower():
-                            should_keep = True
-                            break
-                    
-                    # Keep field declarations and other structural relationships
-                    if (method.startswith('field:') or 
-                        method.startswith('implements') or 
-                        method.startswith('@Autowired') or
-                        method.startswith('success') or  # Response methods
-                        'dependency' in method.lower()):
-                        should_keep = True
-                    
-                    if should_keep:
-                        filtered_methods.append(method)
-                
-                # Only add if there are methods to keep
-                if filtered_methods:
-                    filtered_method_calls[source_file][target_file] = filtered_methods
+        # Edges có label chứa tên được chọn cộng các quan hệ cấu trúc (field, implements, injection...)
+        edge_index = self.edge_index()
+        matched_edges = edge_index.edges_matching_names(selected_function_names) | edge_index.edges_calling(called_names)
+        filtered_method_calls = edge_index.method_calls_for(matched_edges)
         
         # Replace original method_calls with filtered version
         self.method_calls = filtered_method_calls
+        self._edge_index = None
         print(f"✅ Filtered method calls: {sum(len(targets) for targets in filtered_method_calls.values())} connections")
         
     def add_html_functions_to_graph(self, selected_html_function_ids):
@@ -128,77 +130,44 @@ class HTMLAwareAnalyzer(SuperEnhancedJavaDependencyAnalyzer):
             return
             
         try:
-            # Get HTML function data
-            html_functions_data = []
-            for func_id in selected_html_function_ids:
-                func_data = self.html_db.get_function_by_id(func_id)
-                if func_data:
-                    html_functions_data.append(func_data)
-            
-            # Get mappings
-            controller_mappings = self.html_db.get_controller_mappings_for_html(selected_html_function_ids)
+            # Get HTML function data (name + controller trong một query)
+            html_functions_data = self.html_db.get_functions_by_ids(selected_html_function_ids)
             
             # Store for graph generation
             self.selected_html_functions = html_functions_data
-            self.html_to_java_mappings = {}
+            self._map_html_functions(html_functions_data)
             
-            for func_data in html_functions_data:
-                func_name = func_data['name']
-                html_func_id = f"html_{func_data['function_id']}"
-                
-                if html_func_id in controller_mappings:
-                    java_component = controller_mappings[html_func_id]
-                    self.html_to_java_mappings[func_name] = java_component
-                    print(f"📱 {func_name} → 🔧 {java_component}")
+            for func_name, java_component in self.html_to_java_mappings.items():
+                print(f"📱 {func_name} → 🔧 {java_component}")
                     
         except Exception as e:
             print(f"❌ Error adding HTML functions: {e}")
     
-    def _generate_dot_content(self):
+    def _build_dot_graph(self):
         """Override để thêm HTML nodes"""
-        # Get base DOT content
-        content_lines = super()._generate_dot_content().split('\n')
-        
-        # Find insert position (before closing brace)
-        insert_pos = len(content_lines) - 1
-        while insert_pos > 0 and content_lines[insert_pos].strip() != '}':
-            insert_pos -= 1
+        # Get base DOT model
+        graph = super()._build_dot_graph()
         
         # Insert HTML nodes if available
-        if hasattr(self, 'selected_html_functions') and self.selected_html_functions:
-            html_lines = []
-            html_lines.append("")
-            html_lines.append("    // HTML Function Nodes")
+        for html_func in self.selected_html_functions:
+            func_name = html_func['name']
+            node_name = f"HTML_{func_name.replace(' ', '_').replace('()', '').replace('/', '_')}"
+            graph.add_node(node_name, label=f"{func_name}\\n(HTML Function)",
+                           URL=f"javascript:showNodeInfo('{node_name}')", fillcolor="lightgreen", shape="ellipse")
             
-            for html_func in self.selected_html_functions:
-                func_name = html_func['name']
-                node_name = f"HTML_{func_name.replace(' ', '_').replace('()', '').replace('/', '_')}"
-                url = f"javascript:showNodeInfo('{node_name}')"
-                html_lines.append(f'    "{node_name}" [label="{func_name}\\n(HTML Function)", URL="{url}", fillcolor="lightgreen", shape="ellipse"];')
-                
-                # Add edge to Java component
-                if hasattr(self, 'html_to_java_mappings') and func_name in self.html_to_java_mappings:
-                    java_component = self.html_to_java_mappings[func_name]
-                    
-                    # Find Java node in existing content
-                    java_node = None
-                    for line in content_lines:
-                        if f'"{java_component}"' in line and '[label=' in line:
-                            java_node = java_component
-                            break
-                    
-                    if java_node:
-                        url_edge = f"javascript:showEdgeInfo('{node_name}', '{java_node}')"
-                        html_lines.append(f'    "{node_name}" -> "{java_node}" [label="calls", URL="{url_edge}", color="green", style="bold"];')
-                    else:
-                        # Create Java node if not found
-                        java_node_name = f"Java_{java_component}"
-                        url_java = f"javascript:showNodeInfo('{java_node_name}')"
-                        html_lines.append(f'    "{java_node_name}" [label="{java_component}\\n(Java Component)", URL="{url_java}", fillcolor="lightyellow"];')
-                        url_edge = f"javascript:showEdgeInfo('{node_name}', '{java_node_name}')"
-                        html_lines.append(f'    "{node_name}" -> "{java_node_name}" [label="calls", URL="{url_edge}", color="green", style="bold"];')
+            # Add edge to Java component
+            if func_name not in self.html_to_java_mappings:
+                continue
+            java_component = self.html_to_java_mappings[func_name]
             
-            # Insert HTML lines before closing brace
-            content_lines[insert_pos:insert_pos] = html_lines
+            if graph.has_node(java_component):
+                java_node = java_component
+            else:
+                # Create Java node if not found
+                java_node = f"Java_{java_component}"
+                graph.add_node(java_node, label=f"{java_component}\\n(Java Component)",
+                               URL=f"javascript:showNodeInfo('{java_node}')", fillcolor="lightyellow")
+            graph.add_edge(node_name, java_node, label=self.html_route_labels.get(func_name, "calls"),
+                           URL=f"javascript:showEdgeInfo('{node_name}', '{java_node}')", color="green", style="bold")
         
-        return '\n'.join(content_lines)
+        return graph
@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
 """
-Database connector để lấy HTML/JS functions từ PostgreSQL database
+Backend PostgreSQL của HTML function store (xem html_store.py)
 """
 
 import json
+import select
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from pathlib import Path
+import psycopg2.extensions
+import psycopg2.pool
+from collections import defaultdict
+from contextlib import contextmanager
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import List, Dict, Any
 import os
+from metrics import DB_QUERY_SECONDS, record_cache
+from html_store import FUNCTION_COLUMNS, HTMLFunctionStore, assign_function_ids
+from html_migrations import LATEST_VERSION, NOTIFY_CHANNEL, migrate, refresh_mapping_view, schema_version
+from html_store import controller_mappings, load_manifest, normalize_function  # giữ import cũ từ html_db
 
 # Import config từ file riêng
 try:
@@ -19,24 +29,233 @@ except ImportError:
         'port': os.getenv('DB_PORT', '5432'),
         'database': os.getenv('DB_NAME', 'graph'),
         'user': os.getenv('DB_USER', 'postgres'),
-        'password': os.getenv('DB_PASSWORD', 'password'),
+        'password': os.getenv('DB_PASSWORD', ''),
         'schema': os.getenv('DB_SCHEMA', 'public')
     }
 
-class HTMLFunctionDatabase:
-    def __init__(self, db_config: Dict[str, str] = None):
+# Cột đọc từ html_function_mapping (một row mỗi function và controller)
+_SELECT_COLUMNS = "function_id, function_name, controller, service, api_calls"
+
+
+class _TimedQueries:
+    """Ghi nhận latency mỗi query (theo loại câu lệnh) cho /metrics"""
+    
+    def execute(self, query, vars=None):
+        operation = query.split(None, 1)[0].lower() if query.strip() else "unknown"
+        with DB_QUERY_SECONDS.time(operation=operation):
+            return super().execute(query, vars)
+
+
+class TimedCursor(_TimedQueries, psycopg2.extensions.cursor):
+    pass
+
+
+class TimedDictCursor(_TimedQueries, RealDictCursor):
+    pass
+
+
+class ConnectionPool:
+    """
+    ThreadedConnectionPool mở lazy ở lần đầu cần connection (server/analyzer khởi động
+    được cả khi database chưa sẵn sàng). Connection để lâu không dùng được ping lại trước
+    khi đưa ra; connection lỗi bị đóng thay vì trả về pool.
+    """
+    
+    def __init__(self, connect_kwargs: dict, minconn: int = 1, maxconn: int = 10,
+                 health_check_interval: float = 30.0):
+        self.connect_kwargs = connect_kwargs
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_interval = health_check_interval
+        self._pool = None
+        self._lock = threading.Lock()
+        self._last_used = {}  # id(connection) -> thời điểm trả về pool
+    
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Lỗi connect không được cache - lần gọi sau thử lại
+                self._pool = psycopg2.pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs)
+            return self._pool
+    
+    @contextmanager
+    def connection(self):
+        """Mượn một connection; transaction chưa commit bị rollback khi trả về pool"""
+        pool = self._get_pool()
+        conn = self._checkout(pool)
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            broken = broken or bool(conn.closed)
+            with self._lock:
+                if broken:
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=broken)
+    
+    def _checkout(self, pool):
+        for _ in range(self.maxconn + 1):
+            conn = pool.getconn()
+            with self._lock:
+                last_used = self._last_used.get(id(conn))
+            if not conn.closed and (last_used is None or
+                                    time.monotonic() - last_used < self.health_check_interval or
+                                    self._ping(conn)):
+                return conn
+            with self._lock:
+                self._last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection available")
+    
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+    
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._last_used.clear()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connect_kwargs(db_config: Dict[str, str]) -> Dict[str, str]:
+    """Tham số psycopg2.connect: bỏ schema và giá trị rỗng (libpq tự lấy từ PGPASSWORD/.pgpass)"""
+    return {k: v for k, v in db_config.items() if k != 'schema' and v not in (None, '')}
+
+
+def get_pool(db_config: Dict[str, str]) -> ConnectionPool:
+    """Một pool cho mỗi cấu hình kết nối - các HTMLFunctionDatabase cùng config dùng chung"""
+    kwargs = connect_kwargs(db_config)
+    key = tuple(sorted((k, str(v)) for k, v in kwargs.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(kwargs)
+        return pool
+
+
+class FunctionTable:
+    """
+    Bản in-memory (chỉ đọc) của bảng html_function với index theo id, tên và controller.
+    `rows` có thể có nhiều row cho một function (một row mỗi controller, từ html_function_mapping):
+    by_controller giữ tất cả, các index còn lại giữ row đầu tiên của mỗi function.
+    """
+    
+    def __init__(self, rows: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.rows = []  # một row mỗi function, sắp theo function_name
+        self.by_id = {}
+        self.by_name = defaultdict(list)  # lowercased function_name -> rows
+        self.by_controller = defaultdict(list)
+        for row in rows:
+            function_id = str(row['function_id'])
+            if function_id not in self.by_id:
+                self.by_id[function_id] = row
+                self.rows.append(row)
+                self.by_name[row['function_name'].lower()].append(row)
+            if row.get('controller'):
+                self.by_controller[row['controller']].append(row)
+
+
+class HTMLFunctionDatabase(HTMLFunctionStore):
+    def __init__(self, db_config: Dict[str, str] = None, cache_ttl: float = 60.0, listen: bool = True,
+                 auto_migrate: bool = False):
         if db_config is None:
             self.db_config = DB_CONFIG
         else:
             self.db_config = db_config
         
-        self.test_connection()
+        # Chưa kết nối ở đây: pool mở connection đầu tiên khi có query
+        self.pool = get_pool(self.db_config)
+        
+        # Cache bảng html_function (read-through): load lại khi version tăng (ghi trong process hoặc
+        # NOTIFY từ process khác), hoặc sau cache_ttl giây nếu không LISTEN được. cache_ttl <= 0: không cache
+        self.cache_ttl = cache_ttl
+        self.listen = listen
+        self._table = None
+        self._version = 0
+        self._version_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._listener = None
+        self._listening = False
+        
+        # Version schema (html_migrations) - None khi chưa kiểm tra. Migration chạy bằng bước setup tường
+        # minh (migrate(), html_migrations.py); auto_migrate=True chỉ cho test/dev
+        self.auto_migrate = auto_migrate
+        self._schema_version = None
+        self._schema_lock = threading.Lock()
+    
+    def connection(self):
+        """Context manager mượn connection từ pool dùng chung (kiểm tra schema ở lần đầu)"""
+        self._ensure_schema()
+        return self.pool.connection()
+    
+    def _ensure_schema(self):
+        """Kiểm tra version schema ở lần đầu; schema cũ hơn LATEST_VERSION thì raise (không tự chạy DDL)"""
+        if self._schema_version is not None:
+            return
+        with self._schema_lock:
+            if self._schema_version is not None:
+                return
+            if self.auto_migrate:
+                self.migrate()
+                return
+            # Không kết nối được hoặc schema cũ thì để None, lần sau kiểm tra lại (sau khi đã migrate)
+            with self.pool.connection() as conn:
+                version = schema_version(conn, self.db_config['schema'])
+            if version < LATEST_VERSION:
+                raise RuntimeError(f"html schema version {version} < {LATEST_VERSION}, "
+                                   f"run `python html_migrations.py` to migrate")
+            self._schema_version = version
+    
+    def check_schema(self):
+        """
+        Gọi khi mở store: schema cũ hơn LATEST_VERSION thì raise ngay, thay vì để mọi getter in lỗi
+        và trả về []. Database chưa kết nối được thì chỉ cảnh báo - kiểm tra lại ở query đầu tiên
+        """
+        try:
+            self._ensure_schema()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            print(f"⚠️ PostgreSQL not reachable, html schema will be checked on first query: {e}")
+    
+    def migrate(self) -> int:
+        """Áp dụng migration còn thiếu (bước setup: html_migrations.py, import_html_functions.py...)"""
+        with self.pool.connection() as conn:
+            self._schema_version = migrate(conn, self.db_config['schema'])
+        return self._schema_version
+    
+    @property
+    def _mapping_source(self) -> str:
+        """Materialized view đọc function kèm controller"""
+        return f"{self.db_config['schema']}.html_function_mapping"
     
     def test_connection(self):
         """Test PostgreSQL connection"""
         try:
-            conn = psycopg2.connect(**{k: v for k, v in self.db_config.items() if k != 'schema'})
-            conn.close()
+            with self.connection():
+                pass
             print(f"✅ Connected to PostgreSQL database: {self.db_config['database']}")
         except Exception as e:
             print(f"❌ Failed to connect to PostgreSQL: {e}")
@@ -45,210 +264,355 @@ class HTMLFunctionDatabase:
             raise
     
     def get_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**{k: v for k, v in self.db_config.items() if k != 'schema'})
+        """Connection riêng ngoài pool (script tự quản lý transaction và tự đóng)"""
+        return psycopg2.connect(**connect_kwargs(self.db_config))
     
-    def get_all_functions(self) -> List[Dict[str, Any]]:
-        """Lấy tất cả HTML/JS functions từ PostgreSQL database với controller info"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+    @property
+    def cache_enabled(self) -> bool:
+        return self.cache_ttl > 0
+    
+    @property
+    def cache_version(self) -> int:
+        return self._version
+    
+    def invalidate_cache(self):
+        """Đánh dấu cache cũ - lần đọc sau load lại bảng"""
+        with self._version_lock:
+            self._version += 1
+    
+    def _fresh(self, table) -> bool:
+        if table is None or table.version != self._version:
+            return False
+        return self._listening or time.monotonic() - table.loaded_at < self.cache_ttl
+    
+    def _function_table(self) -> FunctionTable:
+        """Bảng html_function từ cache, load lại nếu cần. Load lỗi thì dùng tạm bản cũ (nếu có)"""
+        table = self._table
+        if self._fresh(table):
+            record_cache("html_function", True)
+            return table
+        
+        with self._load_lock:
+            table = self._table
+            if self._fresh(table):
+                record_cache("html_function", True)
+                return table
+            record_cache("html_function", False)
             
-            schema = self.db_config['schema']
-            cursor.execute(f'''
-                SELECT function_id, function_name, controller, service
-                FROM {schema}.html_function
-                ORDER BY function_name
-            ''')
+            version = self._version
+            try:
+                rows = self._query_all_rows()
+            except Exception as e:
+                if table is None:
+                    raise
+                print(f"⚠️ Could not reload HTML functions, serving cached copy: {e}")
+                return table
             
-            functions = []
-            for row in cursor.fetchall():
-                functions.append({
-                    'id': f'html_{row["function_id"]}',  # Prefix để phân biệt với Java functions
-                    'function_id': row['function_id'],
-                    'name': row['function_name'],
-                    'controller': row.get('controller', 'Unknown'),
-                    'service': row.get('service', 'Unknown'),
-                    'file': f'Frontend/{row["function_name"]} -> {row.get("controller", "Unknown")} -> {row.get("service", "Unknown")}',
-                    'type': 'html',
-                    'description': f'HTML/JS function: {row["function_name"]} → {row.get("controller", "Unknown")} → {row.get("service", "Unknown")}',
-                    'dependencies': 2  # Sẽ có dependency đến Java controller và service
-                })
+            table = self._table = FunctionTable(rows, version)
+            print(f"✅ Loaded {len(rows)} HTML functions from database")
+        self._start_listener()
+        return table
+    
+    def _query_all_rows(self) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedDictCursor)
             
-            conn.close()
-            print(f"✅ Loaded {len(functions)} HTML functions from database")
-            return functions
+            cursor.execute(f'''
+                SELECT {_SELECT_COLUMNS}
+                FROM {self._mapping_source}
+                ORDER BY function_name, function_id, controller
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def _start_listener(self):
+        if not self.listen or self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_loop, name="html-function-listener", daemon=True)
+        self._listener.start()
+    
+    def _listen_loop(self):
+        """LISTEN trên connection riêng (autocommit); mỗi NOTIFY làm cache hết hạn"""
+        retry_delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = self.get_connection()
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                self._listening = True
+                retry_delay = 1.0
+                # Có thể đã lỡ thay đổi trong lúc chưa LISTEN
+                self.invalidate_cache()
+                
+                while True:
+                    if select.select([conn], [], [], 30.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self.invalidate_cache()
+            except Exception as e:
+                if self._listening:
+                    print(f"⚠️ HTML function listener disconnected, falling back to {self.cache_ttl}s TTL: {e}")
+                self._listening = False
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 60.0)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+    
+    def _notify_changed(self, cursor):
+        """Báo các process khác (đang LISTEN) reload cache; NOTIFY được gửi khi transaction commit"""
+        cursor.execute(f"NOTIFY {NOTIFY_CHANNEL}")
+    
+    def _refresh_mapping_view(self, conn):
+        """
+        Gọi sau khi commit một lần ghi: refresh html_function_mapping đúng một lần (trigger chỉ đánh
+        dấu stale). Dữ liệu đã commit nên lỗi refresh chỉ được báo - view còn cờ stale cho lần sau.
+        """
+        try:
+            refresh_mapping_view(conn, self.db_config['schema'])
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ html_function_mapping not refreshed, run html_migrations.py --refresh: {e}")
+    
+    def get_all_functions(self) -> List[Dict[str, Any]]:
+        """Lấy tất cả HTML/JS functions với controller info (từ cache nếu bật)"""
+        try:
+            rows = self._function_table().rows if self.cache_enabled else self._query_all_rows()
+            return [self._row_to_listing(row) for row in rows]
             
         except Exception as e:
             print(f"❌ Error loading HTML functions: {e}")
             return []
     
     def get_functions_by_ids(self, function_ids: List[str]) -> List[Dict[str, Any]]:
-        """Lấy functions theo danh sách IDs"""
-        if not function_ids:
+        """
+        Lấy name/controller/service của cả danh sách IDs - từ cache, hoặc một query (function_id = ANY)
+        nếu tắt cache; giữ thứ tự của function_ids, ID không tồn tại bị bỏ qua
+        """
+        clean_ids = list(dict.fromkeys(str(fid).replace('html_', '') for fid in function_ids or ()))
+        if not clean_ids:
             return []
             
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Remove 'html_' prefix nếu có
-            clean_ids = [fid.replace('html_', '') for fid in function_ids if 'html_' in fid]
-            if not clean_ids:
-                return []
-            
-            schema = self.db_config['schema']
-            placeholders = ','.join(['%s'] * len(clean_ids))
-            cursor.execute(f'''
-                SELECT function_id, function_name
-                FROM {schema}.html_function
-                WHERE function_id IN ({placeholders})
-            ''', clean_ids)
-            
-            functions = []
-            for row in cursor.fetchall():
-                functions.append({
-                    'id': f'html_{row["function_id"]}',
-                    'function_id': row['function_id'],
-                    'name': row['function_name'],
-                    'file': f'Frontend/{row["function_name"]}',
-                    'type': 'html',
-                    'description': f'HTML/JS function: {row["function_name"]}',
-                    'dependencies': 1
-                })
-            
-            conn.close()
-            return functions
+            if self.cache_enabled:
+                rows = self._function_table().by_id
+            else:
+                rows = self._query_rows_by_ids(clean_ids)
+            return [self._row_to_function(rows[fid]) for fid in clean_ids if fid in rows]
             
         except Exception as e:
             print(f"❌ Error loading HTML functions by IDs: {e}")
             return []
     
-    def get_function_by_id(self, function_id: str) -> Dict[str, Any]:
-        """Lấy function specific với controller info"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+    def _query_rows_by_ids(self, clean_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedDictCursor)
             
-            # Remove 'html_' prefix nếu có
-            clean_id = function_id.replace('html_', '')
-            
-            schema = self.db_config['schema']
+            # So sánh dạng text: id không phải số (vd. id text cũ, giờ ở cột legacy_id) chỉ không khớp
             cursor.execute(f'''
-                SELECT function_id, function_name, controller
-                FROM {schema}.html_function
-                WHERE function_id = %s
-            ''', (clean_id,))
-            
-            row = cursor.fetchone()
-            if row:
-                function = {
-                    'id': f'html_{row["function_id"]}',
-                    'function_id': row['function_id'],
-                    'name': row['function_name'],
-                    'controller': row.get('controller', 'Unknown'),
-                    'file': f'Frontend/{row["function_name"]} -> {row.get("controller", "Unknown")}',
-                    'type': 'html',
-                    'description': f'HTML/JS function: {row["function_name"]} calls {row.get("controller", "Unknown")}',
-                    'dependencies': 1
-                }
+                SELECT {_SELECT_COLUMNS}
+                FROM {self._mapping_source}
+                WHERE function_id::text = ANY(%s)
+                ORDER BY controller DESC
+            ''', (clean_ids,))
+            # Nhiều controller: giữ controller nhỏ nhất (cùng row với FunctionTable)
+            return {str(row['function_id']): row for row in cursor.fetchall()}
+    
+    def get_functions_by_name(self, name: str) -> List[Dict[str, Any]]:
+        """Functions có function_name trùng (không phân biệt hoa thường) - từ cache, hoặc query theo index"""
+        try:
+            if self.cache_enabled:
+                rows = self._function_table().by_name.get(name.lower(), [])
             else:
-                function = None
-            
-            conn.close()
-            return function
-            
+                rows = self._query_rows_by_name(name)
+            return [self._row_to_function(row) for row in rows]
         except Exception as e:
-            print(f"❌ Error loading HTML function by ID: {e}")
-            return None
-    
-    def get_controller_mappings_for_html(self, selected_html_functions: List[str]) -> Dict[str, str]:
-        """
-        Lấy mapping chính xác từ HTML functions đến Java controllers từ database
-        """
-        mappings = {}
-        
+            print(f"❌ Error loading HTML functions by name: {e}")
+            return []
+
+    def _query_rows_by_name(self, name: str) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedDictCursor)
+            schema = self.db_config['schema']
+
+            # html_function_lower_name_idx; nhiều controller thì giữ controller nhỏ nhất (như FunctionTable)
+            cursor.execute(f'''
+                SELECT * FROM (
+                    SELECT DISTINCT ON (f.function_id)
+                           f.function_id, f.function_name,
+                           COALESCE(m.controller, f.controller) AS controller,
+                           COALESCE(m.service, f.service) AS service,
+                           f.api_calls
+                    FROM {schema}.html_function f
+                    LEFT JOIN {schema}.html_controller_mapping m ON m.function_id = f.function_id
+                    WHERE lower(f.function_name) = %s
+                    ORDER BY f.function_id, m.controller
+                ) AS rows
+                ORDER BY function_name, function_id
+            ''', (name.lower(),))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_functions_by_controller(self, controller: str) -> List[Dict[str, Any]]:
+        """Functions gọi tới controller - từ cache, hoặc query theo index"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            for html_func_id in selected_html_functions:
-                if html_func_id.startswith('html_'):
-                    clean_id = html_func_id.replace('html_', '')
-                    
-                    # Lấy controller từ database
-                    schema = self.db_config['schema']
-                    cursor.execute(f'''
-                        SELECT controller, function_name
-                        FROM {schema}.html_function
-                        WHERE function_id = %s
-                    ''', (clean_id,))
-                    
-                    row = cursor.fetchone()
-                    if row and row['controller']:
-                        mappings[html_func_id] = row['controller']
-                        print(f"🔗 {html_func_id} → {row['controller']} (from {row['function_name']})")
-                    else:
-                        print(f"⚠️ No controller mapping found for {html_func_id}")
-            
-            conn.close()
-            
+            if self.cache_enabled:
+                rows = self._function_table().by_controller.get(controller, [])
+            else:
+                rows = self._query_rows_by_controller(controller)
+            return [self._row_to_function(row) for row in rows]
         except Exception as e:
-            print(f"❌ Error getting controller mappings: {e}")
-        
-        return mappings
+            print(f"❌ Error loading HTML functions by controller: {e}")
+            return []
+
+    def _query_rows_by_controller(self, controller: str) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedDictCursor)
+            schema = self.db_config['schema']
 
+            # Mapping trong html_controller_mapping (index controller, function_id); function chưa có
+            # mapping nào dùng cột controller của nó (html_function_controller_idx) - như html_function_mapping
+            cursor.execute(f'''
+                SELECT f.function_id, f.function_name, m.controller,
+                       COALESCE(m.service, f.service) AS service, f.api_calls
+                FROM {schema}.html_controller_mapping m
+                JOIN {schema}.html_function f ON f.function_id = m.function_id
+                WHERE m.controller = %s
+                UNION ALL
+                SELECT f.function_id, f.function_name, f.controller, f.service, f.api_calls
+                FROM {schema}.html_function f
+                WHERE f.controller = %s
+                  AND NOT EXISTS (SELECT 1 FROM {schema}.html_controller_mapping m
+                                  WHERE m.function_id = f.function_id)
+                ORDER BY function_name, function_id
+            ''', (controller, controller))
+            return [dict(row) for row in cursor.fetchall()]
+    
     def clear_all_functions(self):
         """Clear all HTML functions from database"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self.connection() as conn:
+                cursor = conn.cursor(cursor_factory=TimedCursor)
             
-            schema = self.db_config['schema']
+                schema = self.db_config['schema']
             
-            # Clear functions
-            cursor.execute(f'DELETE FROM {schema}.html_function')
-            print("   🧹 Cleared HTML functions")
+                # Clear functions
+                cursor.execute(f'DELETE FROM {schema}.html_function')
+                print("   🧹 Cleared HTML functions")
+                self._notify_changed(cursor)
             
-            conn.commit()
-            conn.close()
+                conn.commit()
+                self._refresh_mapping_view(conn)
+            self.invalidate_cache()
             print("✅ Database cleared successfully")
             
         except Exception as e:
             print(f"❌ Error clearing database: {e}")
             
-    def add_function(self, name: str, file: str, func_type: str, description: str) -> bool:
-        """Add HTML function to database with existing schema"""
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
+    def bulk_import(self, functions: List[Dict[str, Any]], replace: bool = False, page_size: int = 1000) -> int:
+        """
+        Insert nhiều HTML functions trong một transaction (execute_values, `page_size` rows/statement).
+        Mỗi function là dict có function_name (hoặc name), tùy chọn function_id, controller, service;
+        thiếu function_id thì cấp tiếp theo MAX hiện tại. replace=True xóa bảng trước khi insert.
+        Raise nếu lỗi (không row nào được ghi); trả về số row đã insert.
+        """
+        rows = [normalize_function(func) for func in functions]
+        
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedCursor)
             schema = self.db_config['schema']
             
-            # Get next function_id
-            cursor.execute(f'SELECT COALESCE(MAX(function_id), 0) + 1 FROM {schema}.html_function')
-            next_id = cursor.fetchone()[0]
+            # Chặn ghi song song trong lúc cấp function_id (đọc vẫn được)
+            cursor.execute(f'LOCK TABLE {schema}.html_function IN EXCLUSIVE MODE')
+            if replace:
+                cursor.execute(f'DELETE FROM {schema}.html_function')
+            
+            self._insert_rows(cursor, rows, page_size)
+            self._notify_changed(cursor)
+            
+            conn.commit()
+            self._refresh_mapping_view(conn)
+        self.invalidate_cache()
+        return len(rows)
+    
+    def _insert_rows(self, cursor, rows: List[tuple], page_size: int = 1000):
+        """Insert trong transaction của cursor (caller đã LOCK TABLE)"""
+        schema = self.db_config['schema']
+        if any(row[0] is None for row in rows):
+            cursor.execute(f'SELECT COALESCE(MAX(function_id), 0) FROM {schema}.html_function')
+            rows = assign_function_ids(rows, cursor.fetchone()[0])
+        
+        execute_values(cursor, f'''
+            INSERT INTO {schema}.html_function ({', '.join(FUNCTION_COLUMNS)})
+            VALUES %s
+        ''', rows, page_size=page_size)
+    
+    def _indexed_rows(self, source_file: str) -> List[tuple]:
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedCursor)
+            schema = self.db_config['schema']
             
-            # Insert with existing schema (function_id, function_name only)
             cursor.execute(f'''
-                INSERT INTO {schema}.html_function (function_id, function_name)
-                VALUES (%s, %s)
-            ''', (next_id, f"{name} - {description}"))
+                SELECT function_name, function_id, content_hash
+                FROM {schema}.html_function
+                WHERE source_file = %s
+                ORDER BY function_id
+            ''', (source_file,))
+            return cursor.fetchall()
+    
+    def _apply_index_changes(self, inserts: List[tuple], updates: List[tuple], deletes: List[int]):
+        with self.connection() as conn:
+            cursor = conn.cursor(cursor_factory=TimedCursor)
+            schema = self.db_config['schema']
+            
+            cursor.execute(f'LOCK TABLE {schema}.html_function IN EXCLUSIVE MODE')
+            if deletes:
+                cursor.execute(f'DELETE FROM {schema}.html_function WHERE function_id = ANY(%s)', (deletes,))
+            if updates:
+                execute_values(cursor, f'''
+                    UPDATE {schema}.html_function AS f
+                    SET content_hash = v.content_hash, api_calls = v.api_calls,
+                        controller = COALESCE(v.controller, f.controller), service = COALESCE(v.service, f.service)
+                    FROM (VALUES %s) AS v (function_id, content_hash, api_calls, controller, service)
+                    WHERE f.function_id = v.function_id
+                ''', [(row[0], row[5], row[6], row[2], row[3]) for row in updates])
+            if inserts:
+                self._insert_rows(cursor, inserts)
+            self._notify_changed(cursor)
             
             conn.commit()
-            conn.close()
+            self._refresh_mapping_view(conn)
+        self.invalidate_cache()
+    
+    def add_controller_mapping(self, html_func_id: str, controller_name: str, service: str = None) -> bool:
+        """Thêm mapping HTML function -> controller (và service) vào html_controller_mapping"""
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor(cursor_factory=TimedCursor)
+                schema = self.db_config['schema']
+                
+                cursor.execute(f'''
+                    INSERT INTO {schema}.html_controller_mapping (function_id, controller, service)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (function_id, controller)
+                    DO UPDATE SET service = COALESCE(EXCLUDED.service, html_controller_mapping.service)
+                ''', (int(str(html_func_id).replace('html_', '')), controller_name, service))
+                self._notify_changed(cursor)
+                
+                conn.commit()
+                self._refresh_mapping_view(conn)
+            self.invalidate_cache()
             return True
             
         except Exception as e:
-            print(f"❌ Error adding function {name}: {e}")
+            print(f"❌ Error mapping {html_func_id} → {controller_name}: {e}")
             return False
             
-    def add_controller_mapping(self, html_func_id: str, controller_name: str) -> bool:
-        """Skip controller mapping as table doesn't exist yet"""
-        # For now, just return True since the table doesn't exist
-        # The mapping will be handled in the analyzer logic
-        return True
-
 if __name__ == "__main__":
     # Test database connection
     try:
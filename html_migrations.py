@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Migration có version cho schema HTML functions trên PostgreSQL.
+
+Version đã áp dụng lưu trong bảng html_schema_migrations; migrate() chạy các migration
+còn thiếu trong một transaction (DDL của PostgreSQL rollback được) dưới advisory lock để
+nhiều process khởi động cùng lúc không chạy trùng.
+
+    python html_migrations.py            # áp dụng migration còn thiếu
+    python html_migrations.py --status   # chỉ in version hiện tại
+    python html_migrations.py --refresh  # refresh html_function_mapping sau khi ghi ngoài html_db
+"""
+
+import argparse
+
+# Kênh LISTEN/NOTIFY báo bảng html_function (hoặc mapping) đã thay đổi
+NOTIFY_CHANNEL = "html_function_changed"
+
+# Khóa advisory riêng cho migration (số bất kỳ, cố định)
+_MIGRATION_LOCK_ID = 7_310_046
+
+# Từ version này trigger chỉ đánh dấu html_function_mapping stale + NOTIFY; người ghi refresh view
+# (CONCURRENTLY) một lần sau khi commit - xem refresh_mapping_view()
+DEFERRED_REFRESH_VERSION = 8
+
+MIGRATIONS = [
+    (1, "html_function table with primary key and controller/service columns", [
+        '''
+        CREATE TABLE IF NOT EXISTS {schema}.html_function (
+            function_id INTEGER PRIMARY KEY,
+            function_name VARCHAR(255) NOT NULL
+        )
+        ''',
+        # Bảng theo hướng dẫn setup cũ có function_id VARCHAR ('login_form'...): đổi tên cột cũ thành
+        # legacy_id (giữ nguyên giá trị) và thêm function_id INTEGER - id dạng số giữ số của nó, id
+        # còn lại được cấp tiếp theo id số lớn nhất, theo thứ tự legacy_id
+        '''
+        DO $$
+        DECLARE
+            pkey TEXT;
+        BEGIN
+            IF (SELECT atttypid FROM pg_attribute
+                WHERE attrelid = '{schema}.html_function'::regclass AND attname = 'function_id'
+                  AND NOT attisdropped)
+               NOT IN ('integer'::regtype, 'bigint'::regtype, 'smallint'::regtype) THEN
+                SELECT conname INTO pkey FROM pg_constraint
+                WHERE conrelid = '{schema}.html_function'::regclass AND contype = 'p';
+                IF pkey IS NOT NULL THEN
+                    EXECUTE format('ALTER TABLE {schema}.html_function DROP CONSTRAINT %I', pkey);
+                END IF;
+                ALTER TABLE {schema}.html_function RENAME COLUMN function_id TO legacy_id;
+                ALTER TABLE {schema}.html_function ADD COLUMN function_id INTEGER;
+
+                WITH numeric_ids AS (
+                    SELECT legacy_id, legacy_id::integer AS id,
+                           row_number() OVER (PARTITION BY legacy_id::integer ORDER BY legacy_id) AS rank
+                    FROM {schema}.html_function
+                    WHERE legacy_id ~ '^[0-9]+$' AND length(legacy_id) <= 9
+                ), kept AS (
+                    SELECT legacy_id, id FROM numeric_ids WHERE rank = 1
+                ), renumbered AS (
+                    SELECT legacy_id,
+                           (SELECT COALESCE(MAX(id), 0) FROM kept) + row_number() OVER (ORDER BY legacy_id) AS id
+                    FROM {schema}.html_function
+                    WHERE legacy_id NOT IN (SELECT legacy_id FROM kept)
+                )
+                UPDATE {schema}.html_function f SET function_id = ids.id
+                FROM (SELECT legacy_id, id FROM kept UNION ALL SELECT legacy_id, id FROM renumbered) AS ids
+                WHERE f.legacy_id = ids.legacy_id;
+
+                ALTER TABLE {schema}.html_function ALTER COLUMN function_id SET NOT NULL;
+                ALTER TABLE {schema}.html_function ALTER COLUMN legacy_id DROP NOT NULL;
+            END IF;
+        END $$
+        ''',
+        'ALTER TABLE {schema}.html_function ADD COLUMN IF NOT EXISTS controller VARCHAR(100)',
+        'ALTER TABLE {schema}.html_function ADD COLUMN IF NOT EXISTS service VARCHAR(100)',
+        # Bảng tạo tay trước đây có thể thiếu primary key
+        '''
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = '{schema}.html_function'::regclass AND contype = 'p'
+            ) THEN
+                ALTER TABLE {schema}.html_function ADD PRIMARY KEY (function_id);
+            END IF;
+        END $$
+        ''',
+    ]),
+    (2, "indexes for name ordering, case-insensitive name and controller lookups", [
+        'CREATE INDEX IF NOT EXISTS html_function_name_idx ON {schema}.html_function (function_name)',
+        'CREATE INDEX IF NOT EXISTS html_function_lower_name_idx ON {schema}.html_function (lower(function_name))',
+        '''
+        CREATE INDEX IF NOT EXISTS html_function_controller_idx
+            ON {schema}.html_function (controller) INCLUDE (function_id, function_name)
+        ''',
+    ]),
+    (3, "normalized html_controller_mapping table", [
+        '''
+        CREATE TABLE IF NOT EXISTS {schema}.html_controller_mapping (
+            function_id INTEGER NOT NULL REFERENCES {schema}.html_function (function_id) ON DELETE CASCADE,
+            controller VARCHAR(100) NOT NULL,
+            service VARCHAR(100),
+            PRIMARY KEY (function_id, controller)
+        )
+        ''',
+        # (controller, function_id) để tra ngược controller -> functions chỉ bằng index
+        '''
+        CREATE INDEX IF NOT EXISTS html_controller_mapping_controller_idx
+            ON {schema}.html_controller_mapping (controller, function_id)
+        ''',
+        '''
+        INSERT INTO {schema}.html_controller_mapping (function_id, controller, service)
+        SELECT function_id, controller, service FROM {schema}.html_function
+        WHERE controller IS NOT NULL
+        ON CONFLICT DO NOTHING
+        ''',
+    ]),
+    (4, "html_function_mapping materialized view joining functions to controllers and services", [
+        # Một row cho mỗi (function, controller); function chưa có mapping dùng cột controller/service của nó
+        '''
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {schema}.html_function_mapping AS
+        SELECT f.function_id,
+               f.function_name,
+               COALESCE(m.controller, f.controller) AS controller,
+               COALESCE(m.service, f.service) AS service
+        FROM {schema}.html_function f
+        LEFT JOIN {schema}.html_controller_mapping m ON m.function_id = f.function_id
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS html_function_mapping_key
+            ON {schema}.html_function_mapping (function_id, controller)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS html_function_mapping_controller_idx
+            ON {schema}.html_function_mapping (controller) INCLUDE (function_id)
+        ''',
+    ]),
+    (5, "refresh html_function_mapping and NOTIFY on every change", [
+        # Statement-level: bulk insert chỉ refresh một lần mỗi câu lệnh; ghi từ psql cũng được thấy
+        '''
+        CREATE OR REPLACE FUNCTION {schema}.html_function_changed() RETURNS trigger AS $$
+        BEGIN
+            REFRESH MATERIALIZED VIEW {schema}.html_function_mapping;
+            PERFORM pg_notify('{channel}', TG_TABLE_NAME);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP TRIGGER IF EXISTS html_function_changed ON {schema}.html_function',
+        '''
+        CREATE TRIGGER html_function_changed
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {schema}.html_function
+            FOR EACH STATEMENT EXECUTE FUNCTION {schema}.html_function_changed()
+        ''',
+        'DROP TRIGGER IF EXISTS html_controller_mapping_changed ON {schema}.html_controller_mapping',
+        '''
+        CREATE TRIGGER html_controller_mapping_changed
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {schema}.html_controller_mapping
+            FOR EACH STATEMENT EXECUTE FUNCTION {schema}.html_function_changed()
+        ''',
+    ]),
+    (6, "source file, content hash and API calls for indexed frontend functions", [
+        'ALTER TABLE {schema}.html_function ADD COLUMN IF NOT EXISTS source_file VARCHAR(500)',
+        'ALTER TABLE {schema}.html_function ADD COLUMN IF NOT EXISTS content_hash CHAR(40)',
+        'ALTER TABLE {schema}.html_function ADD COLUMN IF NOT EXISTS api_calls TEXT',
+        '''
+        CREATE INDEX IF NOT EXISTS html_function_source_idx
+            ON {schema}.html_function (source_file) INCLUDE (function_name, content_hash)
+        ''',
+    ]),
+    (7, "api_calls in html_function_mapping", [
+        'DROP MATERIALIZED VIEW IF EXISTS {schema}.html_function_mapping',
+        '''
+        CREATE MATERIALIZED VIEW {schema}.html_function_mapping AS
+        SELECT f.function_id,
+               f.function_name,
+               COALESCE(m.controller, f.controller) AS controller,
+               COALESCE(m.service, f.service) AS service,
+               f.api_calls
+        FROM {schema}.html_function f
+        LEFT JOIN {schema}.html_controller_mapping m ON m.function_id = f.function_id
+        ''',
+        '''
+        CREATE UNIQUE INDEX html_function_mapping_key
+            ON {schema}.html_function_mapping (function_id, controller)
+        ''',
+        '''
+        CREATE INDEX html_function_mapping_controller_idx
+            ON {schema}.html_function_mapping (controller) INCLUDE (function_id)
+        ''',
+    ]),
+    (8, "mark html_function_mapping stale in the trigger, refresh it concurrently after writes", [
+        # REFRESH ... CONCURRENTLY cần unique index chỉ gồm cột, không NULL: mapping_controller là
+        # controller của html_controller_mapping ('' khi function chưa có mapping)
+        'DROP MATERIALIZED VIEW IF EXISTS {schema}.html_function_mapping',
+        '''
+        CREATE MATERIALIZED VIEW {schema}.html_function_mapping AS
+        SELECT f.function_id,
+               f.function_name,
+               COALESCE(m.controller, f.controller) AS controller,
+               COALESCE(m.service, f.service) AS service,
+               f.api_calls,
+               COALESCE(m.controller, '') AS mapping_controller
+        FROM {schema}.html_function f
+        LEFT JOIN {schema}.html_controller_mapping m ON m.function_id = f.function_id
+        ''',
+        '''
+        CREATE UNIQUE INDEX html_function_mapping_key
+            ON {schema}.html_function_mapping (function_id, mapping_controller)
+        ''',
+        '''
+        CREATE INDEX html_function_mapping_controller_idx
+            ON {schema}.html_function_mapping (controller) INCLUDE (function_id)
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS {schema}.html_function_mapping_state (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            stale BOOLEAN NOT NULL DEFAULT FALSE,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        ''',
+        'INSERT INTO {schema}.html_function_mapping_state DEFAULT VALUES ON CONFLICT DO NOTHING',
+        # Trigger không refresh nữa: mỗi câu lệnh ghi chỉ đánh dấu stale và báo các process đang LISTEN
+        '''
+        CREATE OR REPLACE FUNCTION {schema}.html_function_changed() RETURNS trigger AS $$
+        BEGIN
+            UPDATE {schema}.html_function_mapping_state SET stale = TRUE, changed_at = now();
+            PERFORM pg_notify('{channel}', TG_TABLE_NAME);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn, schema: str = 'public') -> int:
+    """Version đã áp dụng (0 nếu chưa có bảng html_schema_migrations); không ghi gì"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'SELECT COALESCE(MAX(version), 0) FROM {schema}.html_schema_migrations')
+        return cursor.fetchone()[0]
+    except Exception:
+        conn.rollback()
+        return 0
+
+
+def refresh_mapping_view(conn, schema: str = 'public', only_stale: bool = False) -> bool:
+    """
+    Refresh html_function_mapping (CONCURRENTLY - request đọc không bị chặn), xóa cờ stale, NOTIFY
+    và commit; gọi một lần sau transaction ghi, chỉ với schema >= DEFERRED_REFRESH_VERSION (trước
+    đó trigger tự refresh). only_stale=True: bỏ qua (trả về False) nếu view không stale.
+    """
+    cursor = conn.cursor()
+    if only_stale:
+        cursor.execute(f'SELECT stale FROM {schema}.html_function_mapping_state')
+        row = cursor.fetchone()
+        if row and not row[0]:
+            conn.rollback()
+            return False
+    cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {schema}.html_function_mapping')
+    cursor.execute(f'UPDATE {schema}.html_function_mapping_state SET stale = FALSE')
+    cursor.execute(f'NOTIFY {NOTIFY_CHANNEL}')
+    conn.commit()
+    return True
+
+
+def migrate(conn, schema: str = 'public', target: int = None) -> int:
+    """Áp dụng các migration còn thiếu (tới `target`, mặc định mới nhất) và commit; trả về version sau cùng"""
+    target = LATEST_VERSION if target is None else target
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT pg_advisory_xact_lock(%s)', (_MIGRATION_LOCK_ID,))
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.html_schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+    cursor.execute(f'SELECT COALESCE(MAX(version), 0) FROM {schema}.html_schema_migrations')
+    version = cursor.fetchone()[0]
+
+    for number, description, statements in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        for statement in statements:
+            cursor.execute(statement.format(schema=schema, channel=NOTIFY_CHANNEL))
+        cursor.execute(f'''
+            INSERT INTO {schema}.html_schema_migrations (version, description) VALUES (%s, %s)
+        ''', (number, description))
+        print(f"   🔧 Applied html schema migration {number}: {description}")
+        version = number
+
+    conn.commit()
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned migrations to the html_function schema")
+    parser.add_argument("--status", action="store_true", help="Chỉ in version hiện tại")
+    parser.add_argument("--target", type=int, help=f"Dừng ở version này (mặc định: {LATEST_VERSION})")
+    parser.add_argument("--refresh", action="store_true",
+                       help="Refresh html_function_mapping nếu đang stale (sau khi ghi bằng psql/script khác)")
+
+    args = parser.parse_args()
+
+    import psycopg2
+    from db_config import DB_CONFIG
+    from html_db import connect_kwargs
+
+    try:
+        conn = psycopg2.connect(**connect_kwargs(DB_CONFIG))
+    except Exception as e:
+        print(f"❌ Failed to connect to PostgreSQL: {e}")
+        return 1
+
+    schema = DB_CONFIG['schema']
+    try:
+        if args.status:
+            print(f"📋 html schema version: {schema_version(conn, schema)} (latest: {LATEST_VERSION})")
+        elif args.refresh:
+            version = schema_version(conn, schema)
+            if version < DEFERRED_REFRESH_VERSION:
+                print(f"❌ html schema version {version} < {DEFERRED_REFRESH_VERSION}, run html_migrations.py first")
+                return 1
+            refreshed = refresh_mapping_view(conn, schema, only_stale=True)
+            print("✅ html_function_mapping refreshed" if refreshed else "✅ html_function_mapping is up to date")
+        else:
+            version = migrate(conn, schema, args.target)
+            print(f"✅ html schema at version {version}")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration failed, nothing applied: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Store cho HTML/JS functions: interface chung, backend SQLite nhúng và factory chọn backend.
+
+Backend chọn theo HTML_DB_BACKEND (postgres | sqlite), mặc định PostgreSQL. HTML_DB_BACKEND=sqlite
+dùng file SQLite tại HTML_DB_PATH (mặc định html_functions.db) - chạy local/CI/benchmark không cần
+PostgreSQL. psycopg2 chỉ được import khi dùng PostgreSQL.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Any
+from metrics import DB_QUERY_SECONDS
+
+DEFAULT_SQLITE_PATH = "html_functions.db"
+
+# SQLite giới hạn số tham số mỗi câu lệnh (999 ở bản cũ)
+_SQLITE_BATCH = 500
+
+# Thứ tự cột của tuple normalize_function (source_file/content_hash/api_calls do frontend_indexer ghi)
+FUNCTION_COLUMNS = ("function_id", "function_name", "controller", "service", "source_file", "content_hash", "api_calls")
+
+
+def controller_mappings(functions: List[Dict[str, Any]]) -> Dict[str, str]:
+    """html id -> controller cho các function (kết quả get_functions_by_ids) có controller"""
+    return {function['id']: function['controller'] for function in functions if function.get('controller')}
+
+
+def normalize_function(func: Dict[str, Any]) -> tuple:
+    """Dict (JSON/CSV/script/indexer) -> tuple theo FUNCTION_COLUMNS; chuỗi rỗng coi như không có"""
+    def value(*keys):
+        for key in keys:
+            item = func.get(key)
+            if item is not None and str(item).strip() != '':
+                return str(item).strip()
+        return None
+
+    name = value('function_name', 'name')
+    if not name:
+        raise ValueError(f"HTML function without function_name: {func}")
+    function_id = value('function_id', 'id')
+    if function_id is not None:
+        function_id = int(function_id.replace('html_', ''))
+    api_calls = func.get('api_calls')
+    if isinstance(api_calls, (list, tuple)):
+        api_calls = json.dumps(list(api_calls))
+    return (function_id, name, value('controller', 'java_controller'), value('service', 'java_service'),
+            value('source_file'), value('content_hash'), api_calls or None)
+
+
+def decode_api_calls(value) -> List[Dict[str, str]]:
+    """Cột api_calls (JSON text) -> list {'method', 'url'}; hỏng/trống -> []"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    try:
+        calls = json.loads(value)
+    except ValueError:
+        return []
+    return calls if isinstance(calls, list) else []
+
+
+def assign_function_ids(rows: List[tuple], current_max: int) -> List[tuple]:
+    """Cấp function_id cho các row chưa có, tiếp theo sau MAX hiện tại và các id trong batch"""
+    next_id = max([current_max or 0] + [row[0] for row in rows if row[0] is not None]) + 1
+    assigned = []
+    for row in rows:
+        if row[0] is None:
+            row = (next_id,) + row[1:]
+            next_id += 1
+        assigned.append(row)
+    return assigned
+
+
+def load_manifest(path) -> List[Dict[str, Any]]:
+    """
+    Đọc manifest HTML functions: .csv (header function_id,function_name,controller,service)
+    hoặc JSON (list các object, hoặc {"functions": [...]})
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('functions', [])
+    return data
+
+
+class HTMLFunctionStore:
+    """
+    Interface chung của các backend. Backend cài đặt các query cơ bản; các lookup dẫn xuất
+    (get_function_by_id, controller mappings, add_function) dùng lại chúng.
+    """
+
+    def test_connection(self):
+        raise NotImplementedError
+
+    def get_all_functions(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_functions_by_ids(self, function_ids: List[str]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_functions_by_name(self, name: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_functions_by_controller(self, controller: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def clear_all_functions(self):
+        raise NotImplementedError
+
+    def bulk_import(self, functions: List[Dict[str, Any]], replace: bool = False, page_size: int = 1000) -> int:
+        raise NotImplementedError
+
+    def check_schema(self):
+        """Raise nếu schema phải migrate trước khi dùng (gọi khi mở store); backend tự tạo schema thì không cần"""
+        return None
+
+    def migrate(self):
+        """Áp dụng migration schema còn thiếu - bước setup tường minh; backend tự tạo schema khi mở thì không cần"""
+        return None
+
+    def sync_source(self, source_file: str, functions: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Đồng bộ các function frontend_indexer tìm được trong `source_file`: thêm function mới, cập
+        nhật function có content_hash khác, xóa function không còn trong file; function không đổi
+        không bị ghi. Không có thay đổi thì không mở transaction ghi nào.
+
+        Function được nhận theo (tên, thứ tự trong các function cùng tên của file): hai `submit()` trong
+        một file là hai row - function thứ n khớp row thứ n (theo function_id, cấp theo thứ tự trong file).
+        """
+        existing, occurrences = {}, defaultdict(int)  # (function_name, thứ tự) -> (function_id, content_hash)
+        for name, function_id, content_hash in self._indexed_rows(source_file):
+            existing[(name, occurrences[name])] = (function_id, content_hash)
+            occurrences[name] += 1
+
+        inserts, updates, seen, occurrences = [], [], set(), defaultdict(int)
+        for func in functions:
+            row = normalize_function(dict(func, source_file=source_file))
+            key = (row[1], occurrences[row[1]])
+            occurrences[row[1]] += 1
+            seen.add(key)
+            current = existing.get(key)
+            if current is None:
+                inserts.append(row)
+            elif current[1] != row[5]:
+                updates.append((current[0],) + row[1:])
+        deletes = [function_id for key, (function_id, _) in existing.items() if key not in seen]
+
+        if inserts or updates or deletes:
+            self._apply_index_changes(inserts, updates, deletes)
+        return {
+            "added": len(inserts),
+            "updated": len(updates),
+            "removed": len(deletes),
+            "unchanged": len(seen) - len(inserts) - len(updates),
+        }
+
+    def _indexed_rows(self, source_file: str) -> List[tuple]:
+        """(function_name, function_id, content_hash) của các row của source_file, theo function_id"""
+        raise NotImplementedError
+
+    def _apply_index_changes(self, inserts: List[tuple], updates: List[tuple], deletes: List[int]):
+        """Một transaction: insert (cấp function_id), update content_hash/api_calls/controller, delete"""
+        raise NotImplementedError
+
+    def get_function_by_id(self, function_id: str) -> Dict[str, Any]:
+        """Lấy function specific với controller info"""
+        functions = self.get_functions_by_ids([function_id])
+        return functions[0] if functions else None
+
+    def get_controller_mappings_for_html(self, selected_html_functions: List[str]) -> Dict[str, str]:
+        """
+        Lấy mapping chính xác từ HTML functions đến Java controllers từ database (một query cho cả danh sách)
+        """
+        html_ids = [fid for fid in selected_html_functions if fid.startswith('html_')]
+        return controller_mappings(self.get_functions_by_ids(html_ids))
+
+    def add_function(self, name: str, file: str, func_type: str, description: str) -> bool:
+        """Add HTML function to database with existing schema"""
+        try:
+            self.bulk_import([{'function_name': f"{name} - {description}"}])
+            return True
+
+        except Exception as e:
+            print(f"❌ Error adding function {name}: {e}")
+            return False
+
+    def add_controller_mapping(self, html_func_id: str, controller_name: str, service: str = None) -> bool:
+        raise NotImplementedError
+
+    @staticmethod
+    def _row_to_listing(row) -> Dict[str, Any]:
+        return {
+            'id': f'html_{row["function_id"]}',  # Prefix để phân biệt với Java functions
+            'function_id': row['function_id'],
+            'name': row['function_name'],
+            'controller': row.get('controller', 'Unknown'),
+            'service': row.get('service', 'Unknown'),
+            'file': f'Frontend/{row["function_name"]} -> {row.get("controller", "Unknown")} -> {row.get("service", "Unknown")}',
+            'type': 'html',
+            'description': f'HTML/JS function: {row["function_name"]} → {row.get("controller", "Unknown")} → {row.get("service", "Unknown")}',
+            'dependencies': 2  # Sẽ có dependency đến Java controller và service
+        }
+
+    @staticmethod
+    def _row_to_function(row) -> Dict[str, Any]:
+        controller = row.get('controller') or 'Unknown'
+        return {
+            'id': f'html_{row["function_id"]}',
+            'function_id': row['function_id'],
+            'name': row['function_name'],
+            'controller': row.get('controller'),
+            'service': row.get('service'),
+            'file': f'Frontend/{row["function_name"]} -> {controller}',
+            'type': 'html',
+            'description': f'HTML/JS function: {row["function_name"]} calls {controller}',
+            'dependencies': 1,
+            'api_calls': decode_api_calls(row.get('api_calls')),
+        }
+
+
+class SQLiteFunctionStore(HTMLFunctionStore):
+    """Backend SQLite nhúng (file hoặc ':memory:') với cùng bảng html_function và cùng các query"""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = str(path)
+        # Một connection dùng chung giữa các thread của server, tuần tự hóa bằng lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        with self._lock, self._conn:
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS html_function (
+                    function_id INTEGER PRIMARY KEY,
+                    function_name TEXT NOT NULL,
+                    controller TEXT,
+                    service TEXT,
+                    source_file TEXT,
+                    content_hash TEXT,
+                    api_calls TEXT
+                );
+                CREATE INDEX IF NOT EXISTS html_function_name_idx ON html_function (function_name COLLATE NOCASE);
+                CREATE INDEX IF NOT EXISTS html_function_controller_idx ON html_function (controller);
+                CREATE TABLE IF NOT EXISTS html_controller_mapping (
+                    function_id INTEGER NOT NULL REFERENCES html_function (function_id) ON DELETE CASCADE,
+                    controller TEXT NOT NULL,
+                    service TEXT,
+                    PRIMARY KEY (function_id, controller)
+                );
+                CREATE INDEX IF NOT EXISTS html_controller_mapping_controller_idx
+                    ON html_controller_mapping (controller, function_id);
+            ''')
+            # File tạo trước khi có frontend_indexer thiếu các cột này
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(html_function)')}
+            for column in FUNCTION_COLUMNS:
+                if column not in columns:
+                    self._conn.execute(f'ALTER TABLE html_function ADD COLUMN {column} TEXT')
+            self._conn.executescript('''
+                CREATE INDEX IF NOT EXISTS html_function_source_idx ON html_function (source_file);
+                -- Như materialized view html_function_mapping bên PostgreSQL (ở đây là view thường,
+                -- tạo lại mỗi lần mở để luôn khớp các cột hiện tại)
+                DROP VIEW IF EXISTS html_function_mapping;
+                CREATE VIEW html_function_mapping AS
+                SELECT f.function_id,
+                       f.function_name,
+                       COALESCE(m.controller, f.controller) AS controller,
+                       COALESCE(m.service, f.service) AS service,
+                       f.api_calls
+                FROM html_function f
+                LEFT JOIN html_controller_mapping m ON m.function_id = f.function_id;
+            ''')
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        operation = sql.split(None, 1)[0].lower()
+        with self._lock, DB_QUERY_SECONDS.time(operation=operation):
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def test_connection(self):
+        """Test SQLite store"""
+        self._query('SELECT 1')
+        print(f"✅ Opened SQLite HTML function store: {self.path}")
+
+    def get_all_functions(self) -> List[Dict[str, Any]]:
+        """Lấy tất cả HTML/JS functions với controller info"""
+        try:
+            rows = self._query('''
+                SELECT function_id, function_name, controller, service, api_calls
+                FROM html_function
+                ORDER BY function_name
+            ''')
+            return [self._row_to_listing(row) for row in rows]
+
+        except Exception as e:
+            print(f"❌ Error loading HTML functions: {e}")
+            return []
+
+    def get_functions_by_ids(self, function_ids: List[str]) -> List[Dict[str, Any]]:
+        """Như HTMLFunctionDatabase.get_functions_by_ids: giữ thứ tự, ID không tồn tại bị bỏ qua"""
+        clean_ids = list(dict.fromkeys(str(fid).replace('html_', '') for fid in function_ids or ()))
+        numeric_ids = [int(fid) for fid in clean_ids if fid.isdigit()]
+        if not numeric_ids:
+            return []
+
+        try:
+            rows = {}
+            for start in range(0, len(numeric_ids), _SQLITE_BATCH):
+                batch = numeric_ids[start:start + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                for row in self._query(f'''
+                    SELECT function_id, function_name, controller, service, api_calls
+                    FROM html_function
+                    WHERE function_id IN ({placeholders})
+                ''', batch):
+                    rows[str(row['function_id'])] = row
+            return [self._row_to_function(rows[fid]) for fid in clean_ids if fid in rows]
+
+        except Exception as e:
+            print(f"❌ Error loading HTML functions by IDs: {e}")
+            return []
+
+    def get_functions_by_name(self, name: str) -> List[Dict[str, Any]]:
+        """Functions có function_name trùng (không phân biệt hoa thường)"""
+        try:
+            rows = self._query('''
+                SELECT function_id, function_name, controller, service, api_calls
+                FROM html_function
+                WHERE function_name = ? COLLATE NOCASE
+                ORDER BY function_name
+            ''', (name,))
+            return [self._row_to_function(row) for row in rows]
+        except Exception as e:
+            print(f"❌ Error loading HTML functions by name: {e}")
+            return []
+
+    def get_functions_by_controller(self, controller: str) -> List[Dict[str, Any]]:
+        """Functions gọi tới controller"""
+        try:
+            rows = self._query('''
+                SELECT function_id, function_name, controller, service, api_calls
+                FROM html_function_mapping
+                WHERE controller = ?
+                ORDER BY function_name
+            ''', (controller,))
+            return [self._row_to_function(row) for row in rows]
+        except Exception as e:
+            print(f"❌ Error loading HTML functions by controller: {e}")
+            return []
+
+    def clear_all_functions(self):
+        """Clear all HTML functions from database"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute('DELETE FROM html_function')
+            print("✅ Database cleared successfully")
+        except Exception as e:
+            print(f"❌ Error clearing database: {e}")
+
+    def bulk_import(self, functions: List[Dict[str, Any]], replace: bool = False, page_size: int = 1000) -> int:
+        """Insert nhiều HTML functions trong một transaction; raise nếu lỗi (không row nào được ghi)"""
+        rows = [normalize_function(func) for func in functions]
+
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute('DELETE FROM html_function')
+            self._insert_rows(rows)
+        return len(rows)
+
+    def _insert_rows(self, rows: List[tuple]):
+        """Insert trong transaction đang mở (caller giữ self._lock)"""
+        if any(row[0] is None for row in rows):
+            current_max = self._conn.execute('SELECT COALESCE(MAX(function_id), 0) FROM html_function').fetchone()[0]
+            rows = assign_function_ids(rows, current_max)
+        with DB_QUERY_SECONDS.time(operation="insert"):
+            self._conn.executemany(f'''
+                INSERT INTO html_function ({', '.join(FUNCTION_COLUMNS)})
+                VALUES ({', '.join('?' * len(FUNCTION_COLUMNS))})
+            ''', rows)
+
+    def _indexed_rows(self, source_file: str) -> List[tuple]:
+        rows = self._query('''
+            SELECT function_id, function_name, content_hash FROM html_function WHERE source_file = ?
+            ORDER BY function_id
+        ''', (source_file,))
+        return [(row['function_name'], row['function_id'], row['content_hash']) for row in rows]
+
+    def _apply_index_changes(self, inserts: List[tuple], updates: List[tuple], deletes: List[int]):
+        with self._lock, self._conn:
+            for start in range(0, len(deletes), _SQLITE_BATCH):
+                batch = deletes[start:start + _SQLITE_BATCH]
+                self._conn.execute(f'DELETE FROM html_function WHERE function_id IN ({",".join("?" * len(batch))})', batch)
+            with DB_QUERY_SECONDS.time(operation="update"):
+                self._conn.executemany('''
+                    UPDATE html_function
+                    SET content_hash = ?, api_calls = ?,
+                        controller = COALESCE(?, controller), service = COALESCE(?, service)
+                    WHERE function_id = ?
+                ''', [(row[5], row[6], row[2], row[3], row[0]) for row in updates])
+            if inserts:
+                self._insert_rows(inserts)
+
+    def add_controller_mapping(self, html_func_id: str, controller_name: str, service: str = None) -> bool:
+        """Thêm mapping HTML function -> controller (và service) vào html_controller_mapping"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute('''
+                    INSERT INTO html_controller_mapping (function_id, controller, service)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (function_id, controller)
+                    DO UPDATE SET service = COALESCE(excluded.service, html_controller_mapping.service)
+                ''', (int(str(html_func_id).replace('html_', '')), controller_name, service))
+            return True
+
+        except Exception as e:
+            print(f"❌ Error mapping {html_func_id} → {controller_name}: {e}")
+            return False
+
+
+def default_backend() -> str:
+    """HTML_DB_BACKEND nếu được đặt, không thì PostgreSQL - không tự đổi backend theo cấu hình kết nối"""
+    return os.getenv('HTML_DB_BACKEND') or 'postgres'
+
+
+def open_html_store(backend: str = None, check_schema: bool = True, **options) -> HTMLFunctionStore:
+    """
+    Tạo store theo `backend` (hoặc HTML_DB_BACKEND). options: db_config/cache_ttl/listen cho
+    PostgreSQL, path cho SQLite (mặc định HTML_DB_PATH). Schema chưa migrate thì raise ngay khi mở;
+    check_schema=False cho script tự gọi migrate() trước khi dùng store.
+    """
+    backend = (backend or default_backend()).lower()
+
+    if backend in ('postgres', 'postgresql'):
+        from html_db import HTMLFunctionDatabase  # cần psycopg2
+        store = HTMLFunctionDatabase(**options)
+    elif backend == 'sqlite':
+        store = SQLiteFunctionStore(options.get('path') or os.getenv('HTML_DB_PATH', DEFAULT_SQLITE_PATH))
+    else:
+        raise ValueError(f"Unknown HTML function store backend: {backend} (expected postgres or sqlite)")
+    if check_schema:
+        store.check_schema()
+    return store
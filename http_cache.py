@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Nén response (brotli/gzip) và ETag cho server: graph artifacts và JSON API chỉ
+phải tải lại khi nội dung thực sự thay đổi.
+"""
+
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Nhỏ hơn ngưỡng này thì nén không đáng
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+
+def is_compressible(content_type: str) -> bool:
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def supported_encodings() -> list:
+    """Encoding server hỗ trợ, theo thứ tự ưu tiên"""
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Chọn encoding tốt nhất browser chấp nhận (bỏ qua các encoding có q=0)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = params.strip()
+        if quality.startswith("q=") and _quality(quality[2:]) == 0:
+            continue
+        accepted.add(name)
+
+    for encoding in supported_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def _quality(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 1.0
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag từ nội dung (bytes) hoặc các thành phần định danh phiên bản"""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return '"' + digest.hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match dùng weak comparison theo RFC 9110"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Mỗi bản nén có ETag riêng để cache trung gian không trộn lẫn representation"""
+    if not encoding:
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Import HTML/JS functions từ manifest JSON/CSV vào HTML function store trong một transaction.
+
+    python import_html_functions.py functions.json
+    python import_html_functions.py functions.csv --replace
+
+Ghi vào backend theo HTML_DB_BACKEND (xem html_store.py), hoặc chọn bằng --backend. Migration
+schema còn thiếu được áp dụng trước khi import (server/analyzer chỉ đọc, không tự migrate).
+CSV cần header: function_id,function_name,controller,service (function_id có thể bỏ trống).
+JSON: list các object cùng các key đó, hoặc {"functions": [...]}.
+"""
+
+import argparse
+import time
+from html_store import open_html_store, load_manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import HTML functions from a JSON/CSV manifest")
+    parser.add_argument("manifest", help="File manifest (.json hoặc .csv)")
+    parser.add_argument("--replace", action="store_true",
+                       help="Xóa toàn bộ HTML functions hiện có trước khi import")
+    parser.add_argument("--backend", choices=["postgres", "sqlite"],
+                       help="Backend của HTML function store (mặc định theo HTML_DB_BACKEND)")
+    parser.add_argument("--page-size", type=int, default=1000,
+                       help="Số row mỗi câu INSERT (mặc định: 1000)")
+
+    args = parser.parse_args()
+
+    try:
+        functions = load_manifest(args.manifest)
+    except Exception as e:
+        print(f"❌ Không đọc được manifest '{args.manifest}': {e}")
+        return 1
+
+    print(f"📝 Importing {len(functions)} HTML functions from {args.manifest}...")
+    started = time.monotonic()
+    try:
+        db = open_html_store(args.backend, check_schema=False)
+        db.migrate()
+        count = db.bulk_import(functions, replace=args.replace, page_size=args.page_size)
+    except Exception as e:
+        print(f"❌ Import failed, không có row nào được ghi: {e}")
+        return 1
+
+    print(f"✅ Imported {count} HTML functions in {time.monotonic() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
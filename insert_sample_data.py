@@ -3,13 +3,13 @@
 Script để thêm sample data vào PostgreSQL database
 """
 
-from html_db import HTMLFunctionDatabase
+from html_store import open_html_store
 
 def insert_sample_data():
     """Thêm sample HTML functions vào database"""
     
     try:
-        db = HTMLFunctionDatabase()
+        db = open_html_store()
         
         # Sample data phù hợp với Java controllers trong project
         sample_functions = [
@@ -27,15 +27,11 @@ def insert_sample_data():
         
         print("🔄 Inserting sample HTML functions...")
         
-        success_count = 0
+        count = db.bulk_import(sample_functions)
         for func_data in sample_functions:
-            if db.add_function(func_data):
-                success_count += 1
-                print(f"   ✅ Added: {func_data['function_name']}")
-            else:
-                print(f"   ❌ Failed: {func_data['function_name']}")
+            print(f"   ✅ Added: {func_data['function_name']}")
         
-        print(f"\n✅ Successfully inserted {success_count}/{len(sample_functions)} functions")
+        print(f"\n✅ Successfully inserted {count}/{len(sample_functions)} functions")
         
         # Test lại để xem data
         functions = db.get_all_functions()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Call graph ở mức method: node 'Class#method', edge caller -> callee kèm loại lời gọi. Build
+một lần trong analyze() cho mọi class; chọn function (selector, HTML route, drill-down
+Service -> Impl) chỉ là slice xuôi/ngược trên graph, không đọc lại file.
+"""
+
+import bisect
+import re
+from collections import defaultdict, deque
+
+# Loại edge: call (qua field/service/repository), local (biến cục bộ), self (method cùng class),
+# static, new, throw, enum, implements (Interface#m -> Impl#m)
+CALL_KINDS = ("call", "local", "self", "static", "new", "throw", "enum", "implements")
+
+CONSTRUCTOR = "<init>"
+
+_DECLARATION_PATTERN = re.compile(r'\b(?:class|interface|enum|record)\s+([A-Z][A-Za-z0-9_]*)')
+# Tham số có thể chứa annotation có đối số (@RequestParam(value = "")) nhưng không vượt qua ')'
+_METHOD_PATTERN = re.compile(
+    r'([A-Za-z_][A-Za-z0-9_]*)\s*\(([^;{}()]*(?:\([^;{}()]*\)[^;{}()]*)*)\)\s*(?:throws\s+[\w.,\s]+?)?\s*([{;])')
+# Từ đứng trước "name(" mà không phải kiểu trả về/modifier của một khai báo
+_NOT_DECLARATION = {"new", "return", "throw", "else", "case", "yield"}
+_PREVIOUS_WORD_PATTERN = re.compile(r'([A-Za-z_]\w*|[>\]])\s*\Z')
+_KEYWORDS = {"if", "for", "while", "switch", "catch", "synchronized", "return", "new", "throw", "super", "this"}
+
+
+def method_node(class_name: str, method_name: str) -> str:
+    return f"{class_name}#{method_name}"
+
+
+def split_node(node: str):
+    class_name, _, member = node.partition('#')
+    return class_name, member
+
+
+def dependency_label(target: str, kind: str) -> str:
+    """Nhãn 'Class#...' của drill-down Service -> Impl (xem SuperEnhancedJavaDependencyAnalyzer._build_dot_graph)"""
+    class_name, member = split_node(target)
+    if kind == "new":
+        return f"{class_name}#constructor"
+    if kind == "throw":
+        return f"{class_name}#exception"
+    if kind in ("static", "enum"):
+        return f"{class_name}#{kind}_{member}"
+    if kind == "local":
+        return f"{class_name}#method_{member}"
+    return target
+
+
+def java_methods(content: str):
+    """
+    (class_name, method_name, body) cho các method/constructor khai báo trực tiếp trong thân class.
+    `content` nên đã bỏ comment và string (analyzer._clean_content); body của method abstract
+    hoặc của interface là None. Constructor có tên CONSTRUCTOR.
+    """
+    # Cặp ngoặc nhọn và độ sâu ngay sau mỗi ngoặc
+    positions, depths, matching, stack = [], [], {}, []
+    for index, char in enumerate(content):
+        if char == '{':
+            stack.append(index)
+        elif char == '}' and stack:
+            matching[stack.pop()] = index
+        else:
+            continue
+        positions.append(index)
+        depths.append(len(stack))
+
+    def depth_at(position):
+        slot = bisect.bisect_right(positions, position) - 1
+        return depths[slot] if slot >= 0 else 0
+
+    # Thân của từng class/interface/enum: (mở, đóng, độ sâu bên trong, tên)
+    bodies = []
+    for declaration in _DECLARATION_PATTERN.finditer(content):
+        opening = content.find('{', declaration.end())
+        if opening != -1 and opening in matching:
+            bodies.append((opening, matching[opening], depth_at(opening), declaration.group(1)))
+
+    for match in _METHOD_PATTERN.finditer(content):
+        name = match.group(1)
+        if name in _KEYWORDS:
+            continue
+        start = match.start()
+        # Khai báo: tên đứng sau kiểu trả về/modifier, không sau '.', '=', '(' hay new/return...
+        previous = _PREVIOUS_WORD_PATTERN.search(content, max(0, start - 200), start)
+        if not previous or previous.group(1) in _NOT_DECLARATION:
+            continue
+
+        depth = depth_at(start)
+        owner = None
+        for opening, closing, body_depth, class_name in bodies:
+            if opening < start < closing and body_depth == depth:
+                owner = class_name
+        if owner is None:
+            continue
+
+        body = None
+        if match.group(3) == '{':
+            opening = match.end() - 1
+            body = content[opening + 1:matching.get(opening, len(content))]
+        yield owner, CONSTRUCTOR if name == owner else name, body
+
+
+class MethodGraph:
+    def __init__(self):
+        self.methods = {}  # node -> file khai báo
+        self._callees = defaultdict(dict)  # node -> {(target, kind): None}, giữ thứ tự
+        self._callers = defaultdict(dict)  # node -> {(caller, kind): None}
+        self._by_name = defaultdict(list)  # method name -> [node]
+        self._by_class = defaultdict(list)  # class name -> [method name]
+
+    def __len__(self):
+        return len(self.methods)
+
+    @property
+    def edge_count(self) -> int:
+        return sum(len(edges) for edges in self._callees.values())
+
+    def add_method(self, class_name: str, method_name: str, file=None) -> str:
+        node = method_node(class_name, method_name)
+        if node not in self.methods:
+            self.methods[node] = file
+            self._by_name[method_name].append(node)
+            self._by_class[class_name].append(method_name)
+        return node
+
+    def add_call(self, caller: str, target: str, kind: str = "call"):
+        if target == caller and kind == "self":
+            return
+        self._callees[caller][(target, kind)] = None
+        self._callers[target][(caller, kind)] = None
+
+    def callees(self, node: str):
+        """[(target, kind)] theo thứ tự xuất hiện trong thân method"""
+        return list(self._callees.get(node, ()))
+
+    def callers(self, node: str):
+        return list(self._callers.get(node, ()))
+
+    def nodes_named(self, method_name: str) -> list:
+        """Các method khai báo với tên này (mọi class)"""
+        return list(self._by_name.get(method_name, ()))
+
+    def methods_of(self, class_name: str) -> list:
+        """Tên các method khai báo trong class"""
+        return list(self._by_class.get(class_name, ()))
+
+    def dependency_labels(self, node: str) -> set:
+        """Dependency trực tiếp của method dạng 'Class#...' cho drill-down (bỏ lời gọi trong cùng class)"""
+        return {dependency_label(target, kind) for target, kind in self.callees(node)
+                if kind not in ("self", "implements")}
+
+    def forward_slice(self, nodes, depth: int = None, kinds=None) -> set:
+        """Các node đi tới được từ `nodes` (gồm cả `nodes`), tối đa `depth` bước, chỉ qua edge thuộc `kinds`"""
+        return self._slice(nodes, self._callees, depth, kinds)
+
+    def backward_slice(self, nodes, depth: int = None, kinds=None) -> set:
+        """Các node gọi (trực tiếp hoặc gián tiếp) tới `nodes`"""
+        return self._slice(nodes, self._callers, depth, kinds)
+
+    @staticmethod
+    def _slice(nodes, adjacency, depth, kinds) -> set:
+        reached = set(nodes)
+        queue = deque((node, 0) for node in reached)
+        while queue:
+            node, distance = queue.popleft()
+            if depth is not None and distance >= depth:
+                continue
+            for neighbour, kind in adjacency.get(node, ()):
+                if neighbour in reached or (kinds and kind not in kinds):
+                    continue
+                reached.add(neighbour)
+                queue.append((neighbour, distance + 1))
+        return reached
+
+    @staticmethod
+    def classes_of(nodes) -> set:
+        return {split_node(node)[0] for node in nodes}
+
+    @staticmethod
+    def method_names_of(nodes) -> set:
+        return {split_node(node)[1] for node in nodes} - {CONSTRUCTOR}
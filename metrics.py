@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Metrics nội bộ (analysis phases, parse, Graphviz, cache, DB, HTTP) xuất ra dạng
+Prometheus text exposition format cho endpoint /metrics - không cần prometheus_client.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=()) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # tuple(label values) -> value
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.extend(self._render_sample(labelvalues, value))
+        return lines
+
+    def _render_sample(self, labelvalues, value) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [số lần observe theo từng bucket (không cộng dồn), sum, count]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_sample(self, labelvalues, value) -> list:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, labelvalues, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, labelvalues, [("le", "+Inf")])
+        lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Analysis
+ANALYSIS_PHASE_SECONDS = REGISTRY.register(Gauge(
+    "depgraph_analysis_phase_seconds", "Duration of the last run of each analysis phase", ["phase"]))
+SOURCE_FILES_READ = REGISTRY.register(Counter(
+    "depgraph_source_files_read_total", "Java source files read, by analysis phase", ["phase"]))
+SOURCE_BYTES_READ = REGISTRY.register(Counter(
+    "depgraph_source_bytes_read_total", "Bytes of Java source read, by analysis phase", ["phase"]))
+REGEX_SECONDS = REGISTRY.register(Counter(
+    "depgraph_regex_seconds_total", "Time spent matching regexes over source files (excluding file reads)",
+    ["phase"]))
+
+# Graphviz
+RENDER_SECONDS = REGISTRY.register(Histogram(
+    "depgraph_render_seconds", "Graphviz render latency per RenderPlanner.render call",
+    ["backend", "outcome"], buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)))
+
+# Caches
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "depgraph_cache_lookups_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]))
+
+# Database
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "depgraph_db_query_seconds", "HTML function store query latency", ["operation"]))
+
+# HTTP
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "depgraph_http_requests_total", "HTTP requests by method, path and status", ["method", "path", "status"]))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "depgraph_http_request_seconds", "HTTP request latency by method and path", ["method", "path"]))
+
+# Server state (cập nhật lúc scrape)
+SERVER_STATE = REGISTRY.register(Gauge(
+    "depgraph_server_state", "Current server state values (sessions, cache sizes, SSE subscribers)", ["name"]))
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Theo dõi tiến độ phân tích (phase, số file đã quét, ETA) để server báo cho browser
+trong lúc analysis chạy nền.
+"""
+
+import threading
+import time
+
+from metrics import ANALYSIS_PHASE_SECONDS
+
+
+class AnalysisProgress:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = []  # tên các phase theo thứ tự
+        self.phase = None
+        self.files_total = 0
+        self.files_scanned = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._completed_phases = 0
+        self._phase_started = None
+
+    def begin(self, phases: list):
+        with self._lock:
+            self.phases = list(phases)
+            self.phase = None
+            self._phase_started = None
+            self.files_total = self.files_scanned = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.error = None
+            self._completed_phases = 0
+
+    def start_phase(self, name: str, files_total: int = 0):
+        with self._lock:
+            if self.phase is not None:
+                self._completed_phases += 1
+                self._record_phase_duration()
+            self.phase = name
+            self._phase_started = time.perf_counter()
+            self.files_total = files_total
+            self.files_scanned = 0
+
+    def advance(self, count: int = 1):
+        with self._lock:
+            self.files_scanned += count
+
+    def finish(self, error: str = None):
+        with self._lock:
+            if self._phase_started is not None:
+                self._record_phase_duration()
+                self._phase_started = None
+            self.finished_at = time.time()
+            self.error = error
+            if error is None:
+                self._completed_phases = len(self.phases)
+
+    def _record_phase_duration(self):
+        ANALYSIS_PHASE_SECONDS.set(round(time.perf_counter() - self._phase_started, 6), phase=self.phase)
+
+    @property
+    def running(self) -> bool:
+        return self.started_at is not None and self.finished_at is None
+
+    def fraction(self) -> float:
+        """Tỉ lệ hoàn thành ước lượng: mỗi phase cùng trọng số, trong phase tính theo số file"""
+        if not self.phases:
+            return 1.0 if self.finished_at else 0.0
+        within = self.files_scanned / self.files_total if self.files_total else 0.0
+        return min(1.0, (self._completed_phases + within) / len(self.phases))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            fraction = self.fraction()
+            eta = None
+            if self.running and fraction > 0:
+                eta = round(elapsed / fraction - elapsed, 1)
+            return {
+                "running": self.running,
+                "done": self.finished_at is not None and self.error is None,
+                "error": self.error,
+                "phase": self.phase,
+                "phase_index": min(self._completed_phases + 1, len(self.phases)) if self.phases else 0,
+                "phase_count": len(self.phases),
+                "files_scanned": self.files_scanned,
+                "files_total": self.files_total,
+                "progress": round(fraction, 3),
+                "elapsed": round(elapsed, 1),
+                "eta": eta,
+            }
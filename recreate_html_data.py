@@ -3,23 +3,13 @@
 Script để tạo lại HTML functions data phù hợp với Java project structure
 """
 
-from html_db import HTMLFunctionDatabase
-import psycopg2
+from html_store import open_html_store
 
 def clear_and_recreate_data():
     """Clear database và tạo lại HTML functions phù hợp với Java controllers/services"""
     
     try:
-        db = HTMLFunctionDatabase()
-        
-        # Clear existing data
-        print("🗑️ Clearing existing HTML functions...")
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM public.html_function")
-        conn.commit()
-        conn.close()
-        print("✅ Cleared existing data")
+        db = open_html_store()
         
         # Tạo HTML functions dựa trên Java project structure thực tế
         realistic_functions = [
@@ -58,17 +48,13 @@ def clear_and_recreate_data():
             {'function_id': '20', 'function_name': 'Product Management Dashboard'}
         ]
         
-        print(f"🔄 Inserting {len(realistic_functions)} realistic HTML functions...")
+        print(f"🔄 Replacing existing data with {len(realistic_functions)} realistic HTML functions...")
         
-        success_count = 0
+        count = db.bulk_import(realistic_functions, replace=True)
         for func_data in realistic_functions:
-            if db.add_function(func_data):
-                success_count += 1
-                print(f"   ✅ Added: {func_data['function_name']}")
-            else:
-                print(f"   ❌ Failed: {func_data['function_name']}")
+            print(f"   ✅ Added: {func_data['function_name']}")
         
-        print(f"\n✅ Successfully inserted {success_count}/{len(realistic_functions)} functions")
+        print(f"\n✅ Successfully inserted {count}/{len(realistic_functions)} functions")
         
         # Test lại để xem data
         functions = db.get_all_functions()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Render planner: chọn layout engine theo kích thước graph, giới hạn thời gian
+Graphviz và tự giảm độ chi tiết khi vượt quá thời gian cho phép.
+"""
+
+import time
+from collections import defaultdict
+from dot_writer import DotGraph
+from graph_renderer import PyGraphvizRenderer, SubprocessRenderer, RenderTimeout, RenderError, RenderCancelled
+from metrics import RENDER_SECONDS
+
+# Các mức giảm chi tiết, thử lần lượt khi Graphviz chạy quá timeout
+DEGRADATION_LEVELS = ["full", "truncated_labels", "collapsed_edges", "package_aggregation"]
+
+
+class RenderResult:
+    def __init__(self, success: bool, engine: str = None, level: str = None,
+                 elapsed: float = 0.0, error: str = None, backend: str = None, data: dict = None):
+        self.success = success
+        self.engine = engine
+        self.level = level
+        self.elapsed = elapsed
+        self.error = error
+        self.backend = backend
+        self.data = data or {}  # format -> bytes cho các output render trong bộ nhớ
+
+    @property
+    def degraded(self) -> bool:
+        return self.success and self.level != "full"
+
+    def describe(self) -> dict:
+        return {"engine": self.engine, "degradation": self.level, "elapsed": round(self.elapsed, 3),
+                "backend": self.backend}
+
+
+class RenderPlanner:
+    def __init__(self, timeout: float = 60.0, sfdp_node_threshold: int = 800,
+                 fdp_cycle_density: float = 0.5, label_length: int = 24, in_process_node_limit: int = 300):
+        # Tổng thời gian cho cả lần render: các level sau chỉ được phần thời gian còn lại
+        self.timeout = timeout
+        self.sfdp_node_threshold = sfdp_node_threshold
+        self.fdp_cycle_density = fdp_cycle_density
+        self.label_length = label_length
+        # Render trong process không ngắt được, chỉ dùng cho graph nhỏ; graph lớn chạy subprocess để còn timeout
+        self.in_process_node_limit = in_process_node_limit
+        self.in_process = PyGraphvizRenderer() if PyGraphvizRenderer.available() else None
+        self.subprocess = SubprocessRenderer()
+        self.cancelled = False
+        self.backend = None  # renderer của lần thử gần nhất (cho metrics)
+
+    def choose_engine(self, graph: DotGraph) -> str:
+        """dot cho graph phân tầng vừa phải, fdp khi nhiều vòng, sfdp cho graph rất lớn"""
+        if graph.node_count > self.sfdp_node_threshold:
+            return "sfdp"
+        if graph.node_count > 50 and cycle_density(graph) > self.fdp_cycle_density:
+            return "fdp"
+        return "dot"
+
+    def choose_renderer(self, graph: DotGraph):
+        if self.in_process and graph.node_count <= self.in_process_node_limit:
+            return self.in_process
+        return self.subprocess
+
+    def render(self, graph: DotGraph, dot_file: str, outputs: dict) -> RenderResult:
+        """
+        Render graph ra các format trong `outputs` (format -> file, None = trả bytes trong
+        RenderResult.data), giảm chi tiết nếu timeout. DOT chỉ được ghi ra `dot_file` để tham khảo.
+        """
+        started = time.monotonic()
+        try:
+            result = self._render(graph, dot_file, outputs, started)
+        except RenderCancelled:
+            RENDER_SECONDS.observe(time.monotonic() - started, backend=self.backend or "none", outcome="cancelled")
+            raise
+        outcome = ("degraded" if result.degraded else "ok") if result.success else "failed"
+        RENDER_SECONDS.observe(result.elapsed, backend=result.backend or "none", outcome=outcome)
+        return result
+
+    def _render(self, graph: DotGraph, dot_file: str, outputs: dict, started: float) -> RenderResult:
+        last_error = None
+        deadline = started + self.timeout
+
+        for level in DEGRADATION_LEVELS:
+            if self.cancelled:
+                raise RenderCancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                last_error = f"render budget of {self.timeout}s exhausted before level '{level}'"
+                break
+            planned = self.degrade(graph, level)
+            engine = self.choose_engine(planned)
+            renderer = self.choose_renderer(planned)
+            self.backend = renderer.name
+
+            try:
+                data = renderer.render(planned, engine, outputs, timeout=remaining)
+            except RenderTimeout:
+                if self.cancelled:
+                    raise RenderCancelled()
+                last_error = f"{engine} exceeded {remaining:.1f}s left of the {self.timeout}s budget at level '{level}'"
+                print(f"⏱️ Graphviz timeout: {last_error}, retrying with less detail...")
+                continue
+            except RenderError as e:
+                # dot bị kill bởi cancel() kết thúc với exit code khác 0
+                if self.cancelled:
+                    raise RenderCancelled()
+                return RenderResult(False, engine, level, time.monotonic() - started, str(e), renderer.name)
+
+            # DOT file luôn khớp với hình đã render
+            if dot_file:
+                with open(dot_file, 'w', encoding='utf-8') as f:
+                    planned.write(f)
+
+            if level != "full":
+                print(f"⚠️ Graph rendered with reduced detail ({level}, engine={engine})")
+            return RenderResult(True, engine, level, time.monotonic() - started, backend=renderer.name, data=data)
+
+        return RenderResult(False, None, None, time.monotonic() - started, last_error, self.backend)
+
+    def cancel(self):
+        """
+        Hủy render: kill `dot` đang chạy và không thử level tiếp theo; render() raise RenderCancelled.
+        Gọi trước khi render bắt đầu cũng có hiệu lực (planner chỉ dùng cho một lần render).
+        """
+        self.cancelled = True
+        self.subprocess.cancel()
+
+    def degrade(self, graph: DotGraph, level: str) -> DotGraph:
+        """Trả về bản sao graph đã giảm chi tiết theo level (các level sau bao gồm level trước)"""
+        if level == "full":
+            return graph
+
+        degraded = graph.copy()
+        self._truncate_labels(degraded)
+        if level in ("collapsed_edges", "package_aggregation"):
+            degraded = self._collapse_edges(degraded)
+        if level == "package_aggregation":
+            degraded = self._aggregate_packages(degraded)
+        return degraded
+
+    def _truncate_labels(self, graph: DotGraph):
+        for _, attrs in graph.nodes:
+            if "label" in attrs:
+                attrs["label"] = self._shorten(attrs["label"])
+        for _, _, attrs in graph.edges:
+            if "label" in attrs:
+                attrs["label"] = self._shorten(attrs["label"])
+
+    def _shorten(self, label: str) -> str:
+        first_line = label.split('\\n')[0]
+        if len(first_line) > self.label_length:
+            first_line = first_line[:self.label_length - 1] + '…'
+        return first_line
+
+    @staticmethod
+    def _collapse_edges(graph: DotGraph) -> DotGraph:
+        """Gộp các edge song song và bỏ label"""
+        collapsed = _empty_like(graph)
+        for name, attrs in graph.nodes:
+            collapsed.add_node(name, **attrs)
+        seen = set()
+        for source, target, attrs in graph.edges:
+            if (source, target) in seen:
+                continue
+            seen.add((source, target))
+            kept = {k: v for k, v in attrs.items() if k != "label"}
+            collapsed.add_edge(source, target, **kept)
+        return collapsed
+
+    @staticmethod
+    def _aggregate_packages(graph: DotGraph) -> DotGraph:
+        """Gộp node theo package, edge giữa package ghi số lượng dependency"""
+        members = defaultdict(list)
+        for name, _ in graph.nodes:
+            members[graph.groups.get(name, name)].append(name)
+
+        aggregated = _empty_like(graph)
+        for group, names in members.items():
+            if len(names) == 1 and names[0] == group:
+                aggregated.add_node(group, **graph.get_node(group))
+            else:
+                aggregated.add_node(group, label=f"{group}\\n({len(names)} nodes)",
+                                    fillcolor="lightgrey", URL=f"javascript:showNodeInfo('{names[0]}')")
+
+        counts = defaultdict(int)
+        for source, target, _ in graph.edges:
+            source_group = graph.groups.get(source, source)
+            target_group = graph.groups.get(target, target)
+            if source_group != target_group:
+                counts[(source_group, target_group)] += 1
+        for (source_group, target_group), count in counts.items():
+            aggregated.add_edge(source_group, target_group, label=str(count))
+        return aggregated
+
+
+def _empty_like(graph: DotGraph) -> DotGraph:
+    empty = DotGraph(graph.name)
+    empty.statements = list(graph.statements)
+    empty.groups = dict(graph.groups)
+    return empty
+
+
+def cycle_density(graph: DotGraph) -> float:
+    """Tỉ lệ edge nằm trong một strongly connected component có nhiều hơn một node"""
+    if not graph.edge_count:
+        return 0.0
+
+    adjacency = defaultdict(list)
+    for source, target, _ in graph.edges:
+        adjacency[source].append(target)
+
+    component = _strongly_connected_components(list(name for name, _ in graph.nodes), adjacency)
+    sizes = defaultdict(int)
+    for comp_id in component.values():
+        sizes[comp_id] += 1
+
+    cyclic = sum(
+        1 for source, target, _ in graph.edges
+        if source in component and component.get(source) == component.get(target) and sizes[component[source]] > 1
+    )
+    return cyclic / graph.edge_count
+
+
+def _strongly_connected_components(nodes, adjacency) -> dict:
+    """Tarjan không đệ quy; trả về node -> component id"""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    component = {}
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(adjacency.get(root, ())))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, neighbors = work[-1]
+            advanced = False
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(adjacency.get(neighbor, ()))))
+                    advanced = True
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            if advanced:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component[member] = node
+                    if member == node:
+                        break
+
+    return component
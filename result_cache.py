@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cache kết quả /api/generate trên disk: cùng selection trên cùng snapshot (và cùng
+edit state) trả về DOT + metadata + ảnh đã render và render info mà không phải filter
+và chạy Graphviz lại. Entry cũ bị loại theo LRU khi tổng dung lượng vượt giới hạn.
+"""
+
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from metrics import record_cache
+
+# Các file generate_enhanced_graph có thể tạo trong output dir
+ARTIFACT_NAMES = (
+    "dependencies.dot",
+    "dependencies.png",
+    "dependencies.map",
+    "dependencies.html",
+    "dependencies_metadata.json",
+    "dependencies_metadata.json.gz",
+    "dependencies_layout.json",
+)
+
+# Edit state của overlay - góp vào cache key
+EDIT_STATE_ATTRIBUTES = ("hidden_nodes", "hidden_edges", "custom_nodes", "custom_edges", "custom_colors", "edge_edits")
+
+_ENTRY_FILE = "entry.json"
+
+
+def artifact_mtimes(output_dir: Path) -> dict:
+    """mtime của các artifact hiện có - so trước/sau generate để biết file nào vừa được ghi"""
+    mtimes = {}
+    for name in ARTIFACT_NAMES:
+        try:
+            mtimes[name] = (output_dir / name).stat().st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+
+def normalize_selection(selected_functions) -> list:
+    """Selection không phụ thuộc thứ tự/trùng lặp: các id đã strip, bỏ trùng và sắp xếp"""
+    return sorted({str(func_id).strip() for func_id in selected_functions if str(func_id).strip()})
+
+
+def edit_state_hash(overlay) -> str:
+    state = {name: getattr(overlay, name, None) for name in EDIT_STATE_ATTRIBUTES}
+    encoded = json.dumps(state, sort_keys=True, default=_json_default).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def cache_key(snapshot, selection: list, overlay) -> str:
+    digest = hashlib.sha1()
+    for part in (snapshot.id, snapshot.created_at, edit_state_hash(overlay), *selection):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, root_dir: str = None, max_bytes: int = 256 * 1024 * 1024):
+        self.root_dir = Path(root_dir or tempfile.mkdtemp(prefix="depgraph-results-"))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> bytes trên disk, cũ nhất ở đầu
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, key: str, output_dir: Path):
+        """
+        Khôi phục artifact của entry vào `output_dir`, trả về render info đã lưu. None nếu không có
+        hoặc entry hỏng - khi đó caller generate như bình thường.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                record_cache("result", False)
+                return None
+            self._entries.move_to_end(key)
+        entry_dir = self.root_dir / key
+
+        try:
+            with open(entry_dir / _ENTRY_FILE, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            for name in ARTIFACT_NAMES:
+                cached = entry_dir / name
+                target = output_dir / name
+                if cached.is_file():
+                    shutil.copyfile(cached, target)
+                elif target.exists():
+                    target.unlink()
+        except Exception as e:
+            print(f"⚠️ Result cache entry {key[:12]} unusable: {e}")
+            self._discard(key)
+            with self._lock:
+                self.misses += 1
+            record_cache("result", False)
+            return None
+
+        with self._lock:
+            self.hits += 1
+        record_cache("result", True)
+        return entry.get("render") or {}
+
+    def store(self, key: str, output_dir: Path, previous_mtimes: dict = None, render_info: dict = None):
+        """Lưu render info và các artifact đã thay đổi so với `previous_mtimes` (artifact_mtimes trước khi generate)"""
+        previous_mtimes = previous_mtimes or {}
+        entry_dir = self.root_dir / key
+        try:
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            with open(entry_dir / _ENTRY_FILE, 'w', encoding='utf-8') as f:
+                json.dump({"render": render_info}, f, default=str)
+            size = (entry_dir / _ENTRY_FILE).stat().st_size
+            for name, mtime in artifact_mtimes(output_dir).items():
+                if previous_mtimes.get(name) != mtime:
+                    shutil.copyfile(output_dir / name, entry_dir / name)
+                    size += (entry_dir / name).stat().st_size
+        except Exception as e:
+            print(f"⚠️ Could not cache generate result: {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        with self._lock:
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            evicted = []
+            total = sum(self._entries.values())
+            while len(self._entries) > 1 and total > self.max_bytes:
+                old_key, old_size = self._entries.popitem(last=False)
+                total -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            shutil.rmtree(self.root_dir / old_key, ignore_errors=True)
+
+    def _discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+        shutil.rmtree(self.root_dir / key, ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Bảng route của Spring controllers: (HTTP method, path pattern) -> controller method, lấy từ
+@RequestMapping/@GetMapping/@PostMapping/... khi analyze. Tra cứu qua trie theo từng segment
+của path nên một URL (kể cả template /carts/{userId}/items từ frontend_indexer) ra đúng
+handler mà không phải duyệt qua các class.
+"""
+
+import bisect
+import re
+from typing import List, Optional
+
+# Method của các annotation rút gọn; RequestMapping không ghi method = mọi method
+MAPPING_METHODS = {
+    "GetMapping": "GET",
+    "PostMapping": "POST",
+    "PutMapping": "PUT",
+    "DeleteMapping": "DELETE",
+    "PatchMapping": "PATCH",
+    "RequestMapping": None,
+}
+
+ANY_METHOD = "*"
+
+_MAPPING_PATTERN = re.compile(r'@(' + '|'.join(MAPPING_METHODS) + r')\b\s*(\((?:[^()"]|"[^"]*")*\))?')
+_CLASS_PATTERN = re.compile(r'\b(?:class|interface)\s+([A-Z][A-Za-z0-9_]*)')
+_CONTROLLER_PATTERN = re.compile(r'@(?:Rest)?Controller\b')
+# Tên method Java đứng sau annotation (bỏ qua các annotation/modifier/kiểu trả về ở giữa)
+_HANDLER_PATTERN = re.compile(r'([a-zA-Z_][A-Za-z0-9_]*)\s*\(')
+_STRING_PATTERN = re.compile(r'"([^"]*)"')
+_REQUEST_METHOD_PATTERN = re.compile(r'RequestMethod\.([A-Z]+)')
+_JAVA_KEYWORDS = {"public", "protected", "private", "static", "final", "synchronized", "abstract", "new", "return"}
+# Modifier có thể đứng giữa annotation của class và từ khóa class
+_CLASS_MODIFIERS = {"public", "protected", "private", "static", "final", "abstract", "sealed", "non-sealed", "strictfp"}
+# Comment Java (bỏ đi) và string/char literal, text block (giữ nguyên - path của mapping nằm trong string)
+_COMMENT_OR_LITERAL_PATTERN = re.compile(
+    r'"""[\s\S]*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*[\s\S]*?\*/'
+)
+_TRAILING_WORD_PATTERN = re.compile(r'@?[A-Za-z_][\w.-]*\Z')
+_TRAILING_ANNOTATION_PATTERN = re.compile(r'@[A-Za-z_][\w.]*\s*\Z')
+
+
+class Route:
+    def __init__(self, method: str, pattern: str, controller: str, handler: str, file=None):
+        self.method = method  # GET/POST/... hoặc ANY_METHOD
+        self.pattern = pattern
+        self.controller = controller
+        self.handler = handler
+        self.file = file
+
+    def describe(self) -> str:
+        return f"{self.method} {self.pattern} → {self.controller}.{self.handler}"
+
+    def __repr__(self):
+        return f"Route({self.describe()})"
+
+
+class _Node:
+    __slots__ = ("literals", "param", "wildcard", "routes")
+
+    def __init__(self):
+        self.literals = {}  # segment -> _Node
+        self.param = None  # _Node cho segment {var}
+        self.wildcard = None  # _Node cho ** (khớp phần còn lại)
+        self.routes = {}  # method -> Route
+
+
+def strip_comments(content: str) -> str:
+    """Bỏ comment `//` và `/* */` của source Java, giữ nguyên string ("http://..." không bị cắt)"""
+    return _COMMENT_OR_LITERAL_PATTERN.sub(
+        lambda match: ' ' if match.group().startswith('/') else match.group(), content)
+
+
+def _class_header_start(content: str, class_start: int) -> int:
+    """Vị trí đầu dãy annotation và modifier liền trước từ khóa class (content đã strip_comments)"""
+    position = class_start
+    while True:
+        end = position
+        while end > 0 and content[end - 1].isspace():
+            end -= 1
+        if end and content[end - 1] == ')':
+            # Annotation có đối số: lùi qua cặp ngoặc (bỏ qua ngoặc trong string) tới tên annotation
+            opening = _opening_parenthesis(content, end - 1)
+            annotation = None
+            if opening is not None:
+                annotation = _TRAILING_ANNOTATION_PATTERN.search(content, max(0, opening - 200), opening)
+            if not annotation:
+                return end
+            position = annotation.start()
+            continue
+        word = _TRAILING_WORD_PATTERN.search(content, max(0, end - 200), end)
+        if word and (word.group().startswith('@') or word.group() in _CLASS_MODIFIERS):
+            position = word.start()
+            continue
+        return end
+
+
+def _opening_parenthesis(content: str, closing: int) -> Optional[int]:
+    depth = 0
+    index = closing
+    while index >= 0:
+        char = content[index]
+        if char == '"':
+            index = content.rfind('"', 0, index)
+            if index == -1:
+                return None
+        elif char == ')':
+            depth += 1
+        elif char == '(':
+            depth -= 1
+            if depth == 0:
+                return index
+        index -= 1
+    return None
+
+
+def split_path(path: str) -> List[str]:
+    path = path.split('?', 1)[0].split('#', 1)[0]
+    return [segment for segment in path.strip().split('/') if segment]
+
+
+def _is_param(segment: str) -> bool:
+    return (segment.startswith('{') and segment.endswith('}')) or segment == '*'
+
+
+class RouteIndex:
+    def __init__(self):
+        self._root = _Node()
+        self.routes = []
+
+    def __len__(self):
+        return len(self.routes)
+
+    def clear(self):
+        self._root = _Node()
+        self.routes = []
+
+    def add(self, route: Route):
+        node = self._root
+        for segment in split_path(route.pattern):
+            if segment == '**':
+                node.wildcard = node.wildcard or _Node()
+                node = node.wildcard
+                break
+            if _is_param(segment):
+                node.param = node.param or _Node()
+                node = node.param
+            else:
+                node = node.literals.setdefault(segment, _Node())
+        # Route khai báo trước được giữ (Spring báo lỗi ambiguous mapping với route trùng)
+        node.routes.setdefault(route.method, route)
+        self.routes.append(route)
+
+    def resolve(self, method: str, url: str) -> Optional[Route]:
+        """
+        Handler cho method + URL. Segment literal ưu tiên hơn {var} rồi tới **, như Spring. Segment
+        dạng {var} trong URL (template từ frontend) chỉ khớp {var} hoặc ** của route.
+        """
+        return self._match(self._root, split_path(url), 0, method.upper())
+
+    def _match(self, node: _Node, segments: List[str], index: int, method: str) -> Optional[Route]:
+        if index == len(segments):
+            route = node.routes.get(method) or node.routes.get(ANY_METHOD)
+            if route is None and node.wildcard:
+                route = node.wildcard.routes.get(method) or node.wildcard.routes.get(ANY_METHOD)
+            return route
+
+        segment = segments[index]
+        if not _is_param(segment) and segment in node.literals:
+            route = self._match(node.literals[segment], segments, index + 1, method)
+            if route:
+                return route
+        if node.param:
+            route = self._match(node.param, segments, index + 1, method)
+            if route:
+                return route
+        if node.wildcard:
+            return node.wildcard.routes.get(method) or node.wildcard.routes.get(ANY_METHOD)
+        return None
+
+    def add_source(self, content: str, java_file=None) -> int:
+        """Thêm route của các controller trong một file Java; trả về số route đã thêm"""
+        # Mapping/controller bị comment out không phải route
+        content = strip_comments(content)
+        if not _CONTROLLER_PATTERN.search(content):
+            return 0
+        added = 0
+        classes = list(_CLASS_PATTERN.finditer(content))
+        for position, class_match in enumerate(classes):
+            controller = class_match.group(1)
+            # Chỉ các annotation/modifier ngay trước từ khóa class, không lấn vào thân class trước
+            header_start = _class_header_start(content, class_match.start())
+            body_end = classes[position + 1].start() if position + 1 < len(classes) else len(content)
+            prefixes = [""]
+            methods = [ANY_METHOD]
+            for mapping in _MAPPING_PATTERN.finditer(content, header_start, class_match.start()):
+                prefixes, methods = _mapping_paths(mapping), _mapping_methods(mapping)
+
+            for mapping in _MAPPING_PATTERN.finditer(content, class_match.end(), body_end):
+                handler = _handler_name(content, mapping.end())
+                if not handler:
+                    continue
+                for prefix in prefixes:
+                    for path in _mapping_paths(mapping):
+                        pattern = '/' + '/'.join(split_path(prefix) + split_path(path))
+                        for method in _mapping_methods(mapping, methods):
+                            self.add(Route(method, pattern, controller, handler, java_file))
+                            added += 1
+        return added
+
+    def resolve_calls(self, api_calls) -> List[Route]:
+        """Route cho danh sách {'method', 'url'} (api_calls của frontend_indexer); bỏ các call không khớp"""
+        routes = []
+        for call in api_calls or ():
+            route = self.resolve(call.get('method') or "GET", call.get('url') or '')
+            if route and route not in routes:
+                routes.append(route)
+        return routes
+
+
+def _mapping_paths(mapping) -> List[str]:
+    """Các path trong annotation: ("/a"), (value = "/a"), (path = {"/a", "/b"}); không có path = ""."""
+    arguments = mapping.group(2) or ''
+    named = re.search(r'\b(?:value|path)\s*=\s*(\{[^}]*\}|"[^"]*")', arguments)
+    if named:
+        paths = _STRING_PATTERN.findall(named.group(1))
+    elif re.match(r'\(\s*(\{|")', arguments):
+        # Đối số không tên đầu tiên là value
+        first = re.match(r'\(\s*(\{[^}]*\}|"[^"]*")', arguments)
+        paths = _STRING_PATTERN.findall(first.group(1))
+    else:
+        paths = []
+    return paths or [""]
+
+
+def _mapping_methods(mapping, inherited=(ANY_METHOD,)) -> List[str]:
+    method = MAPPING_METHODS[mapping.group(1)]
+    if method:
+        return [method]
+    declared = _REQUEST_METHOD_PATTERN.findall(mapping.group(2) or '')
+    # @RequestMapping trên method không ghi method: dùng method của class (mặc định mọi method)
+    return declared or list(inherited)
+
+
+def _handler_name(content: str, start: int) -> Optional[str]:
+    """Tên method Java khai báo ngay sau annotation"""
+    end = content.find('{', start)
+    declaration = content[start:end if end != -1 else len(content)]
+    # Bỏ các annotation khác và đối số của chúng (@Valid, @Operation(summary = "..."))
+    declaration = re.sub(r'@\w+(?:\.\w+)*\s*(\((?:[^()"]|"[^"]*")*\))?', ' ', declaration)
+    for match in _HANDLER_PATTERN.finditer(declaration):
+        if match.group(1) not in _JAVA_KEYWORDS:
+            return match.group(1)
+    return None
+
+
+class ClassNameIndex:
+    """
+    Tên class (không phân biệt hoa thường) để tìm class "liên quan" khi controller ghi trong database
+    không khớp chính xác một class (vd. 'Order' -> OrderController): tra exact/prefix qua danh sách
+    tên đã sắp xếp, suffix qua danh sách tên đảo ngược - không duyệt qua mọi class.
+    """
+
+    def __init__(self, class_names):
+        self._exact = {}  # lowercase -> tên class (tên xuất hiện trước được giữ)
+        for name in class_names:
+            self._exact.setdefault(name.lower(), name)
+        self._prefixes = sorted(self._exact)
+        self._suffixes = sorted(name[::-1] for name in self._exact)
+
+    @staticmethod
+    def _starting_with(names: List[str], text: str) -> List[str]:
+        start = bisect.bisect_left(names, text)
+        end = bisect.bisect_left(names, text + '\uffff', start)
+        return names[start:end]
+
+    def related(self, name: str) -> Optional[str]:
+        """
+        Class liên quan tới `name`, theo thứ tự ưu tiên: trùng tên; tên class bắt đầu rồi kết thúc
+        bằng `name` (tên ngắn nhất); `name` bắt đầu rồi kết thúc bằng tên class (tên dài nhất).
+        None nếu không có.
+        """
+        text = (name or '').strip().lower()
+        if not text:
+            return None
+        if text in self._exact:
+            return self._exact[text]
+
+        for candidates in (self._starting_with(self._prefixes, text),
+                           [match[::-1] for match in self._starting_with(self._suffixes, text[::-1])]):
+            if candidates:
+                return self._exact[min(candidates, key=lambda match: (len(match), match))]
+
+        for size in range(len(text) - 1, 0, -1):
+            for part in (text[:size], text[-size:]):
+                if part in self._exact:
+                    return self._exact[part]
+        return None
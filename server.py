@@ -3,21 +3,187 @@
 Module for running a web server to serve the dependency graph UI and handle API requests.
 """
 
+import contextlib
 import json
+import queue
+import http.cookies
+import re
 import http.server
-import socketserver
+import threading
+import time
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from html_db import HTMLFunctionDatabase
+from urllib.parse import urlparse, parse_qs
+from html_store import open_html_store
+from graph_tiles import GraphLayout, TilePyramid
+from snapshot import AnalysisSnapshot, ViewOverlay
+from function_index import FunctionIndex, java_function_entries, matches_query
+from events import EventBroadcaster, format_event
+from sessions import SessionManager, COOKIE_NAME
+from render_planner import RenderPlanner
+from graph_renderer import RenderCancelled
+from result_cache import ResultCache, artifact_mtimes, cache_key, normalize_selection
+import metrics
+from http_cache import (MIN_COMPRESS_SIZE, is_compressible, negotiate_encoding, compress,
+                        make_etag, etag_matches, encoded_etag)
+
+
+class EditAborted(Exception):
+    """Một command trong batch edit thất bại - overlay sửa dở bị bỏ, không publish"""
+    
+    def __init__(self, index: int, result: dict):
+        super().__init__(result.get("message"))
+        self.index = index
+        self.result = result
+
+
+SUPERSEDED_MESSAGE = "Superseded by a newer render request"
+NO_SESSION_MESSAGE = "Session expired or missing, reload the page"
 
 
 class WebUIServer:
+    # Chờ bấy nhiêu giây trước khi render để gom các edit/generate bấm liên tiếp
+    render_debounce = 0.15
+    # Số write (generate/edit) của các session khác nhau chạy song song
+    write_workers = 4
+    
     def __init__(self, html_file: str, metadata_file: str = None, analyzer=None):
         self.html_file = Path(html_file) if html_file else None
         self.metadata_file = Path(metadata_file) if metadata_file else None
         self.analyzer = analyzer
         self.port = 8000
-        self.html_db = HTMLFunctionDatabase()  # Initialize HTML function database
+        # Dùng chung HTML function store (và connection pool) với analyzer
+        self.html_db = getattr(analyzer, 'html_db', None) or open_html_store()
+        
+        # Request đọc dùng snapshot/overlay đã publish; thay đổi của mỗi session chạy tuần tự trên write pool
+        self.snapshot = None
+        self.function_index = None  # FunctionIndex của snapshot hiện tại
+        self.write_pool = ThreadPoolExecutor(max_workers=self.write_workers, thread_name_prefix="graph-edit")
+        self.sessions = SessionManager(executor=self.write_pool)  # selection/edit state riêng theo cookie
+        self.result_cache = ResultCache()  # kết quả /api/generate theo selection đã chuẩn hóa
+        self.events = EventBroadcaster()  # /api/events (SSE) cho mọi tab đang mở
+        self.analysis_thread = None
+        if analyzer and analyzer.progress.started_at is not None:
+            # analyzer đã được analyze() xong trước khi tạo server
+            if analyzer.progress.running:
+                analyzer.progress.finish()
+            self._publish_snapshot()
+    
+    @property
+    def ready(self) -> bool:
+        """Snapshot phân tích đã sẵn sàng chưa"""
+        return self.snapshot is not None
+    
+    def start_background_analysis(self, on_complete=None):
+        """Chạy analyzer.analyze() trong background thread để server bind ngay lập tức"""
+        def run():
+            try:
+                self.analyzer.analyze()
+                self._publish_snapshot()
+                self.analyzer.progress.finish()
+                print("✅ Background analysis completed")
+                if on_complete:
+                    on_complete()
+            except Exception as e:
+                self.analyzer.progress.finish(str(e))
+                print(f"❌ Background analysis failed: {e}")
+        
+        def report_progress():
+            # Đẩy tiến độ cho các tab đang mở, tối đa 2 lần/giây
+            while self.analysis_thread.is_alive():
+                if self.analyzer.progress.running:
+                    self.events.publish("progress", self.status())
+                time.sleep(0.5)
+            self.events.publish("ready" if self.ready else "progress", self.status())
+        
+        self.analysis_thread = threading.Thread(target=run, name="analysis", daemon=True)
+        self.analysis_thread.start()
+        threading.Thread(target=report_progress, name="analysis-progress", daemon=True).start()
+    
+    def _publish_snapshot(self):
+        snapshot = AnalysisSnapshot(self.analyzer)
+        # Build trước để mọi view (shallow copy) của snapshot dùng chung một EdgeIndex
+        snapshot.analyzer.edge_index()
+        self.function_index = FunctionIndex(java_function_entries(snapshot.analyzer))
+        self.snapshot = snapshot
+    
+    def view_for(self, session):
+        """View chưa filter của snapshot kèm edit của session - để đọc, không build DOT"""
+        if not self.snapshot:
+            return None
+        return self.snapshot.view(session.overlay if session else None, select=False)
+    
+    def publish_render(self, session, client: str = None):
+        """Báo các tab của session rằng graph vừa được render lại"""
+        self.events.publish("render", {
+            "version": session.version,
+            "render": session.render_info,
+            "client": client,
+        }, scope=session.id)
+    
+    def metrics_state(self) -> dict:
+        """Giá trị tức thời cho /metrics"""
+        session_stats = self.sessions.stats()
+        cache_stats = self.result_cache.stats()
+        return {
+            "ready": int(self.ready),
+            "sessions": session_stats["sessions"],
+            "session_estimated_bytes": session_stats["estimated_bytes"],
+            "result_cache_entries": cache_stats["entries"],
+            "result_cache_bytes": cache_stats["bytes"],
+            "event_subscribers": self.events.subscriber_count,
+            "function_index_entries": len(self.function_index) if self.function_index else 0,
+        }
+    
+    def status(self) -> dict:
+        """Trạng thái cho /api/status"""
+        return {
+            "success": True,
+            "ready": self.ready,
+            "snapshot_id": self.snapshot.id if self.snapshot else None,
+            "analysis": self.analyzer.progress.to_dict() if self.analyzer else None,
+        }
+        
+    def submit_write(self, session, operation, fresh: bool = False, render: bool = False):
+        """
+        Chạy operation(overlay, output_dir, planner) trên write pool và chờ kết quả; write của cùng
+        session chạy tuần tự, của các session khác chạy song song. operation làm việc trên bản sao
+        overlay của session (hoặc overlay rỗng nếu fresh=True) và ghi artifact vào thư mục của session;
+        bản sao chỉ được publish khi operation chạy xong không lỗi.
+        
+        render=True: các yêu cầu render của cùng session được gộp - yêu cầu mới hơn kill `dot` đang chạy,
+        yêu cầu đang chờ đã lỗi thời nhận planner=None (edit vẫn được áp dụng, chỉ bỏ qua render).
+        """
+        generation = session.begin_render() if render else None
+        
+        def run():
+            if fresh and not session.is_current_render(generation):
+                # Generate lỗi thời: không cần làm gì, overlay mới sẽ đến từ yêu cầu sau
+                return {"success": False, "superseded": True, "message": SUPERSEDED_MESSAGE}
+            
+            overlay = ViewOverlay() if fresh or session.overlay is None else session.overlay.copy()
+            planner = None
+            if render:
+                planner = RenderPlanner(timeout=self.snapshot.analyzer.render_timeout)
+                if not session.attach_planner(generation, planner):
+                    planner = None
+            try:
+                result = operation(overlay, session.output_dir, planner)
+            finally:
+                if planner:
+                    session.detach_planner(planner)
+            if fresh and result.get("superseded"):
+                return result
+            self.sessions.publish(session, overlay, result.get("render"))
+            return result
+        
+        # Session bị loại trong lúc chờ/chạy vẫn giữ output_dir tới khi operation xong
+        with session.in_use():
+            # Debounce trên thread của request: worker chỉ nhận write đã qua debounce
+            if render and not session.settle_render(generation, self.render_debounce) and fresh:
+                return {"success": False, "superseded": True, "message": SUPERSEDED_MESSAGE}
+            return session.writes.submit(run).result()
         
     def start_server(self):
         """Start web server for dependency graph"""
@@ -35,41 +201,173 @@ class WebUIServer:
         
     def _start_server_with_handlers(self, serve_dir, main_file):
         """Start server with proper request handlers"""
+        # Cache cho file của serve_dir; artifact trong output_dir của session dùng cache của session đó
+        artifact_cache = {}  # artifact file -> (mtime, parsed object, file size)
+        static_cache = {}  # static file -> ((mtime_ns, size), etag, {encoding: compressed body})
+        webui = self
         
         class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+            # Image map (cmapx) là HTML fragment - khai báo để được nén như text
+            extensions_map = {**http.server.SimpleHTTPRequestHandler.extensions_map, '.map': 'text/html'}
+            
             def __init__(self, *args, **kwargs):
-                self.analyzer = kwargs.pop('analyzer', None)
+                self._session = None
+                self._session_cookie = None
+                self._status = None
                 super().__init__(*args, directory=str(serve_dir), **kwargs)
             
+            def _get_session(self, create: bool = False):
+                """
+                Session theo cookie; create=True tạo session mới (và Set-Cookie) nếu chưa có - chỉ khi load
+                trang (xem _is_page_load), để API call không cookie không đẩy session đang dùng ra khỏi LRU
+                """
+                if self._session is None:
+                    cookie = http.cookies.SimpleCookie()
+                    try:
+                        cookie.load(self.headers.get('Cookie', ''))
+                    except http.cookies.CookieError:
+                        pass
+                    morsel = cookie.get(COOKIE_NAME)
+                    self._session = webui.sessions.get(morsel.value if morsel else None)
+                if self._session is None and create:
+                    self._session = webui.sessions.create()
+                    self._session_cookie = f"{COOKIE_NAME}={self._session.id}; Path=/; HttpOnly; SameSite=Lax"
+                return self._session
+            
+            def _is_page_load(self):
+                """GET một trang HTML (selector, graph) - lúc duy nhất được tạo session"""
+                path = urlparse(self.path).path
+                return path == '/' or path.endswith('.html')
+            
+            def _session_in_use(self):
+                """Giữ artifact của session (nếu có) trong lúc request đọc/gửi chúng"""
+                session = self._get_session()
+                return session.in_use() if session else contextlib.nullcontext()
+            
+            def end_headers(self):
+                if self._session_cookie:
+                    self.send_header('Set-Cookie', self._session_cookie)
+                    self._session_cookie = None
+                super().end_headers()
+            
+            def translate_path(self, path):
+                """Artifact (dependencies.*) của session thay cho bản mặc định trong serve_dir"""
+                translated = super().translate_path(path)
+                relative = urlparse(path).path.lstrip('/')
+                session = self._get_session()
+                if session and relative and '/' not in relative and session.has_artifact(relative):
+                    return str(session.output_dir / relative)
+                return translated
+            
+            def _artifact_file(self, name):
+                session = self._get_session()
+                if session and session.has_artifact(name):
+                    return session.output_dir / name
+                return serve_dir / name
+            
+            def _cache_owner(self, file_path):
+                """Session có file_path trong output_dir (cache của session), None với file của serve_dir"""
+                session = self._get_session()
+                if session and Path(file_path).parent == session.output_dir:
+                    return session
+                return None
+            
+            @property
+            def analyzer(self):
+                """Analyzer gốc của snapshot - chỉ dùng để đọc"""
+                return webui.snapshot.analyzer if webui.snapshot else None
+            
             def log_message(self, format, *args):
                 pass
             
+            def send_response(self, code, message=None):
+                self._status = code
+                super().send_response(code, message)
+            
+            def _metrics_path(self):
+                """Nhãn path cho metrics: route API (không kèm tham số), còn lại gộp thành 'static'"""
+                path = urlparse(self.path).path
+                if path.startswith('/api/'):
+                    return '/'.join(path.split('/')[:3])
+                return path if path == '/metrics' else 'static'
+            
+            def _observed(self, handle):
+                started = time.perf_counter()
+                try:
+                    handle()
+                finally:
+                    path = self._metrics_path()
+                    metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                                         method=self.command, path=path)
+                    metrics.HTTP_REQUESTS.inc(method=self.command, path=path, status=self._status or 0)
+            
             def do_GET(self):
+                self._observed(self._do_get)
+            
+            def do_POST(self):
+                self._observed(self._do_post)
+            
+            def _do_get(self):
                 if self.path.startswith('/api/'):
                     self.handle_api_get_request()
+                elif urlparse(self.path).path == '/metrics':
+                    self._send_metrics()
                 else:
-                    super().do_GET()
+                    if self._is_page_load():
+                        self._get_session(create=True)
+                    with self._session_in_use():
+                        if not self._send_static_file():
+                            super().do_GET()  # directory listing, 404...
             
-            def do_POST(self):
+            def _do_post(self):
                 if self.path.startswith('/api/'):
                     self.handle_api_post_request()
                 else:
                     self.send_error(404)
             
+            def _send_metrics(self):
+                """/metrics - Prometheus text format"""
+                for name, value in webui.metrics_state().items():
+                    metrics.SERVER_STATE.set(value, name=name)
+                body = metrics.REGISTRY.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-type', metrics.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+            
             def handle_api_get_request(self):
                 """Handle GET API requests"""
                 try:
+                    if self.path.startswith('/api/tiles/'):
+                        with self._session_in_use():
+                            self._send_tile()
+                        return
+                    
+                    parsed = urlparse(self.path)
+                    query = parse_qs(parsed.query)
                     response_data = {"success": False, "message": "Unknown API endpoint"}
                     
-                    if self.path == '/api/functions' and self.analyzer:
-                        functions = self._get_functions_list()
-                        response_data = {
-                            "success": True,
-                            "functions": functions
-                        }
-                    elif self.path == '/api/html-functions':
+                    if parsed.path == '/api/status':
+                        response_data = webui.status()
+                    elif parsed.path == '/api/functions' and 'stream' in query and webui.analyzer:
+                        self._stream_functions()
+                        return
+                    elif parsed.path == '/api/events':
+                        self._stream_events()
+                        return
+                    elif parsed.path == '/api/metadata':
+                        with self._session_in_use():
+                            response_data = self._get_metadata_summary()
+                    elif parsed.path == '/api/node':
+                        with self._session_in_use():
+                            response_data = self._get_node_details(query.get('name', [''])[0])
+                    elif parsed.path == '/api/functions' and webui.analyzer:
+                        response_data = self._search_functions(query)
+                    elif parsed.path == '/api/html-functions':
                         # API để lấy HTML functions từ database
-                        html_functions = self.analyzer.html_db.get_all_functions() if hasattr(self.analyzer, 'html_db') else []
+                        html_functions = webui.analyzer.html_db.get_all_functions() if getattr(webui.analyzer, 'html_db', None) else []
                         response_data = {
                             "success": True,
                             "functions": html_functions
@@ -89,101 +387,215 @@ class WebUIServer:
                     
                     response_data = {"success": False, "message": "Unknown command"}
                     
-                    if self.path == '/api/generate' and self.analyzer:
-                        response_data = self._handle_generate_graph(data)
+                    if self.path in ('/api/generate', '/api/edit') and webui.analyzer and not webui.ready:
+                        response_data = {"success": False, "message": "Analysis is still running, please wait",
+                                         "status": webui.status()}
+                    elif self.path in ('/api/generate', '/api/edit') and not self._get_session():
+                        # Chưa load trang hoặc session đã bị loại: không tạo session từ API call
+                        response_data = {"success": False, "message": NO_SESSION_MESSAGE, "no_session": True}
+                    elif self.path == '/api/generate' and self.analyzer:
+                        session = self._get_session()
+                        response_data = webui.submit_write(
+                            session,
+                            lambda overlay, output_dir, planner: self._handle_generate_graph(overlay, output_dir, planner, data),
+                            fresh=True, render=True)
+                        if response_data.get("success"):
+                            webui.publish_render(session, data.get('client'))
+                    elif self.path == '/api/edit' and self.analyzer and 'commands' in data:
+                        session = self._get_session()
+                        try:
+                            response_data = webui.submit_write(
+                                session,
+                                lambda overlay, output_dir, planner: self._handle_edit_batch(overlay, output_dir, planner, data),
+                                render=bool(data.get('regenerate')) or any(
+                                    c.get('command') == 'regenerate' for c in data['commands'] or ()))
+                            self._publish_edit(session, data, response_data)
+                        except EditAborted as e:
+                            response_data = {
+                                "success": False,
+                                "message": f"Command #{e.index + 1} failed: {e.result.get('message')}. No changes applied",
+                                "failed_index": e.index
+                            }
                     elif self.path == '/api/edit' and self.analyzer:
-                        response_data = self._handle_edit_graph(data)
+                        session = self._get_session()
+                        response_data = webui.submit_write(
+                            session,
+                            lambda overlay, output_dir, planner: self._handle_edit_graph(overlay, output_dir, planner, data),
+                            render=data.get('command') == 'regenerate')
+                        if response_data.get("success"):
+                            self._publish_edit(session, data, response_data)
                     
                     self._send_json_response(response_data)
                     
                 except Exception as e:
                     self.send_error(500, f"Server error: {str(e)}")
             
-            def _get_functions_list(self):
-                """Get list of all functions for selection"""
-                functions = []
+            def _search_functions(self, query):
+                """
+                /api/functions?q=&type=&offset=&limit= - HTML functions (database) trước, Java functions
+                (FunctionIndex của snapshot) sau; không có limit thì trả về tất cả
+                """
+                search_text = query.get('q', [''])[0]
+                types = {t for value in query.get('type', []) for t in value.split(',') if t}
+                offset = max(0, int(query.get('offset', ['0'])[0] or 0))
+                limit = query.get('limit', [''])[0]
+                limit = max(0, int(limit)) if limit else None
+                
+                # Trong lúc analysis chạy nền: index tạm trên phần đã phân tích
+                java_index = webui.function_index if webui.ready else \
+                    FunctionIndex(java_function_entries(webui.analyzer))
+                
+                html_matches = [f for f in self._get_html_functions() if matches_query(f, search_text)]
+                facets = {}
+                for func in html_matches:
+                    facets[func.get('type')] = facets.get(func.get('type'), 0) + 1
+                if types:
+                    html_matches = [f for f in html_matches if f.get('type') in types]
                 
+                html_page = html_matches[offset:] if limit is None else html_matches[offset:offset + limit]
+                java_offset = max(0, offset - len(html_matches))
+                java_limit = None if limit is None else limit - len(html_page)
+                java_result = java_index.search(search_text, types, java_offset, java_limit)
+                for func_type, count in java_result["facets"].items():
+                    facets[func_type] = facets.get(func_type, 0) + count
+                
+                return {
+                    "success": True,
+                    "complete": webui.ready,
+                    "total": len(html_matches) + java_result["total"],
+                    "offset": offset,
+                    "limit": limit,
+                    "facets": facets,
+                    "functions": html_page + java_result["functions"]
+                }
+            
+            def _functions_source(self):
+                """Snapshot nếu đã có, nếu không thì analyzer đang chạy nền"""
+                return webui.snapshot.analyzer if webui.ready else webui.analyzer
+            
+            def _get_html_functions(self):
                 # Lấy HTML/JS functions từ PostgreSQL database
                 try:
-                    html_functions = self.analyzer.html_db.get_all_functions() if hasattr(self.analyzer, 'html_db') else []
-                    functions.extend(html_functions)
-                    print(f"✅ Loaded {len(html_functions)} HTML functions from database")
+                    html_db = getattr(webui.analyzer, 'html_db', None)
+                    html_functions = html_db.get_all_functions() if html_db else []
+                    return list(html_functions)
                 except Exception as e:
                     print(f"❌ Error loading HTML functions: {e}")
+                    return []
+            
+            def _stream_functions(self):
+                """
+                /api/functions?stream=1 - NDJSON: gửi functions ngay khi analysis tìm thấy,
+                xen kẽ các dòng progress, kết thúc bằng dòng 'done'
+                """
+                self.send_response(200)
+                self.send_header('Content-type', 'application/x-ndjson')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
                 
-                # Lấy tất cả classes (bao gồm services)
-                for class_name, file_path in self.analyzer.classes.items():
-                    rel_path = str(Path(file_path).relative_to(self.analyzer.source_directory))
-                    
-                    # Xác định type: service nếu tên kết thúc bằng Service, ngược lại là class
-                    func_type = 'service' if class_name.endswith('Service') else 'class'
-                    
-                    functions.append({
-                        'id': f'class_{class_name}',  # Tất cả đều dùng prefix 'class_'
-                        'name': class_name,
-                        'type': func_type,
-                        'file': rel_path,
-                        'dependencies': len(self.analyzer.imports.get(file_path, set()))
-                    })
+                def write_line(payload):
+                    self.wfile.write(json.dumps(payload).encode('utf-8') + b'\n')
+                    self.wfile.flush()
                 
-                # Thêm methods từ method_calls - limit to avoid too many items
-                method_count = 0
-                for source_file, targets in self.analyzer.method_calls.items():
-                    if method_count >= 100:  # Tăng limit lên 100
-                        break
-                    for target_file, methods in targets.items():
-                        for method in methods:
-                            if method_count >= 100:
-                                break
-                            source_rel = str(Path(source_file).relative_to(self.analyzer.source_directory))
-                            target_rel = str(Path(target_file).relative_to(self.analyzer.source_directory))
-                            functions.append({
-                                'id': f'method_{method}_{source_rel}_{target_rel}',
-                                'name': method,
-                                'type': 'method',
-                                'file': f'{source_rel} → {target_rel}',
-                                'dependencies': 1
-                            })
-                            method_count += 1
+                sent_ids = set()
                 
-                # Remove duplicates based on ID
-                unique_functions = {}
-                for func in functions:
-                    if func['id'] not in unique_functions:
-                        unique_functions[func['id']] = func
+                def send_new(functions):
+                    batch = [f for f in functions if f['id'] not in sent_ids]
+                    sent_ids.update(f['id'] for f in batch)
+                    if batch:
+                        write_line({"type": "functions", "functions": batch})
                 
-                return list(unique_functions.values())
+                try:
+                    send_new(self._get_html_functions())
+                    while True:
+                        ready = webui.ready
+                        send_new(java_function_entries(self._functions_source()))
+                        write_line({"type": "progress", **webui.status()})
+                        if ready or not webui.analyzer.progress.running:
+                            break
+                        time.sleep(0.5)
+                    write_line({"type": "done", "complete": ready, "total": len(sent_ids)})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # browser đóng kết nối giữa chừng
             
-            def _handle_generate_graph(self, data):
-                """Handle graph generation with selected functions"""
-                selected_functions = data.get('selectedFunctions', [])
+            def _handle_generate_graph(self, overlay, output_dir, planner, data):
+                """Handle graph generation with selected functions (chạy trên write pool)"""
+                selected_functions = normalize_selection(data.get('selectedFunctions', []))
                 
                 if not selected_functions:
                     return {"success": False, "message": "Không có function nào được chọn"}
+                if planner is None:
+                    return {"success": False, "superseded": True, "message": SUPERSEDED_MESSAGE}
+                
+                overlay.selection = selected_functions
+                output_file = str(output_dir / "dependencies.dot")
+                key = cache_key(webui.snapshot, selected_functions, overlay)
+                render_info = webui.result_cache.load(key, output_dir)
+                if render_info is not None:
+                    return {
+                        "success": True,
+                        "message": f"Graph đã được tạo với {len(selected_functions)} functions (cached)",
+                        "html_file": output_file.replace('.dot', '.html'),
+                        "metadata_file": output_file.replace('.dot', '_metadata.json'),
+                        "cached": True,
+                        "render": render_info
+                    }
                 
                 try:
-                    # Filter analyzer data dựa trên selection (now includes HTML processing)
-                    self.analyzer.filter_by_selection(selected_functions)
+                    previous_mtimes = artifact_mtimes(output_dir)
+                    
+                    # View của snapshot đã filter theo selection (now includes HTML processing)
+                    view = webui.snapshot.view(overlay)
                     
                     # Tạo graph mới
-                    output_file = str(serve_dir / "dependencies.dot")
-                    html_file, metadata_file = self.analyzer.generate_enhanced_graph(output_file)
+                    html_file, metadata_file = view.generate_enhanced_graph(output_file, planner)
                     
                     if html_file:
+                        webui.result_cache.store(key, output_dir, previous_mtimes, view.last_render_info)
                         return {
                             "success": True, 
                             "message": f"Graph đã được tạo với {len(selected_functions)} functions",
                             "html_file": html_file,
-                            "metadata_file": metadata_file
+                            "metadata_file": metadata_file,
+                            "render": view.last_render_info
                         }
                     else:
                         return {"success": False, "message": "Không thể tạo graph"}
                         
+                except RenderCancelled:
+                    return {"success": False, "superseded": True, "message": SUPERSEDED_MESSAGE}
                 except Exception as e:
                     return {"success": False, "message": f"Lỗi khi tạo graph: {str(e)}"}
             
-            def _handle_edit_graph(self, data):
-                """Handle graph editing commands"""
+            def _handle_edit_batch(self, overlay, output_dir, planner, data):
+                """
+                {"commands": [...], "regenerate": bool} - áp dụng lần lượt trên cùng một overlay (all-or-nothing),
+                sau đó render tối đa một lần nếu có 'regenerate' (flag hoặc command trong danh sách)
+                """
+                commands = data.get('commands') or []
+                regenerate = bool(data.get('regenerate'))
+                
+                for index, command_data in enumerate(commands):
+                    if command_data.get('command') == 'regenerate':
+                        regenerate = True
+                        continue
+                    result = self._handle_edit_graph(overlay, output_dir, None, command_data)
+                    if not result.get("success"):
+                        raise EditAborted(index, result)
+                
+                message = f"{len(commands)} edits applied"
+                if regenerate:
+                    result = self._handle_edit_graph(overlay, output_dir, planner, {'command': 'regenerate'})
+                    if not result.get("success"):
+                        raise EditAborted(len(commands), result)
+                    if result.get("superseded"):
+                        return {"success": True, "superseded": True, "message": f"{message}, {SUPERSEDED_MESSAGE.lower()}"}
+                    return {"success": True, "message": f"{message}, graph regenerated", "rendered": True,
+                            "render": result.get("render")}
+                return {"success": True, "message": message}
+            
+            def _handle_edit_graph(self, overlay, output_dir, planner, data):
+                """Handle graph editing commands (chạy trên write pool) - edit ghi vào overlay của session"""
                 command = data.get('command')
                 node = data.get('node')
                 source = data.get('source')
@@ -192,65 +604,281 @@ class WebUIServer:
                 classes = data.get('classes')
                 methods = data.get('methods')
                 
+                def edit(method, *args):
+                    return overlay.apply(self.analyzer, method, *args)
+                
                 if command == 'hide_node' and node:
-                    self.analyzer.hide_node(node)
+                    edit('hide_node', node)
                     return {"success": True, "message": f"Node {node} hidden"}
                 elif command == 'show_node' and node:
-                    self.analyzer.show_node(node)
+                    edit('show_node', node)
                     return {"success": True, "message": f"Node {node} shown"}
                 elif command == 'delete_node' and node:
-                    self.analyzer.delete_node(node)
+                    edit('delete_node', node)
                     return {"success": True, "message": f"Node {node} deleted"}
                 elif command == 'add_node' and node:
-                    self.analyzer.add_custom_node(node, classes or [], color or "lightblue")
+                    edit('add_custom_node', node, classes or [], color or "lightblue")
                     return {"success": True, "message": f"Node {node} added"}
                 elif command == 'add_edge' and source and target:
-                    success = self.analyzer.add_edge(source, target, methods or [])
+                    success = edit('add_edge', source, target, methods or [])
                     return {"success": success, 
                            "message": f"Edge {source}->{target} added" if success else "Failed to add edge"}
                 elif command == 'delete_edge' and source and target:
-                    success = self.analyzer.delete_edge(source, target)
+                    success = edit('delete_edge', source, target)
                     return {"success": success, 
                            "message": f"Edge {source}->{target} deleted" if success else "Failed to delete edge"}
                 elif command == 'update_edge_label' and source and target and methods:
-                    success = self.analyzer.update_edge_label(source, target, methods)
+                    success = edit('update_edge_label', source, target, methods)
                     return {"success": success, 
                            "message": f"Edge {source}->{target} updated" if success else "Failed to update edge"}
                 elif command == 'hide_edge' and source and target:
-                    self.analyzer.hide_edge(source, target)
+                    edit('hide_edge', source, target)
                     return {"success": True, "message": f"Edge {source}->{target} hidden"}
                 elif command == 'show_edge' and source and target:
-                    self.analyzer.show_edge(source, target)
+                    edit('show_edge', source, target)
                     return {"success": True, "message": f"Edge {source}->{target} shown"}
                 elif command == 'set_color' and node and color:
-                    self.analyzer.set_node_color(node, color)
+                    edit('set_node_color', node, color)
                     return {"success": True, "message": f"Node {node} color set to {color}"}
                 elif command == 'reset_color' and node:
-                    self.analyzer.reset_node_color(node)
+                    edit('reset_node_color', node)
                     return {"success": True, "message": f"Node {node} color reset"}
                 elif command == 'regenerate':
-                    output_file = str(serve_dir / "dependencies.dot")
-                    html_file, metadata_file = self.analyzer.generate_enhanced_graph(output_file)
-                    return {"success": True, "message": "Graph regenerated", "reload": True}
+                    # planner=None: đã có yêu cầu render mới hơn của session, render đó sẽ bao gồm edit này
+                    if planner is None:
+                        return {"success": True, "superseded": True, "message": SUPERSEDED_MESSAGE}
+                    output_file = str(output_dir / "dependencies.dot")
+                    view = webui.snapshot.view(overlay)
+                    try:
+                        html_file, metadata_file = view.generate_enhanced_graph(output_file, planner)
+                    except RenderCancelled:
+                        return {"success": True, "superseded": True, "message": SUPERSEDED_MESSAGE}
+                    if not html_file:
+                        return {"success": False, "message": "Failed to regenerate graph"}
+                    return {"success": True, "message": "Graph regenerated", "rendered": True,
+                            "render": view.last_render_info}
                 
                 return {"success": False, "message": "Unknown command"}
             
+            def _publish_edit(self, session, data, response_data):
+                """Gửi delta của edit (và render nếu có) tới các tab khác của session; response kèm version mới"""
+                client = data.get('client')
+                response_data["version"] = session.version
+                if response_data.get("rendered"):
+                    response_data["render"] = session.render_info
+                    webui.publish_render(session, client)
+                else:
+                    # Batch gửi nguyên danh sách command để các tab khác áp dụng theo đúng thứ tự
+                    commands = data['commands'] if 'commands' in data else [data]
+                    commands = [c for c in commands if c.get('command') != 'regenerate']
+                    if not commands:
+                        return
+                    webui.events.publish("delta", {
+                        "version": session.version,
+                        "commands": [
+                            {"command": c.get('command'),
+                             "params": {k: v for k, v in c.items() if k not in ('command', 'client')}}
+                            for c in commands
+                        ],
+                        "message": response_data.get("message"),
+                        "client": client,
+                    }, scope=session.id)
+            
+            def _stream_events(self):
+                """/api/events - Server-Sent Events: progress, ready, render, delta"""
+                last_event_id = self.headers.get('Last-Event-ID')
+                session = self._get_session()
+                subscriber = webui.events.subscribe(int(last_event_id) if (last_event_id or '').isdigit() else None,
+                                                    scope=session.id if session else None)
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-type', 'text/event-stream')
+                    self.send_header('Cache-Control', 'no-cache')
+                    self.end_headers()
+                    self.wfile.write(b'retry: 3000\n\n')
+                    self.wfile.write(f"event: status\ndata: {json.dumps(webui.status())}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    
+                    while True:
+                        try:
+                            event = subscriber.get(timeout=15)
+                        except queue.Empty:
+                            self.wfile.write(b': keepalive\n\n')  # giữ kết nối qua proxy
+                            self.wfile.flush()
+                            continue
+                        if event is None:
+                            break
+                        self.wfile.write(format_event(event))
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # tab đã đóng
+                finally:
+                    webui.events.unsubscribe(subscriber)
+            
+            def _load_artifact(self, artifact_file, loader):
+                """Load graph artifact từ disk, cache theo mtime"""
+                if not artifact_file.exists():
+                    return None
+                stat = artifact_file.stat()
+                owner = self._cache_owner(artifact_file)
+                cache = owner.artifact_cache if owner else artifact_cache
+                cached = cache.get(artifact_file)
+                metrics.record_cache("artifact", bool(cached) and cached[0] == stat.st_mtime)
+                if not cached or cached[0] != stat.st_mtime:
+                    cached = (stat.st_mtime, loader(artifact_file), stat.st_size)
+                    cache[artifact_file] = cached
+                    if owner:
+                        webui.sessions.cache_resized(owner)
+                return cached[1]
+            
+            def _get_tile_pyramid(self):
+                return self._load_artifact(self._artifact_file("dependencies_layout.json"),
+                                           lambda path: TilePyramid(GraphLayout.load(str(path))))
+            
+            def _get_metadata(self):
+                def load(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        return json.load(f)
+                return self._load_artifact(self._artifact_file("dependencies_metadata.json"), load)
+            
+            def _get_metadata_summary(self):
+                """Phần metadata nhỏ cần cho lần load đầu: project info, editing state, danh sách node"""
+                metadata = self._get_metadata()
+                if metadata is None:
+                    return {"success": False, "message": "Metadata not generated yet"}
+                
+                files = metadata.get("files", {})
+                return {
+                    "success": True,
+                    "metadata": {
+                        "project_info": metadata.get("project_info", {}),
+                        "editing": metadata.get("editing", {}),
+                        "nodes": list(files.keys()),
+                        "totals": {
+                            "total_files": len(files),
+                            "total_classes": sum(len(info.get("classes", [])) for info in files.values()),
+                            "total_connections": sum(len(info.get("outgoing_calls", {})) for info in files.values())
+                        }
+                    }
+                }
+            
+            def _get_node_details(self, node_name):
+                """
+                Chi tiết một node - session chưa chọn function: snapshot kèm các edit của session;
+                đã generate theo selection: metadata của graph vừa render (không filter lại mỗi request)
+                """
+                node = None
+                session = self._get_session()
+                if not (session and session.overlay and session.overlay.selection):
+                    view = webui.view_for(session)
+                    if view:
+                        node = view.get_node_metadata(node_name)
+                if node is None:
+                    node = (self._get_metadata() or {}).get("files", {}).get(node_name)
+                if node is None:
+                    return {"success": False, "message": f"Node {node_name} not found"}
+                return {"success": True, "node": node}
+            
+            def _send_static_file(self):
+                """Gửi file tĩnh/graph artifact với ETag + nén; False nếu không phải file thường"""
+                file_path = Path(self.translate_path(self.path))
+                if not file_path.is_file():
+                    return False
+                
+                stat = file_path.stat()
+                version = (stat.st_mtime_ns, stat.st_size)
+                owner = self._cache_owner(file_path)
+                cache = owner.static_cache if owner else static_cache
+                cached = cache.get(file_path)
+                metrics.record_cache("static", bool(cached) and cached[0] == version)
+                if not cached or cached[0] != version:
+                    variants = {}
+                    # Bản .gz ghi sẵn (--gzip-metadata) được dùng thay vì nén lại
+                    gzip_file = Path(str(file_path) + '.gz')
+                    if gzip_file.exists() and gzip_file.stat().st_mtime_ns >= stat.st_mtime_ns:
+                        variants['gzip'] = gzip_file.read_bytes()
+                    cached = (version, make_etag(file_path.read_bytes()), variants)
+                    cache[file_path] = cached
+                    if owner:
+                        webui.sessions.cache_resized(owner)
+                
+                _, etag, variants = cached
+                self._send_representation(self.guess_type(str(file_path)), etag, stat.st_size,
+                                          file_path.read_bytes, variants)
+                return True
+            
+            def _send_tile(self):
+                """Serve /api/tiles/<z>/<x>/<y>.svg"""
+                match = re.match(r'^/api/tiles/(\d+)/(\d+)/(\d+)\.svg$', self.path)
+                pyramid = self._get_tile_pyramid()
+                if not match or not pyramid:
+                    self.send_error(404)
+                    return
+                
+                z, x, y = (int(v) for v in match.groups())
+                if not (0 <= z <= pyramid.max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                    self.send_error(404)
+                    return
+                
+                # ETag theo phiên bản layout: tile không đổi thì không cần render lại
+                layout_mtime = self._artifact_file("dependencies_layout.json").stat().st_mtime_ns
+                etag = make_etag(layout_mtime, z, x, y)
+                self._send_representation('image/svg+xml', etag, None,
+                                          lambda: pyramid.render_tile(z, x, y).encode('utf-8'))
+            
             def _send_json_response(self, data):
-                """Send JSON response"""
+                """Send JSON response (nén + ETag theo nội dung)"""
+                body = json.dumps(data).encode('utf-8')
+                self._send_representation('application/json', make_etag(body), len(body), lambda: body,
+                                          headers={'Access-Control-Allow-Origin': '*'})
+            
+            def _send_representation(self, content_type, etag, size, load_body, variants=None, headers=None):
+                """
+                Gửi body với content negotiation: 304 nếu If-None-Match khớp, nén br/gzip nếu browser hỗ trợ.
+                size=None nghĩa là chưa biết trước (coi như đủ lớn để nén); variants cache các bản đã nén.
+                """
+                encoding = None
+                if is_compressible(content_type) and (size is None or size >= MIN_COMPRESS_SIZE):
+                    encoding = negotiate_encoding(self.headers.get('Accept-Encoding'))
+                tag = encoded_etag(etag, encoding)
+                
+                def send_common_headers():
+                    self.send_header('ETag', tag)
+                    self.send_header('Cache-Control', 'no-cache')  # luôn revalidate, thường chỉ nhận 304
+                    self.send_header('Vary', 'Accept-Encoding')
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                
+                if_none_match = self.headers.get('If-None-Match')
+                if if_none_match:
+                    # Tỉ lệ conditional GET được trả 304 (browser cache còn dùng được)
+                    metrics.record_cache("http_etag", etag_matches(if_none_match, tag))
+                if etag_matches(if_none_match, tag):
+                    self.send_response(304)
+                    send_common_headers()
+                    self.end_headers()
+                    return
+                
+                if variants is not None and encoding in variants:
+                    body = variants[encoding]
+                else:
+                    body = compress(load_body(), encoding)
+                    if variants is not None and encoding:
+                        variants[encoding] = body
+                
                 self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Content-type', content_type)
+                if encoding:
+                    self.send_header('Content-Encoding', encoding)
+                self.send_header('Content-Length', str(len(body)))
+                send_common_headers()
                 self.end_headers()
-                self.wfile.write(json.dumps(data).encode('utf-8'))
+                self.wfile.write(body)
         
         # Start server loop
         while True:
             try:
-                def handler_factory(*args, **kwargs):
-                    kwargs['analyzer'] = self.analyzer
-                    return CustomHTTPRequestHandler(*args, **kwargs)
-                
-                with socketserver.TCPServer(("", self.port), handler_factory) as httpd:
+                with http.server.ThreadingHTTPServer(("", self.port), CustomHTTPRequestHandler) as httpd:
                     if main_file == 'function_selector.html':
                         print(f"🌐 Starting function selector at http://localhost:{self.port}")
                         print(f"📂 Serving files from: {serve_dir}")
@@ -266,6 +894,7 @@ class WebUIServer:
                     try:
                         httpd.serve_forever()
                     except KeyboardInterrupt:
+                        self.sessions.close()
                         print(f"\n⏹️ Server stopped")
                         break
             except OSError:
@@ -273,3 +902,4 @@ class WebUIServer:
                 if self.port > 8100:
                     print("Cannot find available port")
                     break
+
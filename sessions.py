@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Per-session view state cho web server.
+
+Mỗi browser (cookie) có selection, hidden nodes/edges, màu và custom nodes/edges
+riêng trong một ViewOverlay nhỏ trên snapshot dùng chung; session chưa generate/edit
+không có overlay. Session cũ bị loại theo LRU khi vượt số lượng hoặc giới hạn bộ nhớ
+ước lượng.
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+COOKIE_NAME = "depgraph_session"
+
+# Ước lượng thô dung lượng (bytes) của các phần tử trong một overlay
+_OVERLAY_OVERHEAD = 2048
+_BYTES_PER_NODE = 150
+_BYTES_PER_EDGE = 250
+_BYTES_PER_METHOD = 100
+
+
+def estimate_overlay_size(overlay) -> int:
+    """Ước lượng bộ nhớ một overlay chiếm, đủ để so với memory cap (không cần chính xác)"""
+    if overlay is None:
+        return 0
+    size = _OVERLAY_OVERHEAD + _BYTES_PER_NODE * (
+        len(overlay.selection) + len(overlay.hidden_nodes) + len(overlay.custom_colors) + len(overlay.custom_nodes))
+    size += _BYTES_PER_EDGE * (len(overlay.hidden_edges) + len(overlay.edge_edits))
+    for targets in overlay.custom_edges.values():
+        size += _BYTES_PER_EDGE * len(targets)
+        size += _BYTES_PER_METHOD * sum(len(methods) for methods in targets.values())
+    return size
+
+
+class SerialQueue:
+    """Write của một session chạy lần lượt trên pool dùng chung; các session khác chạy song song"""
+    
+    def __init__(self, executor):
+        self._executor = executor
+        self._pending = deque()  # [(fn, Future)]
+        self._lock = threading.Lock()
+        self._scheduled = False  # đã có một task _run_next trên pool
+    
+    def submit(self, fn) -> Future:
+        future = Future()
+        with self._lock:
+            self._pending.append((fn, future))
+            if self._scheduled:
+                return future
+            self._scheduled = True
+        self._executor.submit(self._run_next)
+        return future
+    
+    def _run_next(self):
+        with self._lock:
+            fn, future = self._pending.popleft()
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+        # Trả worker về pool giữa hai write để session khác không phải chờ cả hàng đợi này
+        with self._lock:
+            if not self._pending:
+                self._scheduled = False
+                return
+        self._executor.submit(self._run_next)
+
+
+class Session:
+    def __init__(self, session_id: str, output_dir: Path, executor=None):
+        self.id = session_id
+        self.output_dir = output_dir  # artifact (dependencies.*) riêng của session
+        self.overlay = None  # ViewOverlay; None = trạng thái vừa phân tích xong
+        self.render_info = None  # last_render_info của lần render gần nhất
+        self.version = 0
+        self.size = 0
+        self.last_used = time.time()
+        # Mỗi yêu cầu render nhận một generation; chỉ generation mới nhất được render
+        self.render_generation = 0
+        self._planner = None  # RenderPlanner của lần render đang chạy
+        self._render_lock = threading.Lock()
+        self._render_requested = threading.Condition(self._render_lock)
+        self.writes = SerialQueue(executor)  # generate/edit của session, tuần tự
+        # Số write/request đang dùng output_dir; session bị loại khi còn người dùng thì xóa sau
+        self._users = 0
+        self._evicted = False
+        # Cache của server cho file trong output_dir, bị xóa cùng output_dir; cache_bytes (ước lượng
+        # theo kích thước file) được tính vào bộ nhớ của session khi xét eviction
+        self.artifact_cache = {}  # artifact file -> (mtime, parsed object, file size)
+        self.static_cache = {}  # file -> ((mtime_ns, size), etag, {encoding: compressed body})
+        self.cache_bytes = 0
+
+    def begin_render(self) -> int:
+        """Đăng ký yêu cầu render mới; hủy lần render đang chạy (đã lỗi thời) của session"""
+        with self._render_lock:
+            self.render_generation += 1
+            if self._planner:
+                self._planner.cancel()
+            self._render_requested.notify_all()
+            return self.render_generation
+    
+    def settle_render(self, generation: int, delay: float) -> bool:
+        """
+        Debounce trên thread của request (không giữ worker): chờ tối đa `delay` giây, dừng sớm nếu
+        có yêu cầu render mới hơn. True nếu generation vẫn là mới nhất.
+        """
+        with self._render_lock:
+            self._render_requested.wait_for(lambda: generation != self.render_generation, timeout=delay)
+            return generation == self.render_generation
+
+    def is_current_render(self, generation: int) -> bool:
+        return generation == self.render_generation
+
+    def attach_planner(self, generation: int, planner) -> bool:
+        """Gắn planner cho lần render sắp chạy; False (và planner bị hủy) nếu generation đã lỗi thời"""
+        with self._render_lock:
+            if generation != self.render_generation:
+                planner.cancel()
+                return False
+            self._planner = planner
+            return True
+
+    def detach_planner(self, planner):
+        with self._render_lock:
+            if self._planner is planner:
+                self._planner = None
+
+    def has_artifact(self, name: str) -> bool:
+        return (self.output_dir / name).is_file()
+
+    def cache_size(self) -> int:
+        """Ước lượng bytes của artifact_cache và static_cache"""
+        return (sum(entry[2] for entry in list(self.artifact_cache.values())) +
+                sum(entry[0][1] for entry in list(self.static_cache.values())))
+    
+    @contextmanager
+    def in_use(self):
+        """Giữ output_dir trong lúc render/gửi artifact - eviction chờ tới khi nhả mới xóa"""
+        with self._render_lock:
+            self._users += 1
+        try:
+            yield self
+        finally:
+            with self._render_lock:
+                self._users -= 1
+                remove = self._evicted and self._users == 0
+            if remove:
+                self._remove()
+    
+    def discard(self):
+        """Session đã bị loại: xóa output_dir ngay nếu không ai dùng, không thì khi người cuối nhả"""
+        with self._render_lock:
+            self._evicted = True
+            remove = self._users == 0
+        if remove:
+            self._remove()
+
+    def _remove(self):
+        self.artifact_cache.clear()
+        self.static_cache.clear()
+        self.cache_bytes = 0
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+
+class SessionManager:
+    def __init__(self, root_dir: str = None, max_sessions: int = 100, memory_cap: int = 512 * 1024 * 1024,
+                 executor=None):
+        self._owns_root = root_dir is None  # thư mục tạm tự tạo thì xóa luôn khi close()
+        self.root_dir = Path(root_dir or tempfile.mkdtemp(prefix="depgraph-sessions-"))
+        # Pool chạy write của mọi session; mỗi session dùng tối đa một worker tại một thời điểm
+        self.executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="graph-edit")
+        self.max_sessions = max_sessions
+        self.memory_cap = memory_cap
+        self._sessions = OrderedDict()  # id -> Session, cũ nhất ở đầu
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        """Session theo id (None nếu không có hoặc đã bị loại); đánh dấu vừa dùng"""
+        if not session_id:
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session:
+                session.last_used = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self) -> Session:
+        session_id = uuid.uuid4().hex
+        output_dir = self.root_dir / session_id
+        output_dir.mkdir(parents=True, exist_ok=True)
+        session = Session(session_id, output_dir, self.executor)
+        with self._lock:
+            self._sessions[session_id] = session
+            evicted = self._evict()
+        self._cleanup(evicted)
+        return session
+
+    def publish(self, session: Session, overlay, render_info=None):
+        """Gắn overlay mới (và render_info nếu vừa render) cho session, loại bớt session cũ nếu vượt giới hạn"""
+        size = estimate_overlay_size(overlay)
+        with self._lock:
+            session.overlay = overlay
+            if render_info is not None:
+                session.render_info = render_info
+            session.version += 1
+            session.size = size
+            evicted = self._evict()
+        self._cleanup(evicted)
+
+    def cache_resized(self, session: Session):
+        """Cache artifact/static của session vừa thay đổi: tính lại cache_bytes, loại bớt session cũ nếu vượt cap"""
+        size = session.cache_size()
+        with self._lock:
+            session.cache_bytes = size
+            if self._sessions.get(session.id) is not session:
+                return  # đã bị loại - cache bị xóa cùng output_dir
+            evicted = self._evict()
+        self._cleanup(evicted)
+
+    def _evict(self) -> list:
+        """Loại session ít dùng nhất; không bao giờ loại session vừa dùng gần nhất"""
+        evicted = []
+        total = sum(s.size + s.cache_bytes for s in self._sessions.values())
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or total > self.memory_cap):
+            _, session = self._sessions.popitem(last=False)
+            total -= session.size + session.cache_bytes
+            evicted.append(session)
+        return evicted
+
+    @staticmethod
+    def _cleanup(sessions):
+        for session in sessions:
+            session.discard()
+
+    def close(self):
+        """Server dừng: loại mọi session (xóa output_dir và cache), xóa thư mục tạm của manager"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        self._cleanup(sessions)
+        if self._owns_root:
+            shutil.rmtree(self.root_dir, ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "estimated_bytes": sum(s.size + s.cache_bytes for s in self._sessions.values()),
+                "max_sessions": self.max_sessions,
+                "memory_cap": self.memory_cap,
+            }
@@ -3,18 +3,13 @@
 Script để thêm HTML functions từ ecommerce_frontend.html vào PostgreSQL database
 """
 
-import psycopg2
-from html_db import HTMLFunctionDatabase
+from html_store import open_html_store
 
 def add_ecommerce_html_functions():
     """Thêm các HTML functions từ ecommerce frontend vào database"""
     
     try:
-        html_db = HTMLFunctionDatabase()
-        
-        # Clear existing data
-        print("🧹 Clearing existing HTML functions...")
-        html_db.clear_all_functions()
+        html_db = open_html_store()
         
         # Define HTML functions based on ecommerce_frontend.html
         html_functions = [
@@ -175,65 +170,17 @@ def add_ecommerce_html_functions():
         
         print(f"📝 Adding {len(html_functions)} HTML functions to database...")
         
-        # Add each function to database
+        # Thay toàn bộ dữ liệu cũ trong một transaction; function_id theo thứ tự (html_1 ... html_20),
+        # controller lưu luôn trong cột controller nên không cần bảng mapping riêng
+        count = html_db.bulk_import(
+            [{'function_id': idx, 'function_name': func['name'], 'controller': func['java_controller']}
+             for idx, func in enumerate(html_functions, 1)],
+            replace=True
+        )
         for idx, func in enumerate(html_functions, 1):
-            try:
-                html_db.add_function(
-                    name=func['name'],
-                    file=func['file'],
-                    func_type=func['type'],
-                    description=func['description']
-                )
-                print(f"  ✅ Added: {func['name']}")
-            except Exception as e:
-                print(f"  ❌ Error adding {func['name']}: {e}")
-        
-        print(f"\n🔗 Setting up HTML→Java controller mappings...")
-        
-        # Setup controller mappings
-        controller_mappings = [
-            # UserController mappings
-            ('html_1', 'UserController'),   # User Registration Form
-            ('html_2', 'UserController'),   # User Login Form  
-            ('html_3', 'UserController'),   # Forgot Password Form
-            ('html_4', 'UserController'),   # Get User Info Function
-            ('html_20', 'UserController'),  # User Profile Management
-            
-            # ProductController mappings
-            ('html_5', 'ProductController'),  # Product List Display
-            ('html_6', 'ProductController'),  # Product Search Function
-            ('html_7', 'ProductController'),  # Category Products Display
-            ('html_19', 'ProductController'), # Product Detail View
-            
-            # CategoryController mappings
-            ('html_8', 'CategoryController'), # Category Navigation Menu
-            ('html_9', 'CategoryController'), # Root Categories Display
-            
-            # CartController mappings
-            ('html_10', 'CartController'),   # Shopping Cart View
-            ('html_11', 'CartController'),   # Add to Cart Function
-            ('html_12', 'CartController'),   # Remove from Cart Function
-            
-            # OrderController mappings
-            ('html_13', 'OrderController'),  # User Order History
-            ('html_14', 'OrderController'),  # Order Details View
-            ('html_15', 'OrderController'),  # Checkout Process
-            
-            # ReviewController mappings
-            ('html_16', 'ReviewController'), # Product Reviews Display
-            ('html_17', 'ReviewController'), # User Reviews Display
-            ('html_18', 'ReviewController'), # Create Review Form
-        ]
-        
-        for html_func_id, controller in controller_mappings:
-            try:
-                html_db.add_controller_mapping(html_func_id, controller)
-                print(f"  🔗 Mapped: {html_func_id} → {controller}")
-            except Exception as e:
-                print(f"  ❌ Error mapping {html_func_id}: {e}")
+            print(f"  ✅ Added: html_{idx} {func['name']} → {func['java_controller']}")
         
-        print(f"\n✅ Successfully added {len(html_functions)} HTML functions!")
-        print(f"🔗 Successfully mapped {len(controller_mappings)} HTML→Java relationships!")
+        print(f"\n✅ Successfully added {count} HTML functions with controller mappings!")
         
         # Verify the data
         all_functions = html_db.get_all_functions()
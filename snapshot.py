@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Snapshot bất biến của kết quả phân tích để server phục vụ nhiều request song song.
+
+Analyzer sau `analyze()` là bản gốc duy nhất, dùng chung cho mọi session và không bị sửa.
+Mỗi session chỉ giữ một ViewOverlay nhỏ (selection, hidden nodes/edges, màu, custom
+nodes/edges, các edit trên edge); overlay được áp lên snapshot khi build DOT bằng
+build_view() - view là shallow copy, các cấu trúc lớn (classes, method_calls, method_graph,
+index...) không bị copy.
+"""
+
+import copy
+import itertools
+import time
+from collections import defaultdict
+
+# Edit state của overlay, gắn vào view để _build_dot_graph và các edit method của analyzer dùng
+OVERLAY_ATTRIBUTES = ("hidden_nodes", "hidden_edges", "custom_colors", "custom_nodes", "custom_edges")
+# Edit method sửa method_calls của snapshot - overlay chỉ ghi lại, chạy lại trên bản sao khi build view
+EDGE_EDIT_COMMANDS = ("delete_node", "delete_edge", "update_edge_label")
+
+# Kết quả filter_by_selection mà view sửa tại chỗ (hoặc phải bắt đầu rỗng); các attribute khác
+# filter chỉ gán lại trên view nên không đụng tới snapshot
+_FILTER_STATE = {
+    "selected_functions": set,
+    "method_specific_dependencies": lambda: defaultdict(lambda: defaultdict(set)),
+    "selected_html_functions": list,
+    "html_to_java_mappings": dict,
+    "html_route_labels": dict,
+}
+
+_snapshot_ids = itertools.count(1)
+
+
+class ViewOverlay:
+    """Thay đổi riêng của một session trên snapshot dùng chung"""
+
+    def __init__(self, selection=None):
+        self.selection = list(selection or [])  # đã normalize_selection; rỗng = cả graph
+        self.hidden_nodes = set()
+        self.hidden_edges = set()
+        self.custom_colors = {}
+        self.custom_nodes = {}
+        self.custom_edges = defaultdict(lambda: defaultdict(list))
+        self.edge_edits = []  # [(command, args)] thuộc EDGE_EDIT_COMMANDS, theo thứ tự
+
+    def copy(self):
+        """Bản sao để sửa (batch edit all-or-nothing) - overlay nhỏ nên deepcopy rẻ"""
+        return copy.deepcopy(self)
+
+    def apply(self, analyzer, command: str, *args):
+        """
+        Chạy edit method `command` của analyzer (hide_node, add_edge, delete_edge...) lên overlay,
+        kiểm tra trên snapshot chưa filter; trả về kết quả của method
+        """
+        view = build_view(analyzer, self, select=False, share_overlay=True)
+        if command in EDGE_EDIT_COMMANDS and view.method_calls is analyzer.method_calls:
+            view.method_calls = _copy_edges(view.method_calls)
+        result = getattr(view, command)(*args)
+        # delete_node/delete_edge gán lại hidden_edges thay vì sửa tại chỗ
+        for name in OVERLAY_ATTRIBUTES:
+            setattr(self, name, getattr(view, name))
+        if command in EDGE_EDIT_COMMANDS and result is not False:
+            self.edge_edits.append((command, args))
+        return result
+
+
+def _copy_edges(edges):
+    """Bản sao hai tầng của method_calls; list method dùng chung vì edit chỉ gán lại, không sửa tại chỗ"""
+    copied = defaultdict(lambda: defaultdict(list))
+    for source_file, targets in edges.items():
+        copied[source_file] = defaultdict(list, targets)
+    return copied
+
+
+def build_view(analyzer, overlay=None, select: bool = True, share_overlay: bool = False):
+    """
+    View của `overlay` trên analyzer snapshot: shallow copy, filter theo overlay.selection
+    (select=True), chạy lại edge_edits trên bản sao method_calls rồi gắn edit state của overlay.
+    share_overlay=True gắn chính các object của overlay (edit method ghi thẳng vào overlay),
+    mặc định là bản sao để render không thấy edit đến sau.
+    """
+    view = copy.copy(analyzer)
+    for name, factory in _FILTER_STATE.items():
+        if hasattr(analyzer, name):
+            setattr(view, name, factory())
+    fresh = ViewOverlay()
+    for name in OVERLAY_ATTRIBUTES:
+        setattr(view, name, getattr(fresh, name))
+    if overlay is None:
+        return view
+
+    if select and overlay.selection:
+        view.filter_by_selection(overlay.selection)
+    if overlay.edge_edits:
+        view.method_calls = _copy_edges(view.method_calls)
+        for command, args in overlay.edge_edits:
+            getattr(view, command)(*args)
+    for name in OVERLAY_ATTRIBUTES:
+        value = getattr(overlay, name)
+        setattr(view, name, value if share_overlay else copy.deepcopy(value))
+    return view
+
+
+class AnalysisSnapshot:
+    """Kết quả analyze() không đổi; mọi thay đổi nằm trong ViewOverlay của từng session"""
+
+    def __init__(self, analyzer):
+        # Snapshot giữ chính analyzer đã analyze() xong - caller không được sửa nó sau khi publish
+        self._analyzer = analyzer
+        self.id = next(_snapshot_ids)
+        self.created_at = time.time()
+
+    @property
+    def analyzer(self):
+        """Analyzer gốc - chỉ đọc"""
+        return self._analyzer
+
+    def view(self, overlay=None, select: bool = True):
+        """View để build DOT/đọc metadata với overlay của session (None: trạng thái vừa phân tích xong)"""
+        return build_view(self._analyzer, overlay, select)
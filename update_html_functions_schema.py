@@ -4,30 +4,26 @@ Script để cập nhật database schema và thêm HTML functions với control
 """
 
 import psycopg2
+from db_config import DB_CONFIG
+from html_db import connect_kwargs
+from html_migrations import migrate, refresh_mapping_view
 
 def update_database_schema():
-    """Update database schema để thêm controller column"""
+    """Update database schema (migration có version trong html_migrations.py)"""
     try:
-        conn = psycopg2.connect(host='localhost', database='graph', user='postgres', password='123456')
+        conn = psycopg2.connect(**connect_kwargs(DB_CONFIG))
         cursor = conn.cursor()
         
         print("🔧 Updating database schema...")
-        
-        # Add controller column to html_function table
-        try:
-            cursor.execute("ALTER TABLE html_function ADD COLUMN controller VARCHAR(100)")
-            print("✅ Added controller column")
-        except Exception as e:
-            if "already exists" in str(e):
-                print("ℹ️ Controller column already exists")
-            else:
-                print(f"❌ Error adding controller column: {e}")
+        version = migrate(conn, DB_CONFIG['schema'])
+        print(f"✅ Schema at version {version}")
         
         # Clear existing data
         cursor.execute("DELETE FROM html_function")
         print("🧹 Cleared existing HTML functions")
         
         conn.commit()
+        refresh_mapping_view(conn, DB_CONFIG['schema'])
         conn.close()
         print("✅ Database schema updated successfully")
         
@@ -37,7 +33,7 @@ def update_database_schema():
 def add_html_functions_with_controllers():
     """Add HTML functions với controller mapping chính xác"""
     try:
-        conn = psycopg2.connect(host='localhost', database='graph', user='postgres', password='123456')
+        conn = psycopg2.connect(**connect_kwargs(DB_CONFIG))
         cursor = conn.cursor()
         
         # HTML functions với controller mapping chính xác
@@ -83,12 +79,14 @@ def add_html_functions_with_controllers():
             print(f"  ✅ Added: {function_name} → {controller}")
         
         conn.commit()
+        # Trigger chỉ đánh dấu view stale - refresh một lần cho cả loạt insert
+        refresh_mapping_view(conn, DB_CONFIG['schema'])
         conn.close()
         
         print(f"✅ Successfully added {len(html_functions)} HTML functions!")
         
         # Verify the data
-        conn = psycopg2.connect(host='localhost', database='graph', user='postgres', password='123456')
+        conn = psycopg2.connect(**connect_kwargs(DB_CONFIG))
         cursor = conn.cursor()
         cursor.execute("SELECT function_id, function_name, controller FROM html_function ORDER BY function_id")
         results = cursor.fetchall()